@@ -2,6 +2,7 @@
 Configuración centralizada de la aplicación.
 """
 import os
+from datetime import date
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,12 +20,34 @@ EXPORTS_DIR.mkdir(exist_ok=True)
 
 # Configuración de base de datos
 DATABASE_PATH = os.getenv("DATABASE_PATH", str(DATA_DIR / "seguro_complementario.db"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Reintentos ante SQLITE_BUSY/LOCKED: cantidad y espera exponencial con jitter
+DB_REINTENTOS_MAX = int(os.getenv("DB_REINTENTOS_MAX", "5"))
+DB_REINTENTO_BASE_MS = int(os.getenv("DB_REINTENTO_BASE_MS", "25"))
+DB_REINTENTO_MAX_MS = int(os.getenv("DB_REINTENTO_MAX_MS", "1000"))
+# Serializar las escrituras del portal en un único hilo con commit agrupado
+DB_ESCRITOR_SERIALIZADO = os.getenv("DB_ESCRITOR_SERIALIZADO", "false").lower() in ("1", "true", "si")
+
+# Caché del portal de autoservicio (registro por RUT)
+PORTAL_CACHE_MAX_ENTRADAS = int(os.getenv("PORTAL_CACHE_MAX_ENTRADAS", "2000"))
+PORTAL_CACHE_TTL_SEGUNDOS = int(os.getenv("PORTAL_CACHE_TTL_SEGUNDOS", "300"))
 
 # Configuración de la aplicación
 APP_TITLE = os.getenv("APP_TITLE", "Registro Seguro Complementario")
 MAX_HIJOS = int(os.getenv("MAX_HIJOS", "10"))
 EDAD_MAXIMA_HIJO = int(os.getenv("EDAD_MAXIMA_HIJO", "25"))
 
+# Días hábiles: plazo de alta y feriados irregulares (elecciones, interferiados)
+# que se suman a los legales, como fechas AAAA-MM-DD separadas por coma
+DIAS_HABILES_ALTA = int(os.getenv("DIAS_HABILES_ALTA", "15"))
+FERIADOS_ADICIONALES = [
+    date.fromisoformat(fecha.strip())
+    for fecha in os.getenv("FERIADOS_ADICIONALES", "").split(",")
+    if fecha.strip()
+]
+
 # Configuración de logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE", str(DATA_DIR / "app.log"))
@@ -8,24 +8,30 @@ from pathlib import Path
 import os
 
 # Importar módulos propios
-from config import APP_TITLE, MAX_HIJOS, EDAD_MAXIMA_HIJO
+from config import APP_TITLE, MAX_HIJOS, EDAD_MAXIMA_HIJO, DIAS_HABILES_ALTA
 from utils import (
     validar_rut, 
     formatear_rut, 
     validar_nombre, 
     validar_fecha_nacimiento,
     calcular_edad,
+    calcular_edades,
     validar_email,
     validar_numero_cuenta,
     logger
 )
 from services import (
     DatabaseService,
+    ErrorBaseDatos,
+    BaseDatosOcupadaError,
+    RegistroDuplicadoError,
+    CargaDuplicadaError,
     BANCOS_CHILE,
     TIPOS_CUENTA,
     enviar_correo_confirmacion,
     simular_envio_correo,
-    enviar_correo_aseguradora
+    enviar_correo_aseguradora,
+    calcular_fecha_alta
 )
 
 
@@ -56,6 +62,17 @@ def formato_fecha_chile(fecha) -> str:
     return fecha.strftime("%d-%m-%y")
 
 
+def mensaje_error_bd(error: ErrorBaseDatos) -> str:
+    """Mensaje para el usuario según el tipo de error de la base de datos."""
+    if isinstance(error, CargaDuplicadaError):
+        return f"❌ El RUT {error.rut} ya está declarado como carga por otro trabajador"
+    if isinstance(error, BaseDatosOcupadaError):
+        return "⏳ El sistema está ocupado procesando otras solicitudes. Intente nuevamente en unos segundos."
+    if isinstance(error, RegistroDuplicadoError):
+        return "❌ Los datos ingresados entran en conflicto con un registro existente."
+    return "❌ Error de base de datos. Por favor intente nuevamente."
+
+
 # Estilos CSS corporativos
 st.markdown("""
 <style>
@@ -271,8 +288,6 @@ def init_session_state():
         st.session_state.registro_id = None
     if 'modo_admin' not in st.session_state:
         st.session_state.modo_admin = False
-    if 'registro_existente' not in st.session_state:
-        st.session_state.registro_existente = None
 
 
 def reset_formulario():
@@ -282,7 +297,6 @@ def reset_formulario():
     st.session_state.cargas_temporales = []
     st.session_state.registro_completado = False
     st.session_state.registro_id = None
-    st.session_state.registro_existente = None
 
 
 # ==================== BARRA LATERAL ====================
@@ -376,10 +390,10 @@ def paso1_validar_trabajador():
             # Formatear RUT
             rut_formateado = formatear_rut(rut_input)
             
-            # Verificar si es empleado de la empresa
-            es_empleado, datos_empleado = db.verificar_empleado_existe(rut_formateado)
+            # Empleado, registro activo y cargas en una sola consulta
+            login = db.login_trabajador(rut_formateado)
             
-            if not es_empleado:
+            if not login:
                 st.error("""
                 ❌ **RUT no encontrado en la base de datos de empleados.**
                 
@@ -389,13 +403,12 @@ def paso1_validar_trabajador():
                 logger.warning(f"Intento de acceso con RUT no registrado: {rut_formateado}")
                 return
             
-            # Verificar si ya tiene un registro activo en el seguro
-            registro_existente = db.obtener_registro_por_rut(rut_formateado)
+            datos_empleado = login['empleado']
+            registro_existente = login['registro']
             
             if registro_existente:
                 # Redirigir a portal de autoservicio
                 st.session_state.trabajador_validado = True
-                st.session_state.registro_existente = registro_existente
                 st.session_state.datos_trabajador = {
                     'rut': rut_formateado,
                     'nombre': datos_empleado['nombre'],
@@ -407,7 +420,6 @@ def paso1_validar_trabajador():
             else:
                 # Nuevo registro
                 st.session_state.trabajador_validado = True
-                st.session_state.registro_existente = None
                 st.session_state.datos_trabajador = {
                     'rut': rut_formateado,
                     'nombre': datos_empleado['nombre'],
@@ -598,6 +610,10 @@ def paso3_agregar_cargas():
                     st.error("❌ Este RUT ya fue agregado")
                     return
             
+            if db.buscar_conflictos_carga(rut_formateado, datos['rut']):
+                st.error("❌ Este RUT ya está declarado como carga por otro trabajador")
+                return
+            
             # Agregar carga temporal
             st.session_state.cargas_temporales.append({
                 'tipo': tipo_carga.replace('/a', ''),
@@ -690,34 +706,29 @@ def paso4_confirmar_enviar():
         
         if enviar_btn:
             with st.spinner("Procesando registro..."):
-                # Crear registro en base de datos
-                registro_id = db.crear_registro_trabajador(
-                    rut=datos['rut'],
-                    nombre=datos['nombre'],
-                    email=datos['email'],
-                    banco=datos.get('banco'),
-                    tipo_cuenta=datos.get('tipo_cuenta'),
-                    numero_cuenta=datos.get('numero_cuenta')
-                )
+                # Crear registro y cargas en una sola transacción
+                try:
+                    registro_completo = db.crear_registro_completo(
+                        rut=datos['rut'],
+                        nombre=datos['nombre'],
+                        email=datos['email'],
+                        banco=datos.get('banco'),
+                        tipo_cuenta=datos.get('tipo_cuenta'),
+                        numero_cuenta=datos.get('numero_cuenta'),
+                        cargas=[
+                            {**carga, 'sexo': carga.get('sexo', 'No especificado')}
+                            for carga in cargas
+                        ]
+                    )
+                except ErrorBaseDatos as e:
+                    st.error(mensaje_error_bd(e))
+                    return
                 
-                if not registro_id:
+                if not registro_completo:
                     st.error("❌ Error al crear el registro. Por favor intente nuevamente.")
                     return
                 
-                # Agregar cargas
-                for carga in cargas:
-                    db.agregar_carga_a_registro(
-                        registro_id=registro_id,
-                        tipo=carga['tipo'],
-                        rut=carga['rut'],
-                        nombre=carga['nombre'],
-                        sexo=carga.get('sexo', 'No especificado'),
-                        fecha_nacimiento=carga['fecha_nacimiento'],
-                        edad=carga['edad']
-                    )
-                
-                # Obtener registro completo para el email
-                registro_completo = db.obtener_registro_con_cargas(registro_id)
+                registro_id = registro_completo['id']
                 
                 # Preparar datos para email
                 datos_email = {
@@ -728,7 +739,7 @@ def paso4_confirmar_enviar():
                     'tipo_cuenta': datos.get('tipo_cuenta'),
                     'numero_cuenta': datos.get('numero_cuenta')
                 }
-                cargas_email = registro_completo.get('cargas', []) if registro_completo else cargas
+                cargas_email = registro_completo['cargas']
                 
                 # Intentar enviar correo
                 smtp_configurado = os.getenv('SMTP_USER') and os.getenv('SMTP_PASSWORD')
@@ -739,7 +750,11 @@ def paso4_confirmar_enviar():
                     exito_email = simular_envio_correo(datos_email, cargas_email)
                 
                 if exito_email:
-                    db.marcar_email_enviado(registro_id)
+                    try:
+                        db.marcar_email_enviado(registro_id)
+                    except ErrorBaseDatos as e:
+                        # El registro ya quedó guardado; solo falta la marca del correo
+                        logger.warning(f"No se pudo marcar el email del registro {registro_id}: {e}")
                 
                 # Marcar como completado
                 st.session_state.registro_completado = True
@@ -767,7 +782,7 @@ def mostrar_confirmacion_final():
     
     📧 **Se ha enviado un correo de confirmación a:** {datos['email']}
     
-    📅 **Fecha estimada de alta:** Sus cargas estarán habilitadas en aproximadamente **15 días hábiles**.
+    📅 **Fecha estimada de alta:** Sus cargas estarán habilitadas el **{calcular_fecha_alta()}** ({DIAS_HABILES_ALTA} días hábiles).
     """)
     
     st.info("""
@@ -785,7 +800,16 @@ def mostrar_confirmacion_final():
 def portal_autoservicio():
     """Portal de autoservicio para trabajadores con registro existente."""
     datos = st.session_state.datos_trabajador
-    registro = st.session_state.registro_existente
+    # El registro se lee en cada recarga desde la caché del servicio (por RUT)
+    registro = db.obtener_registro_por_rut(datos['rut'])
+    
+    if not registro:
+        st.info("No tiene un registro activo en el seguro complementario.")
+        datos['tiene_registro'] = False
+        if st.button("🔄 Volver al inicio"):
+            reset_formulario()
+            st.rerun()
+        return
     
     st.markdown("### 👤 Mi Registro de Seguro")
     
@@ -809,9 +833,11 @@ def portal_autoservicio():
         cargas = registro.get('cargas', [])
         
         if cargas:
-            for carga in cargas:
+            # La edad guardada es la del día del registro: se muestra la de hoy
+            edades = calcular_edades([c['fecha_nacimiento'] for c in cargas], datetime.date.today())
+            for carga, edad in zip(cargas, edades):
                 fecha_nac = formato_fecha_chile(carga['fecha_nacimiento'])
-                st.write(f"• **{carga['tipo']}:** {carga['nombre']} (RUT: {carga['rut']}, Nac: {fecha_nac}, {carga['edad']} años)")
+                st.write(f"• **{carga['tipo']}:** {carga['nombre']} (RUT: {carga['rut']}, Nac: {fecha_nac}, {edad} años)")
         else:
             st.info("No tiene cargas familiares registradas.")
     
@@ -859,20 +885,26 @@ def portal_autoservicio():
                             rut_formateado = formatear_rut(rut_carga)
                             edad = calcular_edad(fecha_nac)
                             
-                            if db.agregar_carga_a_registro(
-                                registro_id=registro['id'],
-                                tipo=tipo_carga.replace('/a', ''),
-                                rut=rut_formateado,
-                                nombre=nombre_carga.title(),
-                                fecha_nacimiento=fecha_nac,
-                                edad=edad
-                            ):
-                                st.success(f"✅ {tipo_carga} agregado/a correctamente")
-                                # Refrescar registro
-                                st.session_state.registro_existente = db.obtener_registro_por_rut(datos['rut'])
-                                st.rerun()
+                            if db.buscar_conflictos_carga(rut_formateado, registro['rut_trabajador']):
+                                st.error("❌ Este RUT ya está declarado como carga por otro trabajador")
                             else:
-                                st.error("❌ Error al agregar la carga")
+                                try:
+                                    carga_id = db.agregar_carga_a_registro(
+                                        registro_id=registro['id'],
+                                        tipo=tipo_carga.replace('/a', ''),
+                                        rut=rut_formateado,
+                                        nombre=nombre_carga.title(),
+                                        fecha_nacimiento=fecha_nac,
+                                        edad=edad
+                                    )
+                                except ErrorBaseDatos as e:
+                                    st.error(mensaje_error_bd(e))
+                                else:
+                                    if carga_id:
+                                        st.success(f"✅ {tipo_carga} agregado/a correctamente")
+                                        st.rerun()
+                                    else:
+                                        st.error("❌ Error al agregar la carga")
     
     with tab3:
         st.subheader("❌ Eliminar Carga")
@@ -890,12 +922,16 @@ def portal_autoservicio():
                     st.write(f"Nac: {fecha_nac}")
                 with col3:
                     if st.button("🗑️ Eliminar", key=f"del_carga_{carga['id']}"):
-                        if db.eliminar_carga(carga['id'], datos['rut'], datos['nombre']):
-                            st.success(f"✅ Carga eliminada. Se notificó al administrador.")
-                            st.session_state.registro_existente = db.obtener_registro_por_rut(datos['rut'])
-                            st.rerun()
+                        try:
+                            eliminada = db.eliminar_carga(carga['id'], datos['rut'], datos['nombre'])
+                        except ErrorBaseDatos as e:
+                            st.error(mensaje_error_bd(e))
                         else:
-                            st.error("❌ Error al eliminar la carga")
+                            if eliminada:
+                                st.success(f"✅ Carga eliminada. Se notificó al administrador.")
+                                st.rerun()
+                            else:
+                                st.error("❌ Error al eliminar la carga")
         else:
             st.info("No tiene cargas para eliminar.")
     
@@ -919,22 +955,26 @@ def portal_autoservicio():
         confirmar = st.checkbox("✅ Confirmo que deseo dar de baja mi seguro complementario")
         
         if st.button("🚫 Confirmar Baja del Seguro", type="primary", disabled=not confirmar):
-            if db.dar_baja_seguro(
-                registro_id=registro['id'],
-                rut_trabajador=datos['rut'],
-                nombre_trabajador=datos['nombre'],
-                motivo=motivo or "Solicitud del trabajador"
-            ):
-                st.success("✅ Su baja ha sido procesada correctamente.")
-                st.info("Se ha notificado al administrador. Recibirá confirmación por correo.")
-                st.session_state.registro_existente = None
-                st.session_state.datos_trabajador['tiene_registro'] = False
-                
-                if st.button("🔄 Volver al inicio"):
-                    reset_formulario()
-                    st.rerun()
+            try:
+                baja_procesada = db.dar_baja_seguro(
+                    registro_id=registro['id'],
+                    rut_trabajador=datos['rut'],
+                    nombre_trabajador=datos['nombre'],
+                    motivo=motivo or "Solicitud del trabajador"
+                )
+            except ErrorBaseDatos as e:
+                st.error(mensaje_error_bd(e))
             else:
-                st.error("❌ Error al procesar la baja")
+                if baja_procesada:
+                    st.success("✅ Su baja ha sido procesada correctamente.")
+                    st.info("Se ha notificado al administrador. Recibirá confirmación por correo.")
+                    st.session_state.datos_trabajador['tiene_registro'] = False
+                    
+                    if st.button("🔄 Volver al inicio"):
+                        reset_formulario()
+                        st.rerun()
+                else:
+                    st.error("❌ Error al procesar la baja")
     
     st.markdown("---")
     
@@ -1006,8 +1046,12 @@ def vista_administrador():
         
         if notificaciones:
             if st.button("✅ Marcar todas como leídas"):
-                db.marcar_todas_notificaciones_leidas()
-                st.rerun()
+                try:
+                    db.marcar_todas_notificaciones_leidas()
+                except ErrorBaseDatos as e:
+                    st.error(mensaje_error_bd(e))
+                else:
+                    st.rerun()
             
             st.markdown("---")
             
@@ -1026,8 +1070,12 @@ def vista_administrador():
                         st.caption(f"📅 {notif['fecha']}")
                     with col3:
                         if st.button("✓", key=f"marcar_{notif['id']}"):
-                            db.marcar_notificacion_leida(notif['id'])
-                            st.rerun()
+                            try:
+                                db.marcar_notificacion_leida(notif['id'])
+                            except ErrorBaseDatos as e:
+                                st.error(mensaje_error_bd(e))
+                            else:
+                                st.rerun()
                     st.markdown("---")
         else:
             st.success("✅ No hay notificaciones pendientes")
@@ -1035,24 +1083,78 @@ def vista_administrador():
     with tab2:
         st.subheader("📋 Registros de Trabajadores")
         
-        registros = db.obtener_todos_registros()
+        with st.form("form_filtros_registros"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                filtro_rut = st.text_input("RUT", placeholder="12.345.678-9")
+                filtro_nombre = st.text_input("Nombre")
+            with col2:
+                filtro_banco = st.selectbox("Banco", ["Todos"] + BANCOS_CHILE)
+                por_pagina = st.selectbox("Registros por página", [25, 50, 100], index=1)
+            with col3:
+                filtro_desde = st.date_input("Desde", value=None, format="DD-MM-YYYY")
+                filtro_hasta = st.date_input("Hasta", value=None, format="DD-MM-YYYY")
+            
+            if st.form_submit_button("🔍 Filtrar"):
+                # Al cambiar filtros se vuelve a la primera página
+                st.session_state.registros_filtros = {
+                    'rut': filtro_rut.strip() or None,
+                    'nombre': filtro_nombre.strip() or None,
+                    'banco': None if filtro_banco == "Todos" else filtro_banco,
+                    'fecha_desde': filtro_desde,
+                    'fecha_hasta': filtro_hasta,
+                    'limite': por_pagina
+                }
+                st.session_state.registros_cursores = [None]
+        
+        filtros = st.session_state.get('registros_filtros', {'limite': 50})
+        cursores = st.session_state.setdefault('registros_cursores', [None])
+        
+        registros, siguiente = db.obtener_registros_pagina(cursor=cursores[-1], **filtros)
         
         if registros:
-            for reg in registros:
-                with st.expander(f"👤 {reg['nombre_trabajador']} - {reg['rut_trabajador']}", expanded=False):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"**Email:** {reg['email']}")
-                        st.write(f"**Fecha Registro:** {reg['fecha_registro']}")
-                        st.write(f"**Email Enviado:** {'✅' if reg['email_enviado'] else '❌'}")
-                    with col2:
-                        st.write(f"**Banco:** {reg.get('banco') or 'No especificado'}")
-                        st.write(f"**Tipo Cuenta:** {reg.get('tipo_cuenta') or 'N/A'}")
-                        st.write(f"**Número Cuenta:** {reg.get('numero_cuenta') or 'N/A'}")
-                    
-                    st.write(f"**Cargas:** {reg.get('nombres_cargas') or 'Sin cargas'}")
+            import pandas as pd
+            
+            df_registros = pd.DataFrame([{
+                'RUT': reg['rut_trabajador'],
+                'Nombre': reg['nombre_trabajador'],
+                'Email': reg['email'],
+                'Fecha Registro': reg['fecha_registro'],
+                'Email Enviado': '✅' if reg['email_enviado'] else '❌',
+                'Banco': reg.get('banco') or 'No especificado',
+                'Tipo Cuenta': reg.get('tipo_cuenta') or 'N/A',
+                'Número Cuenta': reg.get('numero_cuenta') or 'N/A',
+                'Cargas': reg.get('nombres_cargas') or 'Sin cargas'
+            } for reg in registros])
+            st.dataframe(df_registros, use_container_width=True, hide_index=True)
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Anterior", disabled=len(cursores) == 1):
+                    cursores.pop()
+                    st.rerun()
+            with col2:
+                st.caption(f"Página {len(cursores)}")
+            with col3:
+                if st.button("Siguiente ➡️", disabled=siguiente is None):
+                    cursores.append(siguiente)
+                    st.rerun()
         else:
-            st.info("No hay registros aún.")
+            st.info("No hay registros que coincidan con los filtros.")
+        
+        duplicadas = db.reporte_cargas_duplicadas()
+        if duplicadas:
+            import pandas as pd
+            
+            ruts = len({formatear_rut(c.rut) for c in duplicadas})
+            with st.expander(f"⚠️ Cargas declaradas por más de un trabajador ({ruts})"):
+                st.dataframe(pd.DataFrame([{
+                    'RUT Carga': c.rut,
+                    'Nombre Carga': c.nombre,
+                    'Tipo': c.tipo,
+                    'RUT Trabajador': c.rut_trabajador,
+                    'Nombre Trabajador': c.nombre_trabajador
+                } for c in duplicadas]), use_container_width=True, hide_index=True)
     
     with tab3:
         st.subheader("👥 Gestión de Empleados")
@@ -1089,9 +1191,27 @@ def vista_administrador():
         
         # Lista de empleados
         st.markdown("#### 📋 Empleados Registrados")
-        empleados = db.obtener_todos_empleados()
+        busqueda = st.text_input(
+            "🔍 Buscar",
+            placeholder="Nombre, RUT o email de empleados, trabajadores y cargas",
+            key="busqueda_admin"
+        )
+        empleados = [] if busqueda.strip() else db.obtener_todos_empleados()
         
-        if empleados:
+        if busqueda.strip():
+            resultados = db.buscar(busqueda, limite=50)
+            if resultados:
+                import pandas as pd
+                st.dataframe(pd.DataFrame([{
+                    'Tipo': r.tipo.capitalize(),
+                    'Nombre': r.nombre,
+                    'RUT': r.rut,
+                    'Email': r.email or '',
+                    'Registro': r.registro_id or ''
+                } for r in resultados]), use_container_width=True, hide_index=True)
+            else:
+                st.info("Sin coincidencias para la búsqueda.")
+        elif empleados:
             for emp in empleados:
                 st.write(f"• **{emp['nombre']}** - RUT: {emp['rut']} - Email: {emp.get('email') or 'N/A'}")
         else:
@@ -1105,7 +1225,52 @@ def vista_administrador():
         
         archivo = st.file_uploader("Seleccionar archivo Excel", type=['xlsx', 'xls'])
         
-        if archivo:
+        modo_importacion = st.radio(
+            "Modo de importación",
+            ["Agregar nuevos", "Sincronizar nómina completa"],
+            horizontal=True,
+            help="Sincronizar agrega nuevos, actualiza nombre/email y desactiva a quienes no estén en el archivo"
+        )
+        
+        if archivo and modo_importacion == "Sincronizar nómina completa":
+            col_sync1, col_sync2 = st.columns(2)
+            with col_sync1:
+                previsualizar = st.button("👁️ Previsualizar Cambios")
+            with col_sync2:
+                sincronizar = st.button("🔄 Sincronizar Nómina", type="primary")
+            
+            if previsualizar or sincronizar:
+                import tempfile
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as f:
+                    f.write(archivo.getvalue())
+                    temp_path = f.name
+                
+                resumen = db.sincronizar_empleados_excel(temp_path, aplicar=sincronizar)
+                os.unlink(temp_path)
+                
+                if 'error' in resumen:
+                    st.error(f"❌ Error: {resumen['error']}")
+                else:
+                    if resumen['aplicado']:
+                        st.success("✅ Nómina sincronizada")
+                    elif sincronizar:
+                        st.error("❌ La nómina no tiene filas válidas; no se aplicaron cambios")
+                    
+                    col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+                    col_r1.metric("🆕 Nuevos", len(resumen['nuevos']))
+                    col_r2.metric("✏️ Modificados", len(resumen['modificados']))
+                    col_r3.metric("🚫 Desactivados", len(resumen['desactivados']))
+                    col_r4.metric("⚠️ Rechazados", len(resumen['rechazados']))
+                    
+                    if resumen['desactivados']:
+                        with st.expander("Ver empleados a desactivar"):
+                            st.write(", ".join(resumen['desactivados']))
+                    if resumen['rechazados']:
+                        with st.expander("Ver filas rechazadas"):
+                            for r in resumen['rechazados'][:50]:
+                                st.write(f"• Fila {r['fila']}: {r['motivo']} ({r['rut'] or 'sin RUT'})")
+        
+        elif archivo:
             if st.button("📥 Importar Empleados"):
                 # Guardar archivo temporal
                 import tempfile
@@ -1251,6 +1416,34 @@ def vista_administrador():
             else:
                 st.info("Sin datos de hijos")
         
+        # Edades vigentes de todas las cargas, calculadas hoy y no las guardadas al registrar
+        edades_cargas = db.obtener_edades_cargas(edad_maxima_hijo=EDAD_MAXIMA_HIJO)
+        if not edades_cargas.empty:
+            st.markdown("### 🎂 Edades de las Cargas")
+            import plotly.express as px
+            
+            fig = px.histogram(edades_cargas.dropna(subset=['edad']), x='edad', color='tipo',
+                               nbins=20, labels={'edad': 'Edad', 'tipo': 'Tipo'},
+                               color_discrete_sequence=['#667eea', '#f5576c'])
+            fig.update_layout(
+                margin=dict(t=20, b=20, l=20, r=20),
+                height=300,
+                yaxis_title='Cantidad'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            
+            hijos_mayores = edades_cargas[edades_cargas['sobre_edad_maxima']]
+            if not hijos_mayores.empty:
+                st.warning(f"⚠️ **{len(hijos_mayores)}** hijo(s) superan hoy la edad máxima ({EDAD_MAXIMA_HIJO} años).")
+                with st.expander("👁️ Ver hijos sobre la edad máxima"):
+                    st.dataframe(
+                        hijos_mayores[['rut_trabajador', 'nombre', 'rut', 'edad']].rename(columns={
+                            'rut_trabajador': 'RUT Trabajador', 'nombre': 'Nombre', 'rut': 'RUT', 'edad': 'Edad'
+                        }),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+        
         st.markdown("---")
         
         # ===== SECCIÓN 3: ESTADO DE ENVÍO =====
@@ -1291,12 +1484,13 @@ def vista_administrador():
             with col_btn1:
                 if st.button("📧 Enviar por Email", type="primary", disabled=not email_aseguradora):
                     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    lote = f"LOTE_{timestamp}"
-                    archivo = f"exports/envio_seguro_{lote}.xlsx"
+                    archivo = f"exports/envio_seguro_{timestamp}.xlsx"
                     
-                    if db.solo_exportar_pendientes(archivo):
-                        if enviar_correo_aseguradora(email_aseguradora, archivo, len(pendientes), lote):
-                            db.marcar_registros_enviados(lote)
+                    # Se marca exactamente lo exportado, aunque entren registros durante el envío
+                    lote = db.exportar_pendientes_lote(archivo, email_aseguradora)
+                    if lote:
+                        if enviar_correo_aseguradora(email_aseguradora, archivo, len(lote['registros']), lote['numero']):
+                            db.marcar_registros_enviados(lote, email_aseguradora)
                             st.success(f"✅ ¡Enviado a **{email_aseguradora}**!")
                             st.balloons()
                         else:
@@ -1328,6 +1522,33 @@ def vista_administrador():
                     with open(archivo, 'rb') as f:
                         st.download_button("⬇️ Descargar Completo", f, file_name=f"reporte_{timestamp}.xlsx")
         
+        with st.expander("📦 Historial de Lotes"):
+            lotes = db.obtener_lotes()
+            if lotes:
+                import pandas as pd
+                
+                st.dataframe(pd.DataFrame([{
+                    'Lote': l['numero'],
+                    'Estado': l['estado'],
+                    'Creado': formato_fecha_chile(l['fecha_creacion'][:10]) if l['fecha_creacion'] else '',
+                    'Enviado a': l['destinatario'] or '',
+                    'Trabajadores': l['total_registros'],
+                    'Cargas': l['total_cargas'],
+                    'SHA-256': (l['checksum_sha256'] or '')[:12]
+                } for l in lotes]), use_container_width=True, hide_index=True)
+                
+                lote_sel = st.selectbox("Ver contenido del lote", lotes,
+                                        format_func=lambda l: l['numero'])
+                detalle = db.obtener_detalle_lote(lote_sel['id'])
+                if detalle and (detalle['registros'] or detalle['cargas']):
+                    st.dataframe(pd.DataFrame(detalle['registros']), use_container_width=True, hide_index=True)
+                    if detalle['cargas']:
+                        st.dataframe(pd.DataFrame(detalle['cargas']), use_container_width=True, hide_index=True)
+                else:
+                    st.caption("El lote aún no tiene registros marcados como enviados.")
+            else:
+                st.info("Aún no se han generado lotes.")
+        
         with st.expander("🔧 Herramientas Admin"):
             if st.button("🔄 Reiniciar Estado"):
                 resultado = db.reiniciar_estado_envio()
@@ -1338,6 +1559,19 @@ def vista_administrador():
                 else:
                     st.success(f"✅ {resultado} registro(s) reiniciado(s)")
                     st.rerun()
+            
+            if st.button("🧮 Verificar Contadores del Dashboard"):
+                desviaciones = db.verificar_contadores()
+                if desviaciones:
+                    st.warning(f"⚠️ {len(desviaciones)} contador(es) desviado(s)")
+                    for clave, (actual, esperado) in sorted(desviaciones.items()):
+                        st.write(f"• **{clave}**: {actual} (esperado {esperado})")
+                else:
+                    st.success("✅ Los contadores están al día")
+            
+            if st.button("🛠️ Reconstruir Contadores"):
+                desviaciones = db.reconstruir_contadores()
+                st.success(f"✅ Contadores reconstruidos ({len(desviaciones)} desviación(es) corregida(s))")
 
 
 # ==================== MAIN ====================
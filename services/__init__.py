@@ -2,7 +2,9 @@
 Servicios de la aplicación.
 """
 from .database import DatabaseService
-from .email_service import enviar_correo_confirmacion, simular_envio_correo, enviar_correo_aseguradora
+from .errores import BaseDatosOcupadaError, CargaDuplicadaError, ErrorBaseDatos, RegistroDuplicadoError
+from .dias_habiles import CalendarioHabil, CALENDARIO_CHILE, feriados_chile
+from .email_service import calcular_fecha_alta, enviar_correo_confirmacion, simular_envio_correo, enviar_correo_aseguradora
 
 # Bancos chilenos
 BANCOS_CHILE = [
@@ -33,9 +35,17 @@ TIPOS_CUENTA = [
 
 __all__ = [
     'DatabaseService',
+    'ErrorBaseDatos',
+    'BaseDatosOcupadaError',
+    'RegistroDuplicadoError',
+    'CargaDuplicadaError',
     'BANCOS_CHILE',
     'TIPOS_CUENTA',
     'enviar_correo_confirmacion',
     'simular_envio_correo',
-    'enviar_correo_aseguradora'
+    'enviar_correo_aseguradora',
+    'calcular_fecha_alta',
+    'CalendarioHabil',
+    'CALENDARIO_CHILE',
+    'feriados_chile'
 ]
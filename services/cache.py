@@ -0,0 +1,85 @@
+"""
+Caché en memoria con capacidad acotada (LRU) y expiración (TTL).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class CacheLRU:
+    """
+    Caché de proceso compartido entre hilos.
+    
+    Al superar max_entradas se descarta la entrada usada hace más tiempo, y
+    una entrada con más de ttl_segundos se trata como ausente. Los valores se
+    copian al guardar y al leer, para que quien los reciba pueda modificarlos
+    sin alterar lo almacenado.
+    """
+    
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Métricas
+        self._aciertos = 0
+        self._fallos = 0
+        self._expirados = 0
+        self._descartados = 0
+        self._invalidaciones = 0
+    
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """Retorna una copia del valor, o None si no está o expiró."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self._fallos += 1
+                return None
+            
+            valor, expira = entrada
+            if time.monotonic() >= expira:
+                del self._datos[clave]
+                self._expirados += 1
+                self._fallos += 1
+                return None
+            
+            self._datos.move_to_end(clave)
+            self._aciertos += 1
+        return copy.deepcopy(valor)
+    
+    def guardar(self, clave: Hashable, valor: Any):
+        """Guarda una copia del valor, descartando la entrada menos usada si hace falta."""
+        valor = copy.deepcopy(valor)
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl_segundos)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._descartados += 1
+    
+    def invalidar(self, clave: Hashable):
+        """Elimina una entrada."""
+        with self._lock:
+            if self._datos.pop(clave, None) is not None:
+                self._invalidaciones += 1
+    
+    def limpiar(self):
+        """Elimina todas las entradas."""
+        with self._lock:
+            self._invalidaciones += len(self._datos)
+            self._datos.clear()
+    
+    def estadisticas(self) -> Dict:
+        """Retorna métricas de uso de la caché."""
+        with self._lock:
+            return {
+                'entradas': len(self._datos),
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'expirados': self._expirados,
+                'descartados': self._descartados,
+                'invalidaciones': self._invalidaciones
+            }
@@ -0,0 +1,143 @@
+"""
+Gestor de conexiones SQLite reutilizables por hilo.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from config import DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+from utils.logger import logger
+
+
+class PoolConexiones:
+    """
+    Entrega una conexión SQLite por hilo, configurada una sola vez y reutilizada
+    en las llamadas siguientes del mismo hilo.
+    """
+    
+    def __init__(self, db_path: str, busy_timeout_ms: int = None,
+                 cache_size_kb: int = None, mmap_size: int = None):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms if busy_timeout_ms is not None else DB_BUSY_TIMEOUT_MS
+        self.cache_size_kb = cache_size_kb if cache_size_kb is not None else DB_CACHE_SIZE_KB
+        self.mmap_size = mmap_size if mmap_size is not None else DB_MMAP_SIZE
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones: Dict[threading.Thread, sqlite3.Connection] = {}
+        
+        # Contadores de instrumentación
+        self._creadas = 0
+        self._reutilizadas = 0
+        self._cerradas = 0
+        self._fallos_salud = 0
+    
+    def _crear_conexion(self) -> sqlite3.Connection:
+        """Abre una conexión nueva y aplica los PRAGMA de rendimiento."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False  # La afinidad por hilo la garantiza el pool
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _purgar_hilos_terminados(self):
+        """Cierra las conexiones de hilos que ya terminaron (llamar con el lock tomado)."""
+        for hilo in [h for h in self._conexiones if not h.is_alive()]:
+            conn = self._conexiones.pop(hilo)
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error al cerrar conexión huérfana: {e}")
+            self._cerradas += 1
+    
+    def obtener(self) -> sqlite3.Connection:
+        """Retorna la conexión del hilo actual, creándola si no existe."""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None:
+            with self._lock:
+                self._reutilizadas += 1
+            return conn
+        
+        conn = self._crear_conexion()
+        with self._lock:
+            self._purgar_hilos_terminados()
+            self._conexiones[threading.current_thread()] = conn
+            self._creadas += 1
+        self._local.conexion = conn
+        return conn
+    
+    @contextmanager
+    def conexion(self):
+        """
+        Conexión del hilo actual dentro de una transacción.
+        Hace commit al salir sin errores y rollback si hay una excepción.
+        """
+        conn = self.obtener()
+        with conn:
+            yield conn
+    
+    def descartar(self):
+        """Cierra y olvida la conexión del hilo actual."""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is None:
+            return
+        self._local.conexion = None
+        with self._lock:
+            self._conexiones.pop(threading.current_thread(), None)
+            self._cerradas += 1
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Error al cerrar conexión: {e}")
+    
+    def verificar_salud(self) -> bool:
+        """Verifica que la conexión del hilo responda; si no, la reemplaza."""
+        try:
+            self.obtener().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Conexión no saludable, se reemplaza: {e}")
+            with self._lock:
+                self._fallos_salud += 1
+            self.descartar()
+            try:
+                self.obtener().execute("SELECT 1").fetchone()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"No se pudo restablecer la conexión: {e}")
+                return False
+    
+    def estadisticas(self) -> Dict:
+        """Retorna métricas de tamaño y uso del pool."""
+        with self._lock:
+            self._purgar_hilos_terminados()
+            return {
+                'conexiones_abiertas': len(self._conexiones),
+                'conexiones_creadas': self._creadas,
+                'conexiones_reutilizadas': self._reutilizadas,
+                'conexiones_cerradas': self._cerradas,
+                'fallos_salud': self._fallos_salud
+            }
+    
+    def cerrar_todas(self):
+        """Cierra todas las conexiones abiertas del pool."""
+        with self._lock:
+            conexiones = list(self._conexiones.values())
+            self._conexiones.clear()
+            self._cerradas += len(conexiones)
+        for conn in conexiones:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error al cerrar conexión: {e}")
+        # La conexión local de cada hilo queda cerrada; se recrea en el próximo uso
+        self._local = threading.local()
@@ -2,111 +2,871 @@
 Servicio de base de datos SQLite para el sistema de seguro complementario.
 """
 import sqlite3
-from datetime import datetime
+import json
+import re
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 import os
 
-from config import DATABASE_PATH, EXPORTS_DIR
+from config import (DATABASE_PATH, DB_ESCRITOR_SERIALIZADO, EXPORTS_DIR, PORTAL_CACHE_MAX_ENTRADAS,
+                    PORTAL_CACHE_TTL_SEGUNDOS)
+from utils.fechas import calcular_edades, convertir_fechas
 from utils.logger import logger
-from utils.validators import normalizar_rut
+from utils.rut_masivo import normalizar_ruts
+from utils.validacion_masiva import validar_empleados
+from utils.validators import descomponer_rut, formatear_rut, normalizar_rut
+from .cache import CacheLRU
+from .conexiones import PoolConexiones
+from .errores import CargaDuplicadaError, ErrorBaseDatos, RegistroDuplicadoError
+from .escritor import EscritorSerializado
+from .exportacion import calcular_checksum, exportar_hojas
+from .indice_empleados import SQL_EMPLEADOS_DESDE_VERSION, IndiceEmpleados
+from .migraciones import migrar
+from .modelos import (Carga, CargaPendiente, ConflictoCarga, Empleado, Notificacion, Registro,
+                      RegistroListado, ResultadoBusqueda)
+from .reintentos import PoliticaReintentos
+
+
+# Tipo con que se guardan los hijos en cargas (main.py quita el '/a' de la etiqueta "Hijo/a")
+TIPO_HIJO = 'Hijo'
+
+# Aportes de cada fila a los contadores del dashboard: (clave, condición).
+# {f} se reemplaza por NEW/OLD en los triggers o por el alias de la tabla al reconstruir.
+_APORTES_CONTADORES = {
+    'empleados': [
+        ("'total_empleados'", "{f}.activo = 1"),
+    ],
+    'registros_trabajador': [
+        ("'total_registros'", "{f}.activo = 1"),
+        ("'emails_enviados'", "{f}.email_enviado = 1"),
+        ("'registros_enviados'", "{f}.activo = 1 AND {f}.enviado_aseguradora = 1"),
+        ("'registros_pendientes'", "{f}.activo = 1 AND {f}.enviado_aseguradora = 0"),
+    ],
+    'cargas': [
+        ("'total_cargas'", "{f}.activo = 1"),
+        ("'cargas_por_tipo:' || {f}.tipo", "{f}.activo = 1"),
+        ("'cargas_por_sexo:' || {f}.sexo", "{f}.activo = 1 AND {f}.sexo IS NOT NULL"),
+        ("'hijos_por_sexo:' || {f}.sexo", f"{{f}}.activo = 1 AND {{f}}.tipo = '{TIPO_HIJO}' AND {{f}}.sexo IS NOT NULL"),
+        ("'conyuges_por_sexo:' || {f}.sexo", "{f}.activo = 1 AND {f}.tipo = 'Cónyuge' AND {f}.sexo IS NOT NULL"),
+    ],
+}
+
+# Columnas cuyo cambio puede mover algún contador
+_COLUMNAS_CONTADORES = {
+    'empleados': "activo",
+    'registros_trabajador': "activo, email_enviado, enviado_aseguradora",
+    'cargas': "activo, tipo, sexo",
+}
+
+
+def _sql_aplicar_aportes(tabla: str, fila: str, signo: int) -> str:
+    """SQL que suma (o resta) los aportes de NEW/OLD a los contadores."""
+    aportes = " UNION ALL ".join(
+        f"SELECT {clave.format(f=fila)} AS clave WHERE {condicion.format(f=fila)}"
+        for clave, condicion in _APORTES_CONTADORES[tabla]
+    )
+    return f"""
+        INSERT INTO estadisticas_contadores (clave, valor)
+        SELECT clave, {signo} FROM ({aportes}) WHERE true
+        ON CONFLICT(clave) DO UPDATE SET valor = valor + excluded.valor;
+    """
+
+
+def _sql_recalcular_contadores() -> str:
+    """SQL que calcula todos los contadores desde las tablas base."""
+    return " UNION ALL ".join(
+        f"SELECT {clave.format(f='t')} AS clave, COUNT(*) AS valor "
+        f"FROM {tabla} t WHERE {condicion.format(f='t')} GROUP BY 1"
+        for tabla, aportes in _APORTES_CONTADORES.items()
+        for clave, condicion in aportes
+    )
+
+
+# Filas indexadas para la búsqueda del administrador: (desplazamiento, nombre,
+# rut, email, registro_id) con {f} como en los contadores. En la tabla busqueda
+# el rowid es id * 4 + desplazamiento, así los triggers ubican la fila de cada
+# origen sin recorrer el índice.
+_FUENTES_BUSQUEDA = {
+    'empleados': (0, "{f}.nombre", "{f}.rut", "{f}.email", "NULL"),
+    'registros_trabajador': (1, "{f}.nombre_trabajador", "{f}.rut_trabajador", "{f}.email", "{f}.id"),
+    'cargas': (2, "{f}.nombre", "{f}.rut", "NULL", "{f}.registro_id"),
+}
+
+# Columnas cuyo cambio debe reindexar la fila
+_COLUMNAS_BUSQUEDA = {
+    'empleados': "rut, nombre, email, activo",
+    'registros_trabajador': "rut_trabajador, nombre_trabajador, email, activo",
+    'cargas': "rut, nombre, activo",
+}
+
+
+def _sql_indexar_busqueda(tabla: str, fila: str) -> str:
+    """SQL que agrega a busqueda las filas activas de una tabla (fila = NEW o alias)."""
+    desplazamiento = _FUENTES_BUSQUEDA[tabla][0]
+    nombre, rut, email, registro_id = (col.format(f=fila) for col in _FUENTES_BUSQUEDA[tabla][1:])
+    # El RUT se indexa como cuerpo y como cuerpo+DV, sin puntos ni guion
+    rut_busqueda = f"{fila}.rut_num || ' ' || {fila}.rut_num || {fila}.rut_dv"
+    origen = f"FROM {tabla} {fila}" if fila not in ('NEW', 'OLD') else ""
+    return f"""
+        INSERT INTO busqueda (rowid, nombre, rut_busqueda, email, rut, registro_id)
+        SELECT {fila}.id * 4 + {desplazamiento}, {nombre}, COALESCE({rut_busqueda}, {rut}),
+               {email}, {rut}, {registro_id}
+        {origen}
+        WHERE {fila}.activo = 1;
+    """
+
+
+def _sql_desindexar_busqueda(tabla: str) -> str:
+    """SQL que quita de busqueda la fila OLD de una tabla."""
+    return f"DELETE FROM busqueda WHERE rowid = OLD.id * 4 + {_FUENTES_BUSQUEDA[tabla][0]};"
+
+
+# Columna de texto con el RUT en cada tabla y formato con que se guarda.
+# Cada tabla tiene además rut_num/rut_dv generadas desde ese texto, que son
+# la clave de búsqueda canónica.
+_COLUMNAS_RUT = {
+    'empleados': ('rut', normalizar_rut),
+    'registros_trabajador': ('rut_trabajador', formatear_rut),
+    'cargas': ('rut', formatear_rut),
+    'notificaciones_admin': ('rut_trabajador', formatear_rut),
+}
+
+_SQL_RUT_LIMPIO = "UPPER(REPLACE(REPLACE(REPLACE(TRIM({col}), '.', ''), '-', ''), ' ', ''))"
+
+
+# Consultas de las rutas más frecuentes. tests/test_database.py verifica con
+# EXPLAIN QUERY PLAN que ninguna recorra una tabla completa.
+_SQL_EMPLEADO_POR_RUT = f"SELECT {Empleado.columnas()} FROM empleados WHERE rut_num = ? AND rut_dv = ? AND activo = 1"
+
+_SQL_EMPLEADOS_ACTIVOS = f"SELECT {Empleado.columnas()} FROM empleados WHERE activo = 1 ORDER BY nombre"
+
+# Registro con sus cargas activas en una sola fila; las cargas vienen como
+# arreglo JSON (una fila de Carga.COLUMNAS por carga) para resolver el
+# registro en un solo viaje a la base
+_SQL_REGISTRO_CON_CARGAS = """
+    SELECT {columnas_registro},
+           (SELECT json_group_array(json_array({columnas_carga}))
+            FROM (SELECT {columnas_carga} FROM cargas
+                  WHERE registro_id = r.id AND activo = 1
+                  ORDER BY tipo, nombre) c) AS cargas_json
+    FROM registros_trabajador r
+    WHERE {condicion}
+"""
+
+_SQL_REGISTRO_CON_CARGAS_POR_RUT = _SQL_REGISTRO_CON_CARGAS.format(
+    columnas_registro=Registro.columnas('r'), columnas_carga=Carga.columnas(),
+    condicion="r.rut_num = ? AND r.rut_dv = ? AND r.activo = 1 ORDER BY r.fecha_registro DESC LIMIT 1"
+)
+
+_SQL_REGISTRO_CON_CARGAS_POR_ID = _SQL_REGISTRO_CON_CARGAS.format(
+    columnas_registro=Registro.columnas('r'), columnas_carga=Carga.columnas(),
+    condicion="r.id = ?"
+)
+
+_SQL_REGISTROS_PENDIENTES = f"""
+    SELECT {Registro.columnas()} FROM registros_trabajador
+    WHERE activo = 1 AND enviado_aseguradora = 0
+    ORDER BY fecha_registro
+"""
+
+_SQL_CARGAS_NUEVAS_PENDIENTES = f"""
+    SELECT {Carga.columnas('c')}, r.nombre_trabajador, r.rut_trabajador
+    FROM cargas c
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    WHERE r.enviado_aseguradora = 1
+    AND c.activo = 1
+    AND c.enviado_aseguradora = 0
+"""
+
+_SQL_NOTIFICACIONES_PENDIENTES = f"""
+    SELECT {Notificacion.columnas()} FROM notificaciones_admin
+    WHERE leida = 0 ORDER BY fecha DESC
+"""
+
+# Página de registros con cursor (fecha_registro, id); {filtros} se completa
+# en obtener_registros_pagina con los filtros opcionales
+_SQL_PAGINA_REGISTROS = f"""
+    SELECT {RegistroListado.columnas('r')},
+           (SELECT GROUP_CONCAT(c.nombre || ' (' || c.tipo || ')')
+            FROM cargas c
+            WHERE c.registro_id = r.id AND c.activo = 1) AS nombres_cargas
+    FROM registros_trabajador r
+    WHERE r.activo = 1 AND (r.fecha_registro, r.id) < (?, ?){{filtros}}
+    ORDER BY r.fecha_registro DESC, r.id DESC
+    LIMIT ?
+"""
+
+# Cursor inicial: mayor que cualquier fecha_registro almacenada
+_CURSOR_INICIAL = ('9999-12-31', 0)
+
+# Cargas activas con un RUT dado, declaradas en registros activos de otro
+# trabajador (con NULL como trabajador no se excluye a nadie). Resuelta con
+# idx_cargas_rut_activo.
+_SQL_CONFLICTOS_CARGA = """
+    SELECT c.id AS carga_id, c.rut, c.nombre, c.tipo, r.id AS registro_id,
+           r.rut_trabajador, r.nombre_trabajador
+    FROM cargas c
+    JOIN registros_trabajador r ON r.id = c.registro_id
+    WHERE c.rut_num = ? AND c.rut_dv = ? AND c.activo = 1
+    AND r.activo = 1 AND r.rut_num IS NOT ?
+    ORDER BY r.fecha_registro
+"""
+
+# Todas las cargas activas cuyo RUT aparece en registros activos de más de un
+# trabajador, en una sola consulta agrupada sobre idx_cargas_rut_activo
+_SQL_CARGAS_DUPLICADAS = """
+    WITH duplicados AS (
+        SELECT c.rut_num, c.rut_dv
+        FROM cargas c
+        JOIN registros_trabajador r ON r.id = c.registro_id
+        WHERE c.activo = 1 AND r.activo = 1
+        GROUP BY c.rut_num, c.rut_dv
+        HAVING COUNT(DISTINCT r.rut_num) > 1
+    )
+    SELECT c.id AS carga_id, c.rut, c.nombre, c.tipo, r.id AS registro_id,
+           r.rut_trabajador, r.nombre_trabajador
+    FROM duplicados
+    JOIN cargas c ON c.rut_num = duplicados.rut_num AND c.rut_dv = duplicados.rut_dv AND c.activo = 1
+    JOIN registros_trabajador r ON r.id = c.registro_id AND r.activo = 1
+    ORDER BY c.rut_num, r.fecha_registro
+"""
+
+# Búsqueda del administrador; el tipo y el id salen del rowid (ver _FUENTES_BUSQUEDA)
+_SQL_BUSCAR = """
+    SELECT CASE rowid % 4 WHEN 0 THEN 'empleado' WHEN 1 THEN 'registro' ELSE 'carga' END AS tipo,
+           rowid / 4 AS id, nombre, rut, email, registro_id
+    FROM busqueda
+    WHERE busqueda MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+# Puntos y guion entre dígitos de un RUT escrito con formato (12.345.678-5)
+_SEPARADORES_RUT = re.compile(r"(?<=\d)[.\-](?=[\dkK])")
+
+
+def _consulta_busqueda(texto: str) -> Optional[str]:
+    """
+    Convierte el texto del buscador en una consulta FTS5: cada palabra como
+    prefijo y todas obligatorias. Retorna None si no queda ninguna palabra.
+    """
+    palabras = re.findall(r"\w+", _SEPARADORES_RUT.sub("", texto or ""))
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+# Hojas de las planillas exportadas; los alias son los encabezados del Excel
+_SQL_EXPORTAR_REGISTROS = """
+    SELECT 
+        rut_trabajador as 'RUT',
+        nombre_trabajador as 'Nombre',
+        email as 'Email',
+        banco as 'Banco',
+        tipo_cuenta as 'Tipo Cuenta',
+        numero_cuenta as 'Número Cuenta',
+        fecha_registro as 'Fecha Registro'
+    FROM registros_trabajador
+    WHERE activo = 1
+    ORDER BY fecha_registro DESC
+"""
+
+_SQL_EXPORTAR_CARGAS = """
+    SELECT 
+        r.rut_trabajador as 'RUT Trabajador',
+        r.nombre_trabajador as 'Nombre Trabajador',
+        r.email as 'Email Trabajador',
+        r.banco as 'Banco',
+        r.tipo_cuenta as 'Tipo Cuenta',
+        r.numero_cuenta as 'Número Cuenta',
+        c.tipo as 'Tipo Carga',
+        c.rut as 'RUT Carga',
+        c.nombre as 'Nombre Carga',
+        c.fecha_nacimiento as 'Fecha Nacimiento',
+        c.edad as 'Edad'
+    FROM cargas c
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    WHERE c.activo = 1 AND r.activo = 1
+    ORDER BY r.nombre_trabajador, c.tipo
+"""
+
+# Cargas que viajan en un lote: las no enviadas de registros activos. Cubre las
+# de registros pendientes (que nunca se marcan antes que su registro) y las
+# nuevas de registros ya enviados
+_SQL_CARGAS_DEL_LOTE = """
+    SELECT c.id
+    FROM cargas c
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    WHERE c.activo = 1 AND c.enviado_aseguradora = 0 AND r.activo = 1
+"""
+
+# Hojas del lote, leídas desde la foto de IDs en temp.lote_registros/lote_cargas
+_SQL_EXPORTAR_REGISTROS_LOTE = """
+    SELECT 
+        r.rut_trabajador as 'RUT',
+        r.nombre_trabajador as 'Nombre',
+        r.email as 'Email',
+        r.banco as 'Banco',
+        r.tipo_cuenta as 'Tipo Cuenta',
+        r.numero_cuenta as 'Número Cuenta',
+        r.fecha_registro as 'Fecha Registro'
+    FROM temp.lote_registros l
+    JOIN registros_trabajador r ON r.id = l.id
+    ORDER BY r.fecha_registro
+"""
+
+_SQL_EXPORTAR_CARGAS_LOTE = """
+    SELECT 
+        r.rut_trabajador as 'RUT Trabajador',
+        r.nombre_trabajador as 'Nombre Trabajador',
+        c.tipo as 'Tipo Carga',
+        c.rut as 'RUT Carga',
+        c.nombre as 'Nombre Carga',
+        c.sexo as 'Sexo',
+        c.fecha_nacimiento as 'Fecha Nacimiento',
+        c.edad as 'Edad'
+    FROM temp.lote_cargas l
+    JOIN cargas c ON c.id = l.id
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    ORDER BY r.nombre_trabajador, c.tipo
+"""
+
+# Cargas activas con su fecha de nacimiento, para calcular las edades vigentes
+_SQL_NACIMIENTOS_CARGAS = """
+    SELECT c.id, c.tipo, c.sexo, c.rut, c.nombre, r.rut_trabajador, c.fecha_nacimiento
+    FROM cargas c
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    WHERE c.activo = 1 AND r.activo = 1
+    ORDER BY c.id
+"""
+
+# Miembros de un lote ya enviado
+_SQL_REGISTROS_DE_LOTE = """
+    SELECT id, rut_trabajador, nombre_trabajador, email, banco, fecha_registro
+    FROM registros_trabajador
+    WHERE lote_id = ?
+    ORDER BY fecha_registro
+"""
+
+_SQL_CARGAS_DE_LOTE = """
+    SELECT c.id, r.rut_trabajador, r.nombre_trabajador, c.tipo, c.rut, c.nombre, c.sexo
+    FROM cargas c
+    JOIN registros_trabajador r ON c.registro_id = r.id
+    WHERE c.lote_id = ?
+    ORDER BY r.nombre_trabajador, c.tipo
+"""
+
+# Nombre -> (sql, parámetros de ejemplo) para la verificación de planes
+CONSULTAS_CRITICAS = {
+    'empleado_por_rut': (_SQL_EMPLEADO_POR_RUT, (12345678, '5')),
+    'empleados_activos': (_SQL_EMPLEADOS_ACTIVOS, ()),
+    'empleados_desde_version': (SQL_EMPLEADOS_DESDE_VERSION, (0,)),
+    'registro_con_cargas_por_rut': (_SQL_REGISTRO_CON_CARGAS_POR_RUT, (12345678, '5')),
+    'registro_con_cargas_por_id': (_SQL_REGISTRO_CON_CARGAS_POR_ID, (1,)),
+    'registros_pendientes': (_SQL_REGISTROS_PENDIENTES, ()),
+    'cargas_nuevas_pendientes': (_SQL_CARGAS_NUEVAS_PENDIENTES, ()),
+    'cargas_del_lote': (_SQL_CARGAS_DEL_LOTE, ()),
+    'notificaciones_pendientes': (_SQL_NOTIFICACIONES_PENDIENTES, ()),
+    'registros_de_lote': (_SQL_REGISTROS_DE_LOTE, (1,)),
+    'cargas_de_lote': (_SQL_CARGAS_DE_LOTE, (1,)),
+    'pagina_registros': (_SQL_PAGINA_REGISTROS.format(filtros=''), ('2025-01-01 00:00:00', 10, 50)),
+    'conflictos_carga': (_SQL_CONFLICTOS_CARGA, (22222222, '2', 12345678)),
+    'cargas_duplicadas': (_SQL_CARGAS_DUPLICADAS, ()),
+}
 
 
 class DatabaseService:
     """Servicio de gestión de base de datos SQLite."""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, escritor_serializado: bool = None):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite (por defecto DATABASE_PATH)
+            escritor_serializado: Encolar las escrituras del portal en un único
+                hilo escritor (por defecto DB_ESCRITOR_SERIALIZADO)
+        """
         self.db_path = db_path or DATABASE_PATH
         # Crear directorio si no existe
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._pool = PoolConexiones(self.db_path)
+        self._reintentos = PoliticaReintentos()
         self._init_database()
+        
+        if escritor_serializado is None:
+            escritor_serializado = DB_ESCRITOR_SERIALIZADO
+        self._escritor = EscritorSerializado(self.db_path) if escritor_serializado else None
+        
+        # Registro por RUT para el portal de autoservicio; los métodos que
+        # escriben sobre un registro actualizan o invalidan su entrada
+        self._cache_registros = CacheLRU(PORTAL_CACHE_MAX_ENTRADAS, PORTAL_CACHE_TTL_SEGUNDOS)
+        
+        # Nómina en memoria para validar RUT sin consultar SQLite
+        self._indice_empleados = IndiceEmpleados(self.db_path)
+        self._indice_empleados.refrescar()
+    
+    def estadisticas_conexiones(self) -> Dict:
+        """Retorna métricas del pool de conexiones."""
+        return self._pool.estadisticas()
+    
+    def verificar_salud_conexion(self) -> bool:
+        """Verifica que la conexión del hilo actual esté operativa."""
+        return self._pool.verificar_salud()
+    
+    def estadisticas_indice_empleados(self) -> Dict:
+        """Retorna métricas de aciertos, fallos y refrescos del índice de empleados."""
+        return self._indice_empleados.estadisticas()
+    
+    def estadisticas_cache_registros(self) -> Dict:
+        """Retorna métricas de la caché de registros del portal."""
+        return self._cache_registros.estadisticas()
+    
+    def estadisticas_reintentos(self) -> Dict:
+        """Retorna métricas de reintentos y abandonos por base ocupada."""
+        return self._reintentos.estadisticas()
+    
+    def estadisticas_escritor(self) -> Dict:
+        """Retorna métricas del escritor serializado, o {} si está desactivado."""
+        return self._escritor.estadisticas() if self._escritor else {}
+    
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas del servicio."""
+        if self._escritor:
+            self._escritor.cerrar()
+        self._pool.cerrar_todas()
+        self._indice_empleados.cerrar()
+    
+    def _transaccion(self, operacion):
+        """
+        Ejecuta una operación en una transacción de la conexión del hilo actual,
+        reintentándola mientras la base esté ocupada.
+        
+        Args:
+            operacion: Función que recibe la conexión; no debe hacer commit y
+                debe poder repetirse desde cero
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la operación no se pudo confirmar
+        """
+        def intento():
+            with self._pool.conexion() as conn:
+                return operacion(conn)
+        return self._reintentos.ejecutar(intento)
+    
+    def _escribir(self, operacion):
+        """
+        Ejecuta una operación de escritura y retorna su resultado ya confirmado.
+        
+        Con el escritor serializado la operación se encola y se espera su
+        Future; si no, corre en la conexión del hilo actual. En ambos casos
+        corre dentro de BEGIN IMMEDIATE, así las lecturas que validan antes
+        de la primera escritura (como la de cargas duplicadas) ya tienen el
+        bloqueo de escritura, y se reintenta si la base está ocupada.
+        
+        Args:
+            operacion: Función que recibe la conexión; no debe hacer commit
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la operación no se pudo confirmar
+        """
+        if self._escritor:
+            return self._reintentos.ejecutar(lambda: self._escritor.ejecutar(operacion).result())
+        
+        def inmediata(conn):
+            # Sin esto sqlite3 abre la transacción recién en el primer INSERT/UPDATE
+            conn.execute("BEGIN IMMEDIATE")
+            return operacion(conn)
+        return self._transaccion(inmediata)
+    
+    @staticmethod
+    def _cursor(conn: sqlite3.Connection, fabrica) -> sqlite3.Cursor:
+        """Cursor cuyas filas se construyen con la fábrica de un modelo."""
+        cursor = conn.cursor()
+        cursor.row_factory = fabrica
+        return cursor
     
     def _init_database(self):
-        """Crea las tablas si no existen."""
+        """
+        Lleva el esquema a la versión actual aplicando las migraciones pendientes.
+        Si la base ya está al día solo se lee PRAGMA user_version.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Tabla de empleados de la empresa (para validación)
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS empleados (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        rut TEXT UNIQUE NOT NULL,
-                        nombre TEXT NOT NULL,
-                        email TEXT,
-                        activo BOOLEAN DEFAULT 1,
-                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Tabla de registros del trabajador
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS registros_trabajador (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        rut_trabajador TEXT NOT NULL,
-                        nombre_trabajador TEXT NOT NULL,
-                        email TEXT NOT NULL,
-                        banco TEXT,
-                        tipo_cuenta TEXT,
-                        numero_cuenta TEXT,
-                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        email_enviado BOOLEAN DEFAULT 0,
-                        activo BOOLEAN DEFAULT 1,
-                        fecha_baja TIMESTAMP,
-                        motivo_baja TEXT,
-                        enviado_aseguradora BOOLEAN DEFAULT 0,
-                        fecha_envio_aseguradora TIMESTAMP,
-                        numero_lote TEXT,
-                        FOREIGN KEY (rut_trabajador) REFERENCES empleados(rut)
-                    )
-                """)
-                
-                # Tabla de cargas familiares
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS cargas (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        registro_id INTEGER NOT NULL,
-                        tipo TEXT NOT NULL,
-                        rut TEXT NOT NULL,
-                        nombre TEXT NOT NULL,
-                        sexo TEXT,
-                        fecha_nacimiento DATE NOT NULL,
-                        edad INTEGER NOT NULL,
-                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        activo BOOLEAN DEFAULT 1,
-                        fecha_eliminacion TIMESTAMP,
-                        enviado_aseguradora BOOLEAN DEFAULT 0,
-                        fecha_envio_aseguradora TIMESTAMP,
-                        numero_lote TEXT,
-                        FOREIGN KEY (registro_id) REFERENCES registros_trabajador(id)
-                    )
-                """)
-                
-                # Tabla de notificaciones para el administrador
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS notificaciones_admin (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        tipo TEXT NOT NULL,
-                        rut_trabajador TEXT NOT NULL,
-                        nombre_trabajador TEXT NOT NULL,
-                        descripcion TEXT NOT NULL,
-                        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        leida BOOLEAN DEFAULT 0
-                    )
-                """)
-                
-                # Índices
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_empleados_rut ON empleados(rut)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_rut ON registros_trabajador(rut_trabajador)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_cargas_registro ON cargas(registro_id)")
-                
-                conn.commit()
-                logger.info(f"Base de datos inicializada en {self.db_path}")
+            aplicadas = self._reintentos.ejecutar(lambda: migrar(self._pool.obtener(), MIGRACIONES))
+            if aplicadas:
+                logger.info(f"Base de datos en {self.db_path} migrada a la versión {aplicadas[-1][0]}")
         except Exception as e:
             logger.error(f"Error al inicializar base de datos: {e}")
             raise
     
+    @staticmethod
+    def _crear_tablas_base(cursor):
+        """Crea las tablas originales de empleados, registros, cargas y notificaciones."""
+        # Tabla de empleados de la empresa (para validación)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS empleados (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                rut TEXT UNIQUE NOT NULL,
+                nombre TEXT NOT NULL,
+                email TEXT,
+                activo BOOLEAN DEFAULT 1,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Tabla de registros del trabajador
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS registros_trabajador (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                rut_trabajador TEXT NOT NULL,
+                nombre_trabajador TEXT NOT NULL,
+                email TEXT NOT NULL,
+                banco TEXT,
+                tipo_cuenta TEXT,
+                numero_cuenta TEXT,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                email_enviado BOOLEAN DEFAULT 0,
+                activo BOOLEAN DEFAULT 1,
+                fecha_baja TIMESTAMP,
+                motivo_baja TEXT,
+                enviado_aseguradora BOOLEAN DEFAULT 0,
+                fecha_envio_aseguradora TIMESTAMP,
+                numero_lote TEXT,
+                FOREIGN KEY (rut_trabajador) REFERENCES empleados(rut)
+            )
+        """)
+        
+        # Tabla de cargas familiares
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cargas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                registro_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                rut TEXT NOT NULL,
+                nombre TEXT NOT NULL,
+                sexo TEXT,
+                fecha_nacimiento DATE NOT NULL,
+                edad INTEGER NOT NULL,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                activo BOOLEAN DEFAULT 1,
+                fecha_eliminacion TIMESTAMP,
+                enviado_aseguradora BOOLEAN DEFAULT 0,
+                fecha_envio_aseguradora TIMESTAMP,
+                numero_lote TEXT,
+                FOREIGN KEY (registro_id) REFERENCES registros_trabajador(id)
+            )
+        """)
+        
+        # Tabla de notificaciones para el administrador
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notificaciones_admin (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                rut_trabajador TEXT NOT NULL,
+                nombre_trabajador TEXT NOT NULL,
+                descripcion TEXT NOT NULL,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                leida BOOLEAN DEFAULT 0
+            )
+        """)
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cargas_registro ON cargas(registro_id)")
+    
+    @staticmethod
+    def _crear_indices_parciales(cursor):
+        """Crea los índices parciales y de cobertura de las rutas frecuentes."""
+        # Normalizar el estado de envío (NULL -> 0) para que las consultas puedan
+        # filtrar con "enviado_aseguradora = 0" y usar los índices parciales
+        cursor.execute("UPDATE registros_trabajador SET enviado_aseguradora = 0 WHERE enviado_aseguradora IS NULL")
+        cursor.execute("UPDATE cargas SET enviado_aseguradora = 0 WHERE enviado_aseguradora IS NULL")
+        
+        # Duplicaba el índice implícito de la restricción UNIQUE(rut)
+        cursor.execute("DROP INDEX IF EXISTS idx_empleados_rut")
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_empleados_activos_nombre
+            ON empleados(nombre) WHERE activo = 1
+        """)
+        # Las búsquedas por RUT usan rut_num (ver _crear_claves_rut)
+        cursor.execute("DROP INDEX IF EXISTS idx_registros_rut")
+        cursor.execute("DROP INDEX IF EXISTS idx_registros_rut_activo")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_empleados_rut_num
+            ON empleados(rut_num) WHERE activo = 1
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_registros_rut_num_activo
+            ON registros_trabajador(rut_num, fecha_registro) WHERE activo = 1
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_rut_num
+            ON cargas(rut_num) WHERE activo = 1
+        """)
+        # Cubre los pendientes de envío (ya ordenados por fecha) y los contadores de envío
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_registros_activos_envio
+            ON registros_trabajador(enviado_aseguradora, fecha_registro) WHERE activo = 1
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_registros_activos_fecha
+            ON registros_trabajador(fecha_registro, id) WHERE activo = 1
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_registro_activo
+            ON cargas(registro_id, tipo, nombre) WHERE activo = 1
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_pendientes
+            ON cargas(registro_id) WHERE activo = 1 AND enviado_aseguradora = 0
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notificaciones_pendientes
+            ON notificaciones_admin(fecha) WHERE leida = 0
+        """)
+        
+        # Cobertura para recalcular los contadores de cargas sin leer la tabla
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_activas_tipo_sexo
+            ON cargas(tipo, sexo) WHERE activo = 1
+        """)
+    
+    @staticmethod
+    def _crear_claves_rut(cursor):
+        """
+        Agrega las columnas generadas rut_num/rut_dv a cada tabla con RUT.
+        
+        La primera vez (base creada antes de estas columnas) también reescribe
+        los RUT guardados al formato de su tabla, para que ninguna fila quede
+        con puntos, espacios o 'k' minúscula.
+        """
+        for tabla, (columna, formatear) in _COLUMNAS_RUT.items():
+            # table_info omite las columnas generadas; table_xinfo las incluye
+            columnas = {fila[1] for fila in cursor.execute(f"PRAGMA table_xinfo({tabla})")}
+            if 'rut_num' in columnas:
+                continue
+            
+            limpio = _SQL_RUT_LIMPIO.format(col=columna)
+            cursor.execute(f"""
+                ALTER TABLE {tabla} ADD COLUMN rut_num INTEGER
+                GENERATED ALWAYS AS (CAST(SUBSTR({limpio}, 1, LENGTH({limpio}) - 1) AS INTEGER)) VIRTUAL
+            """)
+            cursor.execute(f"""
+                ALTER TABLE {tabla} ADD COLUMN rut_dv TEXT
+                GENERATED ALWAYS AS (SUBSTR({limpio}, -1)) VIRTUAL
+            """)
+            
+            cambios = [
+                (formatear(rut), fila_id)
+                for fila_id, rut in cursor.execute(f"SELECT id, {columna} FROM {tabla}").fetchall()
+                if rut and descomponer_rut(rut) and formatear(rut) != rut
+            ]
+            for nuevo, fila_id in cambios:
+                try:
+                    cursor.execute(f"UPDATE {tabla} SET {columna} = ? WHERE id = ?", (nuevo, fila_id))
+                except sqlite3.IntegrityError:
+                    # Mismo RUT ya guardado en otro formato (empleados.rut es UNIQUE)
+                    logger.warning(f"RUT duplicado en {tabla} (id {fila_id}): {nuevo}; se mantiene el original")
+            if cambios:
+                logger.info(f"RUT normalizados en {tabla}: {len(cambios)} filas")
+    
+    @staticmethod
+    def _crear_lotes(cursor):
+        """Crea la tabla de lotes y enlaza registros y cargas con su lote."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS lotes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero TEXT UNIQUE,
+                estado TEXT NOT NULL DEFAULT 'generado',
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_envio TIMESTAMP,
+                destinatario TEXT,
+                total_registros INTEGER NOT NULL DEFAULT 0,
+                total_cargas INTEGER NOT NULL DEFAULT 0,
+                archivo TEXT,
+                checksum_sha256 TEXT
+            )
+        """)
+        
+        for tabla in ('registros_trabajador', 'cargas'):
+            columnas = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})")}
+            if 'lote_id' in columnas:
+                continue
+            
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN lote_id INTEGER REFERENCES lotes(id)")
+            
+            # Base existente: los números de lote en texto pasan a ser filas de lotes
+            cursor.execute(f"""
+                INSERT INTO lotes (numero, estado, fecha_creacion, fecha_envio)
+                SELECT numero_lote, 'enviado',
+                       COALESCE(MIN(fecha_envio_aseguradora), CURRENT_TIMESTAMP),
+                       MIN(fecha_envio_aseguradora)
+                FROM {tabla}
+                WHERE numero_lote IS NOT NULL
+                GROUP BY numero_lote
+                ON CONFLICT(numero) DO NOTHING
+            """)
+            cursor.execute(f"""
+                UPDATE {tabla}
+                SET lote_id = (SELECT l.id FROM lotes l WHERE l.numero = {tabla}.numero_lote)
+                WHERE numero_lote IS NOT NULL
+            """)
+            cursor.execute(f"""
+                UPDATE lotes
+                SET {'total_registros' if tabla == 'registros_trabajador' else 'total_cargas'} =
+                    (SELECT COUNT(*) FROM {tabla} t WHERE t.lote_id = lotes.id)
+                WHERE archivo IS NULL
+            """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_registros_lote
+            ON registros_trabajador(lote_id) WHERE lote_id IS NOT NULL
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_lote
+            ON cargas(lote_id) WHERE lote_id IS NOT NULL
+        """)
+    
+    @staticmethod
+    def _crear_versionado_empleados(cursor):
+        """
+        Versiona la tabla empleados para refrescar el índice en memoria.
+        
+        Cada cambio incrementa versiones_tablas['empleados'] y deja esa versión
+        en la fila modificada, de modo que el índice solo relee lo nuevo.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS versiones_tablas (
+                tabla TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        
+        columnas = {fila[1] for fila in cursor.execute("PRAGMA table_info(empleados)")}
+        if 'version' not in columnas:
+            cursor.execute("ALTER TABLE empleados ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_empleados_version ON empleados(version)")
+        
+        incrementar = """
+            INSERT INTO versiones_tablas (tabla, version) VALUES ('{tabla}', 1)
+            ON CONFLICT(tabla) DO UPDATE SET version = version + 1;
+        """
+        sellar_fila = """
+            UPDATE empleados
+            SET version = (SELECT version FROM versiones_tablas WHERE tabla = 'empleados')
+            WHERE id = NEW.id;
+        """
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_empleados_version_insert
+            AFTER INSERT ON empleados
+            BEGIN {incrementar.format(tabla='empleados')} {sellar_fila} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_empleados_version_update
+            AFTER UPDATE OF rut, nombre, email, activo ON empleados
+            BEGIN {incrementar.format(tabla='empleados')} {sellar_fila} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_empleados_version_delete
+            AFTER DELETE ON empleados
+            BEGIN {incrementar.format(tabla='empleados_borrados')} END
+        """)
+    
+    @staticmethod
+    def _crear_busqueda(cursor):
+        """Crea el índice FTS5 de la búsqueda del administrador y sus triggers."""
+        existia = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busqueda'"
+        ).fetchone()
+        
+        # prefix: índices de prefijos cortos para que "pé" o "1234" no recorran el vocabulario
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+                nombre, rut_busqueda, email, rut UNINDEXED, registro_id UNINDEXED,
+                tokenize = "unicode61 remove_diacritics 2",
+                prefix = '2 3 4'
+            )
+        """)
+        
+        for tabla in _FUENTES_BUSQUEDA:
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_insert
+                AFTER INSERT ON {tabla}
+                BEGIN {_sql_indexar_busqueda(tabla, 'NEW')} END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_delete
+                AFTER DELETE ON {tabla}
+                BEGIN {_sql_desindexar_busqueda(tabla)} END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_update
+                AFTER UPDATE OF {_COLUMNAS_BUSQUEDA[tabla]} ON {tabla}
+                BEGIN
+                    {_sql_desindexar_busqueda(tabla)}
+                    {_sql_indexar_busqueda(tabla, 'NEW')}
+                END
+            """)
+        
+        if not existia:
+            # Coincidencias en el nombre pesan más que en el RUT, y éste más que en el email
+            cursor.execute("INSERT INTO busqueda (busqueda, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')")
+            for tabla in _FUENTES_BUSQUEDA:
+                cursor.execute(_sql_indexar_busqueda(tabla, 't'))
+            cursor.execute("INSERT INTO busqueda (busqueda) VALUES ('optimize')")
+    
+    @staticmethod
+    def _crear_indice_cargas_rut(cursor):
+        """
+        Reemplaza idx_cargas_rut_num por un índice (rut_num, rut_dv, registro_id)
+        para la búsqueda de conflictos y para agrupar el reporte de duplicados
+        recorriendo el índice en orden.
+        """
+        cursor.execute("DROP INDEX IF EXISTS idx_cargas_rut_num")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cargas_rut_activo
+            ON cargas(rut_num, rut_dv, registro_id) WHERE activo = 1
+        """)
+    
+    @staticmethod
+    def _crear_contadores(cursor):
+        """Crea la tabla de contadores del dashboard y los triggers que la mantienen."""
+        existia = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estadisticas_contadores'"
+        ).fetchone()
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS estadisticas_contadores (
+                clave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        
+        for tabla in _APORTES_CONTADORES:
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_contadores_{tabla}_insert
+                AFTER INSERT ON {tabla}
+                BEGIN {_sql_aplicar_aportes(tabla, 'NEW', 1)} END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_contadores_{tabla}_delete
+                AFTER DELETE ON {tabla}
+                BEGIN {_sql_aplicar_aportes(tabla, 'OLD', -1)} END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_contadores_{tabla}_update
+                AFTER UPDATE OF {_COLUMNAS_CONTADORES[tabla]} ON {tabla}
+                BEGIN
+                    {_sql_aplicar_aportes(tabla, 'OLD', -1)}
+                    {_sql_aplicar_aportes(tabla, 'NEW', 1)}
+                END
+            """)
+        
+        # Base de datos existente: poblar los contadores con los datos actuales
+        if not existia:
+            cursor.execute(
+                f"INSERT INTO estadisticas_contadores (clave, valor) {_sql_recalcular_contadores()}"
+            )
+    
     # ==================== GESTIÓN DE EMPLEADOS ====================
     
     def agregar_empleado(self, rut: str, nombre: str, email: str = None) -> bool:
@@ -115,55 +875,172 @@ class DatabaseService:
             # Normalizar RUT al formato sin puntos
             rut_normalizado = normalizar_rut(rut)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO empleados (rut, nombre, email) VALUES (?, ?, ?)",
-                    (rut_normalizado, nombre, email)
-                )
-                conn.commit()
-                logger.info(f"Empleado agregado: {nombre}")
-                return True
-        except sqlite3.IntegrityError:
+            self._transaccion(lambda conn: conn.execute(
+                "INSERT INTO empleados (rut, nombre, email) VALUES (?, ?, ?)",
+                (rut_normalizado, nombre, email)
+            ))
+            logger.info(f"Empleado agregado: {nombre}")
+            return True
+        except RegistroDuplicadoError:
             logger.warning(f"Empleado ya existe: {rut}")
             return False
         except Exception as e:
             logger.error(f"Error al agregar empleado: {e}")
             return False
     
-    def verificar_empleado_existe(self, rut: str) -> Tuple[bool, Optional[Dict]]:
+    def verificar_empleado_existe(self, rut: str) -> Tuple[bool, Optional[Empleado]]:
         """Verifica si un empleado existe y retorna sus datos."""
         try:
-            # Normalizar RUT para búsqueda consistente
-            rut_normalizado = normalizar_rut(rut)
+            empleado = self._indice_empleados.buscar(rut)
+            return (True, empleado) if empleado else (False, None)
+        except Exception as e:
+            logger.warning(f"Índice de empleados no disponible, se consulta la base: {e}")
+        
+        try:
+            clave = descomponer_rut(rut)
+            if not clave:
+                return False, None
             
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT * FROM empleados WHERE rut = ? AND activo = 1",
-                    (rut_normalizado,)
-                )
-                row = cursor.fetchone()
-                if row:
-                    return True, dict(row)
+            with self._pool.conexion() as conn:
+                empleado = self._cursor(conn, Empleado.fabrica).execute(_SQL_EMPLEADO_POR_RUT, clave).fetchone()
+                if empleado:
+                    return True, empleado
                 return False, None
         except Exception as e:
             logger.error(f"Error al verificar empleado: {e}")
             return False, None
     
-    def obtener_todos_empleados(self) -> List[Dict]:
+    def obtener_todos_empleados(self) -> List[Empleado]:
         """Obtiene todos los empleados activos."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM empleados WHERE activo = 1 ORDER BY nombre")
-                return [dict(row) for row in cursor.fetchall()]
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, Empleado.fabrica).execute(_SQL_EMPLEADOS_ACTIVOS).fetchall()
         except Exception as e:
             logger.error(f"Error al obtener empleados: {e}")
             return []
     
+    @staticmethod
+    def _buscar_columna(df: pd.DataFrame, nombre: str) -> Optional[str]:
+        """Retorna el nombre real de una columna sin distinguir mayúsculas."""
+        for col in df.columns:
+            if str(col).strip().lower() == nombre:
+                return col
+        return None
+    
+    @staticmethod
+    def _columna_texto(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+        """Convierte una columna a texto limpio; los vacíos quedan como ''."""
+        if col is None:
+            return pd.Series('', index=df.index, dtype=object)
+        serie = df[col]
+        if pd.api.types.is_float_dtype(serie):
+            # RUTs leídos como número (ej. 123456785.0)
+            serie = serie.astype('Int64')
+        return serie.astype(object).where(serie.notna(), '').astype(str).str.strip()
+    
+    def _preparar_empleados(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict]]:
+        """
+        Valida y normaliza una planilla completa de empleados.
+        
+        Returns:
+            Tuple[DataFrame, List[Dict]]: (filas válidas con fila/rut/nombre/email, rechazos)
+        """
+        ruts = self._columna_texto(df, self._buscar_columna(df, 'rut'))
+        nombres = self._columna_texto(df, self._buscar_columna(df, 'nombre'))
+        emails = self._columna_texto(df, self._buscar_columna(df, 'email'))
+        
+        filas = pd.DataFrame({
+            'fila': df.index.to_numpy() + 2,  # +1 encabezado, +1 base 1
+            'rut': ruts.to_numpy(),
+            'nombre': nombres.to_numpy(),
+            'email': emails.to_numpy()
+        })
+        
+        # Cada fila se rechaza por su primer error (RUT, nombre y luego email)
+        errores = validar_empleados(filas[['rut', 'nombre', 'email']]).drop_duplicates('fila')
+        rechazadas = filas.loc[errores['fila']]
+        rechazos = [
+            {'fila': int(fila), 'rut': rut, 'motivo': motivo}
+            for fila, rut, motivo in zip(rechazadas['fila'], rechazadas['rut'], errores['mensaje'])
+        ]
+        
+        validas = filas.drop(index=errores['fila'])
+        validas = validas.assign(
+            rut=normalizar_ruts(validas['rut']),
+            email=validas['email'].where(validas['email'] != '', None)
+        )
+        return validas, rechazos
+    
+    @staticmethod
+    def _cargar_staging_empleados(conn, validas: pd.DataFrame):
+        """Carga las filas válidas en la tabla temporal de importación."""
+        conn.execute("DROP TABLE IF EXISTS temp.staging_empleados")
+        conn.execute("""
+            CREATE TEMP TABLE staging_empleados (
+                fila INTEGER NOT NULL,
+                rut TEXT PRIMARY KEY,
+                nombre TEXT NOT NULL,
+                email TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO staging_empleados (fila, rut, nombre, email) VALUES (?, ?, ?, ?)",
+            validas[['fila', 'rut', 'nombre', 'email']].itertuples(index=False, name=None)
+        )
+    
+    def importar_empleados_df(self, df: pd.DataFrame) -> Dict:
+        """
+        Importa empleados desde un DataFrame en una sola transacción.
+        
+        Returns:
+            Dict con 'insertados' (int) y 'rechazados' (lista de {'fila', 'rut', 'motivo'})
+        """
+        validas, rechazos = self._preparar_empleados(df)
+        insertados = 0
+        
+        def importar(conn):
+            self._cargar_staging_empleados(conn, validas)
+            
+            existentes = conn.execute("""
+                SELECT s.fila, s.rut FROM staging_empleados s
+                JOIN empleados e ON e.rut = s.rut
+            """).fetchall()
+            
+            cursor = conn.execute("""
+                INSERT INTO empleados (rut, nombre, email)
+                SELECT rut, nombre, email FROM staging_empleados WHERE true
+                ON CONFLICT(rut) DO NOTHING
+            """)
+            conn.execute("DROP TABLE temp.staging_empleados")
+            return existentes, cursor.rowcount
+        
+        if not validas.empty:
+            existentes, insertados = self._transaccion(importar)
+            rechazos.extend(
+                {'fila': fila, 'rut': rut, 'motivo': 'RUT ya existe'}
+                for fila, rut in existentes
+            )
+        
+        rechazos.sort(key=lambda r: r['fila'])
+        logger.info(f"Importación masiva: {insertados} empleados insertados, {len(rechazos)} rechazados")
+        return {'insertados': insertados, 'rechazados': rechazos}
+    
+    def _leer_planilla_empleados(self, archivo_path: str) -> Tuple[Optional[pd.DataFrame], str]:
+        """Lee la planilla de empleados y verifica columnas requeridas."""
+        df = pd.read_excel(archivo_path)
+        
+        # Verificar que hay datos
+        if df.empty:
+            return None, "El archivo está vacío"
+        
+        # Verificar columnas requeridas
+        if self._buscar_columna(df, 'rut') is None:
+            return None, "El archivo no tiene columna 'RUT'"
+        if self._buscar_columna(df, 'nombre') is None:
+            return None, "El archivo no tiene columna 'Nombre'"
+        
+        return df, ""
+    
     def importar_empleados_excel(self, archivo_path: str) -> Tuple[int, int, str]:
         """
         Importa empleados desde un archivo Excel.
@@ -172,146 +1049,329 @@ class DatabaseService:
             Tuple[int, int, str]: (exitosos, fallidos, mensaje_error)
         """
         try:
-            df = pd.read_excel(archivo_path)
-            
-            # Verificar que hay datos
-            if df.empty:
-                return 0, 0, "El archivo está vacío"
+            df, error = self._leer_planilla_empleados(archivo_path)
+            if df is None:
+                return 0, 0, error
             
-            # Verificar columnas requeridas
-            columnas = [col.lower() for col in df.columns]
-            if 'rut' not in columnas and 'RUT' not in df.columns:
-                return 0, 0, "El archivo no tiene columna 'RUT'"
-            if 'nombre' not in columnas and 'Nombre' not in df.columns:
-                return 0, 0, "El archivo no tiene columna 'Nombre'"
-            
-            exitosos = 0
-            fallidos = 0
-            errores = []
-            
-            for idx, row in df.iterrows():
-                rut = str(row.get('RUT', row.get('rut', ''))).strip()
-                nombre = str(row.get('Nombre', row.get('nombre', ''))).strip()
-                email = None
-                if 'Email' in row:
-                    email = str(row.get('Email', '')).strip()
-                elif 'email' in row:
-                    email = str(row.get('email', '')).strip()
-                
-                # Limpiar valores nan
-                if rut == 'nan':
-                    rut = ''
-                if nombre == 'nan':
-                    nombre = ''
-                if email == 'nan':
-                    email = None
-                
-                if rut and nombre:
-                    if self.agregar_empleado(rut, nombre, email):
-                        exitosos += 1
-                    else:
-                        fallidos += 1
-                        errores.append(f"Fila {idx+2}: RUT {rut} ya existe o es inválido")
-                else:
-                    fallidos += 1
-                    errores.append(f"Fila {idx+2}: RUT o Nombre vacío")
+            resultado = self.importar_empleados_df(df)
+            rechazados = resultado['rechazados']
+            errores = [f"Fila {r['fila']}: {r['motivo']} ({r['rut'] or 'sin RUT'})" for r in rechazados]
             
             error_msg = "; ".join(errores[:5]) if errores else ""  # Mostrar máx 5 errores
             if len(errores) > 5:
                 error_msg += f" ... y {len(errores)-5} más"
             
-            return exitosos, fallidos, error_msg
+            return resultado['insertados'], len(rechazados), error_msg
             
         except Exception as e:
             logger.error(f"Error al importar empleados: {e}")
             return 0, 0, str(e)
     
+    def sincronizar_empleados_df(self, df: pd.DataFrame, aplicar: bool = True) -> Dict:
+        """
+        Sincroniza la tabla de empleados con la nómina completa.
+        
+        Calcula la diferencia contra la nómina (nuevos, modificados y faltantes)
+        y, si aplicar es True, la aplica en una sola transacción: inserta los
+        nuevos, actualiza nombre/email (reactivando si corresponde) y marca
+        activo = 0 a quienes ya no están en la nómina.
+        
+        Returns:
+            Dict con listas de RUT 'nuevos', 'modificados', 'desactivados',
+            el conteo 'sin_cambios', 'rechazados' y 'aplicado'
+        """
+        validas, rechazos = self._preparar_empleados(df)
+        resumen = {
+            'nuevos': [],
+            'modificados': [],
+            'desactivados': [],
+            'sin_cambios': 0,
+            'rechazados': rechazos,
+            'aplicado': False
+        }
+        
+        # Una nómina sin filas válidas desactivaría a todos los empleados
+        if validas.empty:
+            logger.warning("Sincronización cancelada: la nómina no tiene filas válidas")
+            return resumen
+        
+        # Sin columna Email no se tocan los correos existentes
+        con_email = self._buscar_columna(df, 'email') is not None
+        
+        def sincronizar(conn):
+            self._cargar_staging_empleados(conn, validas)
+            
+            resumen['nuevos'] = [row[0] for row in conn.execute("""
+                SELECT s.rut FROM staging_empleados s
+                LEFT JOIN empleados e ON e.rut = s.rut
+                WHERE e.id IS NULL
+                ORDER BY s.fila
+            """)]
+            resumen['modificados'] = [row[0] for row in conn.execute("""
+                SELECT s.rut FROM staging_empleados s
+                JOIN empleados e ON e.rut = s.rut
+                WHERE e.nombre IS NOT s.nombre
+                   OR (? AND e.email IS NOT s.email)
+                   OR e.activo = 0
+                ORDER BY s.fila
+            """, (con_email,))]
+            resumen['desactivados'] = [row[0] for row in conn.execute("""
+                SELECT e.rut FROM empleados e
+                WHERE e.activo = 1
+                AND NOT EXISTS (SELECT 1 FROM staging_empleados s WHERE s.rut = e.rut)
+                ORDER BY e.nombre
+            """)]
+            resumen['sin_cambios'] = len(validas) - len(resumen['nuevos']) - len(resumen['modificados'])
+            
+            if aplicar:
+                conn.execute("""
+                    INSERT INTO empleados (rut, nombre, email)
+                    SELECT rut, nombre, email FROM staging_empleados WHERE true
+                    ON CONFLICT(rut) DO UPDATE SET
+                        nombre = excluded.nombre,
+                        email = CASE WHEN :con_email THEN excluded.email ELSE empleados.email END,
+                        activo = 1
+                    WHERE empleados.nombre IS NOT excluded.nombre
+                       OR (:con_email AND empleados.email IS NOT excluded.email)
+                       OR empleados.activo = 0
+                """, {'con_email': con_email})
+                conn.execute("""
+                    UPDATE empleados SET activo = 0
+                    WHERE activo = 1
+                    AND rut NOT IN (SELECT rut FROM staging_empleados)
+                """)
+                resumen['aplicado'] = True
+            
+            conn.execute("DROP TABLE temp.staging_empleados")
+        
+        self._transaccion(sincronizar)
+        
+        logger.info(
+            f"Sincronización de nómina ({'aplicada' if aplicar else 'simulada'}): "
+            f"{len(resumen['nuevos'])} nuevos, {len(resumen['modificados'])} modificados, "
+            f"{len(resumen['desactivados'])} desactivados, {len(rechazos)} rechazados"
+        )
+        return resumen
+    
+    def sincronizar_empleados_excel(self, archivo_path: str, aplicar: bool = True) -> Dict:
+        """
+        Sincroniza la tabla de empleados con la nómina completa de un Excel.
+        
+        Returns:
+            Dict con el resumen de sincronizar_empleados_df, o {'error': mensaje}
+        """
+        try:
+            df, error = self._leer_planilla_empleados(archivo_path)
+            if df is None:
+                return {'error': error}
+            return self.sincronizar_empleados_df(df, aplicar=aplicar)
+        except Exception as e:
+            logger.error(f"Error al sincronizar empleados: {e}")
+            return {'error': str(e)}
+    
     # ==================== GESTIÓN DE REGISTROS ====================
     
     def crear_registro_trabajador(self, rut: str, nombre: str, email: str,
                                    banco: str = None, tipo_cuenta: str = None,
                                    numero_cuenta: str = None) -> Optional[int]:
-        """Crea un nuevo registro de trabajador."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO registros_trabajador 
-                    (rut_trabajador, nombre_trabajador, email, banco, tipo_cuenta, numero_cuenta)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (rut, nombre, email, banco, tipo_cuenta, numero_cuenta))
-                conn.commit()
-                registro_id = cursor.lastrowid
-                logger.info(f"Registro creado: {nombre} (ID: {registro_id})")
-                return registro_id
+        """
+        Crea un nuevo registro de trabajador.
+        
+        Returns:
+            Optional[int]: ID del registro, o None si hubo un error inesperado
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        def insertar(conn):
+            cursor = conn.execute("""
+                INSERT INTO registros_trabajador 
+                (rut_trabajador, nombre_trabajador, email, banco, tipo_cuenta, numero_cuenta)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (formatear_rut(rut), nombre, email, banco, tipo_cuenta, numero_cuenta))
+            return cursor.lastrowid
+        
+        try:
+            registro_id = self._escribir(insertar)
+            self._invalidar_cache_rut(rut)
+            logger.info(f"Registro creado: {nombre} (ID: {registro_id})")
+            return registro_id
         except Exception as e:
             logger.error(f"Error al crear registro: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
             return None
     
+    def _invalidar_cache_rut(self, rut: str):
+        """Descarta de la caché el registro de un RUT."""
+        clave = descomponer_rut(rut)
+        if clave:
+            self._cache_registros.invalidar(clave)
+    
+    @staticmethod
+    def _conflictos_carga(conn: sqlite3.Connection, rut: str, rut_num_trabajador: Optional[int]) -> List[ConflictoCarga]:
+        """Cargas activas de otros trabajadores con el mismo RUT canónico."""
+        clave = descomponer_rut(rut)
+        if not clave:
+            return []
+        return DatabaseService._cursor(conn, ConflictoCarga.fabrica).execute(
+            _SQL_CONFLICTOS_CARGA, (*clave, rut_num_trabajador)
+        ).fetchall()
+    
+    @staticmethod
+    def _verificar_cargas_libres(conn: sqlite3.Connection, ruts: List[str], rut_num_trabajador: Optional[int]):
+        """Lanza CargaDuplicadaError si algún RUT ya es carga activa de otro trabajador."""
+        for rut in ruts:
+            conflictos = DatabaseService._conflictos_carga(conn, rut, rut_num_trabajador)
+            if conflictos:
+                raise CargaDuplicadaError(formatear_rut(rut), conflictos)
+    
+    def buscar_conflictos_carga(self, rut: str, rut_trabajador: str = None) -> List[ConflictoCarga]:
+        """
+        Busca si un RUT ya está declarado como carga activa por otro trabajador.
+        
+        Args:
+            rut: RUT de la carga en cualquier formato
+            rut_trabajador: Trabajador que la declara; sus propios registros no cuentan
+        
+        Returns:
+            List[ConflictoCarga]: Cargas que chocan (vacía si no hay conflicto o hubo error)
+        """
+        try:
+            clave_trabajador = descomponer_rut(rut_trabajador)
+            with self._pool.conexion() as conn:
+                return self._conflictos_carga(conn, rut, clave_trabajador[0] if clave_trabajador else None)
+        except Exception as e:
+            logger.error(f"Error al buscar conflictos de carga: {e}")
+            return []
+    
     def agregar_carga_a_registro(self, registro_id: int, tipo: str, rut: str,
-                                  nombre: str, sexo: str, fecha_nacimiento, edad: int) -> bool:
-        """Agrega una carga familiar a un registro."""
+                                  nombre: str, sexo: str, fecha_nacimiento, edad: int) -> Optional[Registro]:
+        """
+        Agrega una carga familiar a un registro.
+        
+        Returns:
+            Optional[Registro]: El registro actualizado con sus cargas, o None si
+            hubo un error inesperado
+        
+        Raises:
+            CargaDuplicadaError: Si la carga ya está declarada por otro trabajador
+            ErrorBaseDatos: O otra subclase, si la base rechazó la escritura
+        """
+        def insertar(conn):
+            fila = conn.execute("SELECT rut_num FROM registros_trabajador WHERE id = ?", (registro_id,)).fetchone()
+            self._verificar_cargas_libres(conn, [rut], fila[0] if fila else None)
+            conn.execute("""
+                INSERT INTO cargas (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (registro_id, tipo, formatear_rut(rut), nombre, sexo, fecha_nacimiento, edad))
+            return self._releer_registro(conn, registro_id)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
+            registro = self._escribir(insertar)
+            self._cachear_registro(registro)
+            logger.info(f"Carga agregada: {nombre}")
+            return registro
+        except CargaDuplicadaError as e:
+            logger.warning(str(e))
+            raise
+        except Exception as e:
+            logger.error(f"Error al agregar carga: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
+            return None
+    
+    def crear_registro_completo(self, rut: str, nombre: str, email: str,
+                                banco: str = None, tipo_cuenta: str = None,
+                                numero_cuenta: str = None, cargas: List[Dict] = None) -> Optional[Registro]:
+        """
+        Crea un registro de trabajador junto con todas sus cargas en una sola
+        transacción. Si alguna inserción falla no queda nada escrito.
+        
+        Args:
+            cargas: Lista de dicts con tipo, rut, nombre, sexo, fecha_nacimiento y edad
+        
+        Returns:
+            Registro persistido (con su lista 'cargas'), o None si hubo un error inesperado
+        
+        Raises:
+            CargaDuplicadaError: Si alguna carga ya está declarada por otro trabajador
+            RegistroDuplicadoError: Si una fila viola una restricción de la tabla
+            ErrorBaseDatos: O otra subclase, si la base rechazó la escritura
+        """
+        def insertar(conn):
+            registro = self._cursor(conn, Registro.fabrica).execute(f"""
+                INSERT INTO registros_trabajador
+                (rut_trabajador, nombre_trabajador, email, banco, tipo_cuenta, numero_cuenta)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING {Registro.columnas()}
+            """, (formatear_rut(rut), nombre, email, banco, tipo_cuenta, numero_cuenta)).fetchone()
+            
+            self._verificar_cargas_libres(conn, [carga['rut'] for carga in cargas or []], registro.rut_num)
+            registro.cargas = []
+            cursor = self._cursor(conn, Carga.fabrica)
+            for carga in cargas or []:
+                cursor.execute(f"""
                     INSERT INTO cargas (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad))
-                conn.commit()
-                logger.info(f"Carga agregada: {nombre}")
-                return True
+                    RETURNING {Carga.columnas()}
+                """, (registro.id, carga['tipo'], formatear_rut(carga['rut']), carga['nombre'],
+                      carga.get('sexo'), carga['fecha_nacimiento'], carga['edad']))
+                registro.cargas.append(cursor.fetchone())
+            return registro
+        
+        try:
+            registro = self._escribir(insertar)
+            self._invalidar_cache_rut(rut)
+            logger.info(f"Registro creado: {nombre} (ID: {registro.id}, {len(registro.cargas)} cargas)")
+            return registro
+        except CargaDuplicadaError as e:
+            logger.warning(str(e))
+            raise
         except Exception as e:
-            logger.error(f"Error al agregar carga: {e}")
-            return False
+            logger.error(f"Error al crear registro completo: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
+            return None
     
-    def obtener_registro_con_cargas(self, registro_id: int) -> Optional[Dict]:
+    def obtener_registro_con_cargas(self, registro_id: int) -> Optional[Registro]:
         """Obtiene un registro con sus cargas."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM registros_trabajador WHERE id = ?", (registro_id,))
-                registro = cursor.fetchone()
-                
-                if registro:
-                    registro = dict(registro)
-                    cursor.execute(
-                        "SELECT * FROM cargas WHERE registro_id = ? AND activo = 1",
-                        (registro_id,)
-                    )
-                    registro['cargas'] = [dict(row) for row in cursor.fetchall()]
-                    return registro
-                return None
+            with self._pool.conexion() as conn:
+                return self._releer_registro(conn, registro_id)
         except Exception as e:
             logger.error(f"Error al obtener registro: {e}")
             return None
     
     def marcar_email_enviado(self, registro_id: int) -> bool:
-        """Marca un registro como email enviado."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE registros_trabajador SET email_enviado = 1 WHERE id = ?",
-                    (registro_id,)
-                )
-                conn.commit()
-                return True
-        except:
+        """
+        Marca un registro como email enviado.
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        def marcar(conn):
+            conn.execute("UPDATE registros_trabajador SET email_enviado = 1 WHERE id = ?", (registro_id,))
+            return self._releer_registro(conn, registro_id)
+        
+        try:
+            self._cachear_registro(self._escribir(marcar))
+            return True
+        except Exception as e:
+            logger.error(f"Error al marcar email enviado: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
             return False
     
     # ==================== ADMINISTRACIÓN ====================
     
-    def obtener_todos_registros(self) -> List[Dict]:
+    def obtener_todos_registros(self) -> List[RegistroListado]:
         """Obtiene todos los registros para el administrador."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT r.*, 
+            with self._pool.conexion() as conn:
+                cursor = self._cursor(conn, RegistroListado.fabrica)
+                cursor.execute(f"""
+                    SELECT {RegistroListado.columnas('r')},
                            GROUP_CONCAT(c.nombre || ' (' || c.tipo || ')') as nombres_cargas
                     FROM registros_trabajador r
                     LEFT JOIN cargas c ON r.id = c.registro_id AND c.activo = 1
@@ -319,11 +1379,109 @@ class DatabaseService:
                     GROUP BY r.id
                     ORDER BY r.fecha_registro DESC
                 """)
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"Error al obtener registros: {e}")
             return []
     
+    def obtener_registros_pagina(self, limite: int = 50, cursor: Tuple[str, int] = None,
+                                 rut: str = None, nombre: str = None, banco: str = None,
+                                 fecha_desde: date = None,
+                                 fecha_hasta: date = None) -> Tuple[List[RegistroListado], Optional[Tuple[str, int]]]:
+        """
+        Obtiene una página de registros activos, del más reciente al más antiguo.
+        
+        Args:
+            limite: Cantidad de registros por página
+            cursor: (fecha_registro, id) del último registro de la página anterior
+            rut, nombre, banco, fecha_desde, fecha_hasta: Filtros opcionales
+            
+        Returns:
+            Tuple[List[RegistroListado], Optional[Tuple]]: (registros, cursor de la página
+            siguiente o None si no hay más)
+        """
+        filtros = ""
+        parametros = list(cursor or _CURSOR_INICIAL)
+        
+        if rut:
+            clave = descomponer_rut(rut)
+            if not clave:
+                return [], None
+            filtros += " AND r.rut_num = ? AND r.rut_dv = ?"
+            parametros.extend(clave)
+        if nombre:
+            filtros += " AND r.nombre_trabajador LIKE ?"
+            parametros.append(f"%{nombre.strip()}%")
+        if banco:
+            filtros += " AND r.banco = ?"
+            parametros.append(banco)
+        if fecha_desde:
+            filtros += " AND r.fecha_registro >= ?"
+            parametros.append(fecha_desde.isoformat())
+        if fecha_hasta:
+            filtros += " AND r.fecha_registro < ?"
+            parametros.append((fecha_hasta + timedelta(days=1)).isoformat())
+        
+        # Se pide una fila extra para saber si existe una página siguiente
+        parametros.append(limite + 1)
+        
+        try:
+            with self._pool.conexion() as conn:
+                filas = self._cursor(conn, RegistroListado.fabrica).execute(
+                    _SQL_PAGINA_REGISTROS.format(filtros=filtros), parametros
+                ).fetchall()
+            
+            registros = filas[:limite]
+            siguiente = None
+            if len(filas) > limite:
+                ultimo = registros[-1]
+                siguiente = (ultimo.fecha_registro, ultimo.id)
+            return registros, siguiente
+        except Exception as e:
+            logger.error(f"Error al obtener página de registros: {e}")
+            return [], None
+    
+    def buscar(self, texto: str, limite: int = 20) -> List[ResultadoBusqueda]:
+        """
+        Busca empleados, registros y cargas por nombre, RUT o email.
+        
+        Cada palabra se busca como prefijo, sin distinguir mayúsculas ni
+        tildes, y el RUT se encuentra con o sin puntos y guion.
+        
+        Args:
+            texto: Texto ingresado en el buscador
+            limite: Cantidad máxima de resultados
+            
+        Returns:
+            List[ResultadoBusqueda]: Coincidencias de la más a la menos relevante
+        """
+        consulta = _consulta_busqueda(texto)
+        if consulta is None:
+            return []
+        
+        try:
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, ResultadoBusqueda.fabrica).execute(
+                    _SQL_BUSCAR, (consulta, limite)
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Error al buscar '{texto}': {e}")
+            return []
+    
+    def reporte_cargas_duplicadas(self) -> List[ConflictoCarga]:
+        """
+        Lista las cargas activas declaradas por más de un trabajador.
+        
+        Returns:
+            List[ConflictoCarga]: Una fila por declaración, agrupadas por RUT de la carga
+        """
+        try:
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, ConflictoCarga.fabrica).execute(_SQL_CARGAS_DUPLICADAS).fetchall()
+        except Exception as e:
+            logger.error(f"Error al generar reporte de cargas duplicadas: {e}")
+            return []
+    
     def exportar_registros_excel(self, archivo_salida: str = None) -> bool:
         """Exporta registros a Excel."""
         try:
@@ -331,51 +1489,11 @@ class DatabaseService:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 archivo_salida = str(EXPORTS_DIR / f"registros_{timestamp}.xlsx")
             
-            Path(archivo_salida).parent.mkdir(parents=True, exist_ok=True)
-            
-            with sqlite3.connect(self.db_path) as conn:
-                df_registros = pd.read_sql_query("""
-                    SELECT 
-                        rut_trabajador as 'RUT',
-                        nombre_trabajador as 'Nombre',
-                        email as 'Email',
-                        banco as 'Banco',
-                        tipo_cuenta as 'Tipo Cuenta',
-                        numero_cuenta as 'Número Cuenta',
-                        fecha_registro as 'Fecha Registro'
-                    FROM registros_trabajador
-                    WHERE activo = 1
-                    ORDER BY fecha_registro DESC
-                """, conn)
-                
-                df_cargas = pd.read_sql_query("""
-                    SELECT 
-                        r.rut_trabajador as 'RUT Trabajador',
-                        r.nombre_trabajador as 'Nombre Trabajador',
-                        r.email as 'Email Trabajador',
-                        r.banco as 'Banco',
-                        r.tipo_cuenta as 'Tipo Cuenta',
-                        r.numero_cuenta as 'Número Cuenta',
-                        c.tipo as 'Tipo Carga',
-                        c.rut as 'RUT Carga',
-                        c.nombre as 'Nombre Carga',
-                        c.fecha_nacimiento as 'Fecha Nacimiento',
-                        c.edad as 'Edad'
-                    FROM cargas c
-                    JOIN registros_trabajador r ON c.registro_id = r.id
-                    WHERE c.activo = 1 AND r.activo = 1
-                    ORDER BY r.nombre_trabajador, c.tipo
-                """, conn)
-            
-            with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-                if 'Fecha Registro' in df_registros.columns:
-                    df_registros['Fecha Registro'] = pd.to_datetime(df_registros['Fecha Registro']).dt.strftime('%d-%m-%y')
-                
-                if 'Fecha Nacimiento' in df_cargas.columns:
-                    df_cargas['Fecha Nacimiento'] = pd.to_datetime(df_cargas['Fecha Nacimiento']).dt.strftime('%d-%m-%y')
-                
-                df_registros.to_excel(writer, sheet_name='Trabajadores', index=False)
-                df_cargas.to_excel(writer, sheet_name='Cargas Familiares', index=False)
+            with self._pool.conexion() as conn:
+                exportar_hojas(conn, archivo_salida, [
+                    ('Trabajadores', _SQL_EXPORTAR_REGISTROS, ()),
+                    ('Cargas Familiares', _SQL_EXPORTAR_CARGAS, ())
+                ])
             
             logger.info(f"Registros exportados a {archivo_salida}")
             return True
@@ -386,271 +1504,466 @@ class DatabaseService:
     def obtener_estadisticas(self) -> Dict:
         """Obtiene estadísticas completas para el dashboard."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT COUNT(*) FROM empleados WHERE activo = 1")
-                total_empleados = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM registros_trabajador WHERE activo = 1")
-                total_registros = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM cargas WHERE activo = 1")
-                total_cargas = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT tipo, COUNT(*) FROM cargas WHERE activo = 1 GROUP BY tipo")
-                cargas_por_tipo = dict(cursor.fetchall())
-                
-                cursor.execute("SELECT sexo, COUNT(*) FROM cargas WHERE activo = 1 AND sexo IS NOT NULL GROUP BY sexo")
-                cargas_por_sexo = dict(cursor.fetchall())
-                
-                cursor.execute("SELECT COUNT(*) FROM registros_trabajador WHERE email_enviado = 1")
-                emails_enviados = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM registros_trabajador WHERE activo = 1 AND enviado_aseguradora = 1")
-                registros_enviados_aseguradora = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM registros_trabajador WHERE activo = 1 AND (enviado_aseguradora = 0 OR enviado_aseguradora IS NULL)")
-                registros_pendientes = cursor.fetchone()[0]
-                
-                # Contar hijos por género
-                cursor.execute("SELECT sexo, COUNT(*) FROM cargas WHERE activo = 1 AND tipo = 'Hijo' AND sexo IS NOT NULL GROUP BY sexo")
-                hijos_por_sexo = dict(cursor.fetchall())
-                
-                # Contar cónyuges por género
-                cursor.execute("SELECT sexo, COUNT(*) FROM cargas WHERE activo = 1 AND tipo = 'Cónyuge' AND sexo IS NOT NULL GROUP BY sexo")
-                conyuges_por_sexo = dict(cursor.fetchall())
-                
-                return {
-                    'total_empleados': total_empleados,
-                    'total_registros': total_registros,
-                    'total_cargas': total_cargas,
-                    'cargas_por_tipo': cargas_por_tipo,
-                    'cargas_por_sexo': cargas_por_sexo,
-                    'hijos_por_sexo': hijos_por_sexo,
-                    'conyuges_por_sexo': conyuges_por_sexo,
-                    'emails_enviados': emails_enviados,
-                    'registros_enviados': registros_enviados_aseguradora,
-                    'registros_pendientes': registros_pendientes
-                }
+            with self._pool.conexion() as conn:
+                contadores = conn.execute(
+                    "SELECT clave, valor FROM estadisticas_contadores"
+                ).fetchall()
+            
+            stats = {
+                'total_empleados': 0,
+                'total_registros': 0,
+                'total_cargas': 0,
+                'cargas_por_tipo': {},
+                'cargas_por_sexo': {},
+                'hijos_por_sexo': {},
+                'conyuges_por_sexo': {},
+                'emails_enviados': 0,
+                'registros_enviados': 0,
+                'registros_pendientes': 0
+            }
+            for clave, valor in contadores:
+                if ':' in clave:
+                    # Contadores agrupados, ej. 'cargas_por_tipo:Hijo'
+                    grupo, valor_grupo = clave.split(':', 1)
+                    if valor:
+                        stats[grupo][valor_grupo] = valor
+                else:
+                    stats[clave] = valor
+            return stats
         except Exception as e:
             logger.error(f"Error al obtener estadísticas: {e}")
             return {}
     
+    def obtener_edades_cargas(self, referencia: date = None, edad_maxima_hijo: int = None) -> pd.DataFrame:
+        """
+        Edades vigentes de las cargas activas, calculadas en una sola pasada.
+        
+        La columna edad de cargas es la edad al momento del registro; aquí se
+        recalcula desde fecha_nacimiento a la fecha de referencia.
+        
+        Args:
+            referencia: Fecha a la que se calculan las edades (por defecto, hoy)
+            edad_maxima_hijo: Si se indica, agrega la columna sobre_edad_maxima
+        
+        Returns:
+            DataFrame con id, tipo, sexo, rut, nombre, rut_trabajador,
+            fecha_nacimiento y edad (Int64, nula si la fecha no se reconoce), más
+            sobre_edad_maxima (bool, solo hijos) si se indicó edad_maxima_hijo
+        """
+        columnas = ['id', 'tipo', 'sexo', 'rut', 'nombre', 'rut_trabajador', 'fecha_nacimiento']
+        try:
+            with self._pool.conexion() as conn:
+                filas = self._cursor(conn, None).execute(_SQL_NACIMIENTOS_CARGAS).fetchall()
+        except Exception as e:
+            logger.error(f"Error al obtener edades de cargas: {e}")
+            filas = []
+        
+        cargas = pd.DataFrame(filas, columns=columnas)
+        fechas = convertir_fechas(cargas['fecha_nacimiento'])
+        validas = ~np.isnat(fechas)
+        cargas['edad'] = pd.Series(pd.NA, index=cargas.index, dtype='Int64')
+        cargas.loc[validas, 'edad'] = calcular_edades(fechas[validas], referencia or date.today())
+        if edad_maxima_hijo is not None:
+            cargas['sobre_edad_maxima'] = (
+                (cargas['tipo'] == TIPO_HIJO) & (cargas['edad'] > edad_maxima_hijo)
+            ).fillna(False).astype(bool)
+        return cargas
+    
+    def verificar_contadores(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Compara los contadores del dashboard con un recálculo desde las tablas.
+        
+        Returns:
+            Dict {clave: (valor_actual, valor_esperado)} solo con las claves desviadas
+        """
+        with self._pool.conexion() as conn:
+            actuales = dict(conn.execute("SELECT clave, valor FROM estadisticas_contadores").fetchall())
+            esperados = dict(conn.execute(_sql_recalcular_contadores()).fetchall())
+        
+        return {
+            clave: (actuales.get(clave, 0), esperados.get(clave, 0))
+            for clave in set(actuales) | set(esperados)
+            if actuales.get(clave, 0) != esperados.get(clave, 0)
+        }
+    
+    def reconstruir_contadores(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Recalcula todos los contadores del dashboard desde las tablas base.
+        
+        Returns:
+            Dict con las desviaciones corregidas (ver verificar_contadores)
+        """
+        def reconstruir(conn):
+            conn.execute("DELETE FROM estadisticas_contadores")
+            conn.execute(f"INSERT INTO estadisticas_contadores (clave, valor) {_sql_recalcular_contadores()}")
+        
+        desviaciones = self.verificar_contadores()
+        self._transaccion(reconstruir)
+        
+        if desviaciones:
+            logger.warning(f"Contadores reconstruidos, {len(desviaciones)} desviaciones corregidas: {desviaciones}")
+        else:
+            logger.info("Contadores reconstruidos sin desviaciones")
+        return desviaciones
+    
     # ==================== PORTAL DE AUTOSERVICIO ====================
     
-    def obtener_registro_por_rut(self, rut_trabajador: str) -> Optional[Dict]:
+    def login_trabajador(self, rut: str) -> Optional[Dict]:
+        """
+        Resuelve el ingreso de un trabajador: empleado, registro activo y cargas.
+        
+        El empleado sale del índice en memoria y el registro con sus cargas de
+        la caché o de una sola consulta, de modo que el ingreso cuesta a lo más
+        un viaje a la base.
+        
+        Args:
+            rut: RUT del trabajador en cualquier formato
+            
+        Returns:
+            Optional[Dict]: {'empleado': Empleado, 'registro': Registro con sus cargas o None},
+            o None si el RUT no pertenece a un empleado activo
+        """
+        es_empleado, empleado = self.verificar_empleado_existe(rut)
+        if not es_empleado:
+            return None
+        
+        return {'empleado': empleado, 'registro': self.obtener_registro_por_rut(rut)}
+    
+    def _releer_registro(self, conn: sqlite3.Connection, registro_id: int) -> Optional[Registro]:
+        """Relee un registro con sus cargas activas dentro de la transacción que lo modificó."""
+        cursor = self._cursor(conn, Registro.fabrica_con_cargas)
+        return cursor.execute(_SQL_REGISTRO_CON_CARGAS_POR_ID, (registro_id,)).fetchone()
+    
+    def _cachear_registro(self, registro: Optional[Registro]):
+        """
+        Actualiza la caché con un registro ya confirmado en la base.
+        Un registro dado de baja se quita, porque la caché solo guarda activos.
+        """
+        if not registro:
+            return
+        clave = (registro.rut_num, registro.rut_dv)
+        if registro.activo:
+            self._cache_registros.guardar(clave, registro)
+        else:
+            self._cache_registros.invalidar(clave)
+    
+    def obtener_registro_por_rut(self, rut_trabajador: str) -> Optional[Registro]:
         """Obtiene el registro activo de un trabajador por su RUT."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_trabajador 
-                    WHERE rut_trabajador = ? AND activo = 1
-                    ORDER BY fecha_registro DESC LIMIT 1
-                """, (rut_trabajador,))
-                
-                row = cursor.fetchone()
-                if row:
-                    registro = dict(row)
-                    cursor.execute("""
-                        SELECT * FROM cargas 
-                        WHERE registro_id = ? AND activo = 1
-                        ORDER BY tipo, nombre
-                    """, (registro['id'],))
-                    registro['cargas'] = [dict(r) for r in cursor.fetchall()]
-                    return registro
+            clave = descomponer_rut(rut_trabajador)
+            if not clave:
                 return None
+            
+            registro = self._cache_registros.obtener(clave)
+            if registro is not None:
+                return registro
+            
+            with self._pool.conexion() as conn:
+                registro = self._cursor(conn, Registro.fabrica_con_cargas).execute(
+                    _SQL_REGISTRO_CON_CARGAS_POR_RUT, clave
+                ).fetchone()
+            
+            if not registro:
+                return None
+            
+            self._cache_registros.guardar(clave, registro)
+            return registro
         except Exception as e:
             logger.error(f"Error al obtener registro por RUT: {e}")
             return None
     
-    def eliminar_carga(self, carga_id: int, rut_trabajador: str, nombre_trabajador: str) -> bool:
-        """Marca una carga como eliminada y notifica al admin."""
+    def eliminar_carga(self, carga_id: int, rut_trabajador: str, nombre_trabajador: str) -> Optional[Registro]:
+        """
+        Marca una carga como eliminada y notifica al admin.
+        
+        Returns:
+            Optional[Registro]: El registro actualizado con sus cargas, o None si la
+            carga no existe o hubo un error inesperado
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        def eliminar(conn):
+            carga = conn.execute(
+                "SELECT tipo, nombre, rut, registro_id FROM cargas WHERE id = ?", (carga_id,)
+            ).fetchone()
+            
+            if not carga:
+                return None
+            
+            conn.execute("""
+                UPDATE cargas SET activo = 0, fecha_eliminacion = CURRENT_TIMESTAMP WHERE id = ?
+            """, (carga_id,))
+            
+            descripcion = f"Eliminó carga: {carga[0]} - {carga[1]} (RUT: {carga[2]})"
+            conn.execute("""
+                INSERT INTO notificaciones_admin (tipo, rut_trabajador, nombre_trabajador, descripcion)
+                VALUES ('ELIMINACION_CARGA', ?, ?, ?)
+            """, (formatear_rut(rut_trabajador), nombre_trabajador, descripcion))
+            
+            return self._releer_registro(conn, carga['registro_id'])
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT tipo, nombre, rut FROM cargas WHERE id = ?", (carga_id,))
-                carga = cursor.fetchone()
-                
-                if not carga:
-                    return False
-                
-                cursor.execute("""
-                    UPDATE cargas SET activo = 0, fecha_eliminacion = CURRENT_TIMESTAMP WHERE id = ?
-                """, (carga_id,))
-                
-                descripcion = f"Eliminó carga: {carga[0]} - {carga[1]} (RUT: {carga[2]})"
-                cursor.execute("""
-                    INSERT INTO notificaciones_admin (tipo, rut_trabajador, nombre_trabajador, descripcion)
-                    VALUES ('ELIMINACION_CARGA', ?, ?, ?)
-                """, (rut_trabajador, nombre_trabajador, descripcion))
-                
-                conn.commit()
-                logger.info(f"Carga {carga_id} eliminada por {nombre_trabajador}")
-                return True
+            registro = self._escribir(eliminar)
+            if not registro:
+                return None
+            
+            self._cachear_registro(registro)
+            logger.info(f"Carga {carga_id} eliminada por {nombre_trabajador}")
+            return registro
         except Exception as e:
             logger.error(f"Error al eliminar carga: {e}")
-            return False
+            if isinstance(e, ErrorBaseDatos):
+                raise
+            return None
     
     def dar_baja_seguro(self, registro_id: int, rut_trabajador: str, 
-                        nombre_trabajador: str, motivo: str = "Solicitud del trabajador") -> bool:
-        """Da de baja el seguro de un trabajador."""
+                        nombre_trabajador: str, motivo: str = "Solicitud del trabajador") -> Optional[Registro]:
+        """
+        Da de baja el seguro de un trabajador.
+        
+        Returns:
+            Optional[Registro]: El registro dado de baja (activo = 0), o None si hubo
+            un error inesperado
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        def dar_baja(conn):
+            conn.execute("""
+                UPDATE registros_trabajador 
+                SET activo = 0, fecha_baja = CURRENT_TIMESTAMP, motivo_baja = ?
+                WHERE id = ?
+            """, (motivo, registro_id))
+            
+            conn.execute("""
+                UPDATE cargas SET activo = 0, fecha_eliminacion = CURRENT_TIMESTAMP
+                WHERE registro_id = ?
+            """, (registro_id,))
+            
+            conn.execute("""
+                INSERT INTO notificaciones_admin (tipo, rut_trabajador, nombre_trabajador, descripcion)
+                VALUES ('BAJA_SEGURO', ?, ?, ?)
+            """, (formatear_rut(rut_trabajador), nombre_trabajador, f"Solicitó BAJA del seguro. Motivo: {motivo}"))
+            
+            return self._releer_registro(conn, registro_id)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    UPDATE registros_trabajador 
-                    SET activo = 0, fecha_baja = CURRENT_TIMESTAMP, motivo_baja = ?
-                    WHERE id = ?
-                """, (motivo, registro_id))
-                
-                cursor.execute("""
-                    UPDATE cargas SET activo = 0, fecha_eliminacion = CURRENT_TIMESTAMP
-                    WHERE registro_id = ?
-                """, (registro_id,))
-                
-                cursor.execute("""
-                    INSERT INTO notificaciones_admin (tipo, rut_trabajador, nombre_trabajador, descripcion)
-                    VALUES ('BAJA_SEGURO', ?, ?, ?)
-                """, (rut_trabajador, nombre_trabajador, f"Solicitó BAJA del seguro. Motivo: {motivo}"))
-                
-                conn.commit()
-                logger.info(f"Baja de seguro procesada para {nombre_trabajador}")
-                return True
+            registro = self._escribir(dar_baja)
+            self._cachear_registro(registro)
+            logger.info(f"Baja de seguro procesada para {nombre_trabajador}")
+            return registro
         except Exception as e:
             logger.error(f"Error al dar de baja: {e}")
-            return False
+            if isinstance(e, ErrorBaseDatos):
+                raise
+            return None
     
-    def obtener_notificaciones_pendientes(self) -> List[Dict]:
+    def obtener_notificaciones_pendientes(self) -> List[Notificacion]:
         """Obtiene las notificaciones pendientes."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM notificaciones_admin WHERE leida = 0 ORDER BY fecha DESC
-                """)
-                return [dict(row) for row in cursor.fetchall()]
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, Notificacion.fabrica).execute(_SQL_NOTIFICACIONES_PENDIENTES).fetchall()
         except Exception as e:
             logger.error(f"Error al obtener notificaciones: {e}")
             return []
     
     def marcar_notificacion_leida(self, notificacion_id: int) -> bool:
-        """Marca una notificación como leída."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE notificaciones_admin SET leida = 1 WHERE id = ?", (notificacion_id,))
-                conn.commit()
-                return True
-        except:
+        """
+        Marca una notificación como leída.
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        try:
+            self._escribir(lambda conn: conn.execute(
+                "UPDATE notificaciones_admin SET leida = 1 WHERE id = ?", (notificacion_id,)
+            ))
+            return True
+        except Exception as e:
+            logger.error(f"Error al marcar notificación leída: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
             return False
     
     def marcar_todas_notificaciones_leidas(self) -> bool:
-        """Marca todas las notificaciones como leídas."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE notificaciones_admin SET leida = 1")
-                conn.commit()
-                return True
-        except:
+        """
+        Marca todas las notificaciones como leídas.
+        
+        Raises:
+            ErrorBaseDatos: O una subclase, si la base rechazó la escritura
+        """
+        try:
+            self._escribir(lambda conn: conn.execute("UPDATE notificaciones_admin SET leida = 1"))
+            return True
+        except Exception as e:
+            logger.error(f"Error al marcar notificaciones leídas: {e}")
+            if isinstance(e, ErrorBaseDatos):
+                raise
             return False
     
     # ==================== CONTROL DE ENVÍO A ASEGURADORA ====================
     
-    def obtener_registros_pendientes_envio(self) -> List[Dict]:
+    def obtener_registros_pendientes_envio(self) -> List[Registro]:
         """Obtiene registros que aún no han sido enviados a la aseguradora."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_trabajador 
-                    WHERE activo = 1 AND (enviado_aseguradora = 0 OR enviado_aseguradora IS NULL)
-                    ORDER BY fecha_registro
-                """)
-                return [dict(row) for row in cursor.fetchall()]
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, Registro.fabrica).execute(_SQL_REGISTROS_PENDIENTES).fetchall()
         except Exception as e:
             logger.error(f"Error al obtener registros pendientes: {e}")
             return []
     
-    def exportar_y_marcar_enviado(self, archivo_salida: str, numero_lote: str) -> bool:
-        """Exporta solo registros pendientes y los marca como enviados."""
+    @staticmethod
+    def _tomar_foto_lote(conn: sqlite3.Connection) -> Dict[str, List[int]]:
+        """
+        Guarda en tablas temporales los IDs pendientes de envío.
+        
+        Debe llamarse dentro de una transacción para que la foto y lo que se
+        lea a partir de ella correspondan al mismo estado de la base.
+        
+        Args:
+            conn: Conexión con la transacción abierta
+            
+        Returns:
+            Dict[str, List[int]]: {'registros': [...], 'cargas': [...]}
+        """
+        for tabla in ('lote_registros', 'lote_cargas'):
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {tabla} (id INTEGER PRIMARY KEY)")
+            conn.execute(f"DELETE FROM temp.{tabla}")
+        
+        conn.execute("""
+            INSERT INTO temp.lote_registros
+            SELECT id FROM registros_trabajador
+            WHERE activo = 1 AND enviado_aseguradora = 0
+        """)
+        conn.execute(f"INSERT INTO temp.lote_cargas {_SQL_CARGAS_DEL_LOTE}")
+        
+        return {
+            'registros': [row[0] for row in conn.execute("SELECT id FROM temp.lote_registros")],
+            'cargas': [row[0] for row in conn.execute("SELECT id FROM temp.lote_cargas")]
+        }
+    
+    @staticmethod
+    def _registrar_lote(conn: sqlite3.Connection, lote: Dict, estado: str,
+                        archivo: str = None, destinatario: str = None) -> Dict:
+        """
+        Crea la fila del lote y completa la foto con su id, número y checksum.
+        
+        Args:
+            conn: Conexión con la transacción de escritura abierta
+            lote: Foto de IDs del lote
+            estado: 'generado' o 'enviado'
+            archivo: Planilla exportada, si existe
+            destinatario: Correo al que se envía el lote
+            
+        Returns:
+            Dict: La misma foto, con las claves id, numero y checksum_sha256
+        """
+        checksum = calcular_checksum(archivo) if archivo else None
+        lote_id = conn.execute("""
+            INSERT INTO lotes (estado, fecha_envio, destinatario, total_registros,
+                               total_cargas, archivo, checksum_sha256)
+            VALUES (?, CASE WHEN ? = 'enviado' THEN CURRENT_TIMESTAMP END, ?, ?, ?, ?, ?)
+            RETURNING id
+        """, (estado, estado, destinatario, len(lote['registros']), len(lote['cargas']),
+              archivo, checksum)).fetchone()[0]
+        numero = conn.execute(
+            "UPDATE lotes SET numero = printf('LOTE_%06d', id) WHERE id = ? RETURNING numero",
+            (lote_id,)
+        ).fetchone()[0]
+        
+        lote.update({'id': lote_id, 'numero': numero, 'checksum_sha256': checksum})
+        return lote
+    
+    @staticmethod
+    def _marcar_lote(conn: sqlite3.Connection, lote: Dict):
+        """Marca como enviados exactamente los registros y cargas del lote."""
+        for tabla, ids in (('registros_trabajador', lote['registros']), ('cargas', lote['cargas'])):
+            conn.execute(f"""
+                UPDATE {tabla}
+                SET enviado_aseguradora = 1,
+                    fecha_envio_aseguradora = CURRENT_TIMESTAMP,
+                    numero_lote = ?,
+                    lote_id = ?
+                WHERE id IN (SELECT value FROM json_each(?))
+                AND enviado_aseguradora = 0
+            """, (lote['numero'], lote['id'], json.dumps(ids)))
+    
+    def _exportar_lote(self, conn: sqlite3.Connection, archivo_salida: str) -> Optional[Dict]:
+        """
+        Toma la foto de pendientes y la escribe en la planilla del lote.
+        
+        Args:
+            conn: Conexión con la transacción abierta
+            archivo_salida: Ruta del Excel a generar
+            
+        Returns:
+            Optional[Dict]: Foto de IDs exportados, o None si no había pendientes
+        """
+        lote = self._tomar_foto_lote(conn)
+        if not lote['registros'] and not lote['cargas']:
+            return None
+        
+        exportar_hojas(conn, archivo_salida, [
+            ('Trabajadores', _SQL_EXPORTAR_REGISTROS_LOTE, ()),
+            ('Cargas Familiares', _SQL_EXPORTAR_CARGAS_LOTE, ())
+        ])
+        return lote
+    
+    def exportar_pendientes_lote(self, archivo_salida: str, destinatario: str = None) -> Optional[Dict]:
+        """
+        Exporta los pendientes sin marcarlos y registra el lote como generado.
+        
+        La foto se entrega después a marcar_registros_enviados, de modo que se
+        marque solo lo que efectivamente salió en la planilla.
+        
+        Args:
+            archivo_salida: Ruta del Excel a generar
+            destinatario: Correo al que se enviará el lote
+            
+        Returns:
+            Optional[Dict]: {'id', 'numero', 'checksum_sha256', 'registros', 'cargas'},
+            o None si no había pendientes o hubo un error
+        """
         try:
-            pendientes = self.obtener_registros_pendientes_envio()
+            # La planilla se escribe en una transacción de lectura para no
+            # bloquear a los trabajadores mientras se genera
+            with self._pool.conexion() as conn:
+                conn.execute("BEGIN")
+                lote = self._exportar_lote(conn, archivo_salida)
             
-            if not pendientes:
-                return False
+            if lote is None:
+                return None
             
-            Path(archivo_salida).parent.mkdir(parents=True, exist_ok=True)
+            self._transaccion(lambda conn: self._registrar_lote(conn, lote, 'generado', archivo_salida, destinatario))
             
-            ids_pendientes = [p['id'] for p in pendientes]
+            logger.info(f"Lote {lote['numero']} generado: {len(lote['registros'])} registros y "
+                        f"{len(lote['cargas'])} cargas (sin marcar)")
+            return lote
             
-            with sqlite3.connect(self.db_path) as conn:
-                # Obtener datos para exportar
-                placeholders = ','.join('?' * len(ids_pendientes))
-                
-                df_registros = pd.read_sql_query(f"""
-                    SELECT 
-                        rut_trabajador as 'RUT',
-                        nombre_trabajador as 'Nombre',
-                        email as 'Email',
-                        banco as 'Banco',
-                        tipo_cuenta as 'Tipo Cuenta',
-                        numero_cuenta as 'Número Cuenta',
-                        fecha_registro as 'Fecha Registro'
-                    FROM registros_trabajador
-                    WHERE id IN ({placeholders}) AND activo = 1
-                    ORDER BY fecha_registro
-                """, conn, params=ids_pendientes)
-                
-                df_cargas = pd.read_sql_query(f"""
-                    SELECT 
-                        r.rut_trabajador as 'RUT Trabajador',
-                        r.nombre_trabajador as 'Nombre Trabajador',
-                        c.tipo as 'Tipo Carga',
-                        c.rut as 'RUT Carga',
-                        c.nombre as 'Nombre Carga',
-                        c.sexo as 'Sexo',
-                        c.fecha_nacimiento as 'Fecha Nacimiento',
-                        c.edad as 'Edad'
-                    FROM cargas c
-                    JOIN registros_trabajador r ON c.registro_id = r.id
-                    WHERE r.id IN ({placeholders}) AND c.activo = 1 AND r.activo = 1
-                    ORDER BY r.nombre_trabajador, c.tipo
-                """, conn, params=ids_pendientes)
-                
-                # Formatear fechas
-                if 'Fecha Registro' in df_registros.columns:
-                    df_registros['Fecha Registro'] = pd.to_datetime(df_registros['Fecha Registro']).dt.strftime('%d-%m-%y')
-                
-                if 'Fecha Nacimiento' in df_cargas.columns:
-                    df_cargas['Fecha Nacimiento'] = pd.to_datetime(df_cargas['Fecha Nacimiento']).dt.strftime('%d-%m-%y')
-                
-                # Escribir Excel
-                with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-                    df_registros.to_excel(writer, sheet_name='Trabajadores', index=False)
-                    df_cargas.to_excel(writer, sheet_name='Cargas Familiares', index=False)
-                
-                # Marcar como enviados
-                cursor = conn.cursor()
-                for reg_id in ids_pendientes:
-                    cursor.execute("""
-                        UPDATE registros_trabajador 
-                        SET enviado_aseguradora = 1, 
-                            fecha_envio_aseguradora = CURRENT_TIMESTAMP,
-                            numero_lote = ?
-                        WHERE id = ?
-                    """, (numero_lote, reg_id))
-                
-                conn.commit()
+        except Exception as e:
+            logger.error(f"Error al exportar: {e}")
+            return None
+    
+    def exportar_y_marcar_enviado(self, archivo_salida: str, destinatario: str = None) -> bool:
+        """Exporta solo registros pendientes y los marca como enviados."""
+        def exportar_y_marcar(conn):
+            # IMMEDIATE: nadie puede agregar pendientes entre la foto y la marca
+            conn.execute("BEGIN IMMEDIATE")
+            lote = self._exportar_lote(conn, archivo_salida)
+            
+            if lote is not None:
+                self._registrar_lote(conn, lote, 'enviado', archivo_salida, destinatario)
+                self._marcar_lote(conn, lote)
+            return lote
+        
+        try:
+            lote = self._transaccion(exportar_y_marcar)
+            if lote is None:
+                return False
+            self._cache_registros.limpiar()
             
-            logger.info(f"Exportados {len(pendientes)} registros en lote {numero_lote}")
+            logger.info(f"Exportados {len(lote['registros'])} registros en lote {lote['numero']}")
             return True
             
         except Exception as e:
@@ -660,162 +1973,165 @@ class DatabaseService:
     def solo_exportar_pendientes(self, archivo_salida: str) -> bool:
         """Exporta registros pendientes SIN marcarlos como enviados (solo descarga)."""
         try:
-            pendientes = self.obtener_registros_pendientes_envio()
+            with self._pool.conexion() as conn:
+                conn.execute("BEGIN")
+                lote = self._exportar_lote(conn, archivo_salida)
             
-            if not pendientes:
+            if lote is None:
                 return False
             
-            Path(archivo_salida).parent.mkdir(parents=True, exist_ok=True)
-            
-            ids_pendientes = [p['id'] for p in pendientes]
-            
-            with sqlite3.connect(self.db_path) as conn:
-                placeholders = ','.join('?' * len(ids_pendientes))
-                
-                df_registros = pd.read_sql_query(f"""
-                    SELECT 
-                        rut_trabajador as 'RUT',
-                        nombre_trabajador as 'Nombre',
-                        email as 'Email',
-                        banco as 'Banco',
-                        tipo_cuenta as 'Tipo Cuenta',
-                        numero_cuenta as 'Número Cuenta',
-                        fecha_registro as 'Fecha Registro'
-                    FROM registros_trabajador
-                    WHERE id IN ({placeholders}) AND activo = 1
-                    ORDER BY fecha_registro
-                """, conn, params=ids_pendientes)
-                
-                df_cargas = pd.read_sql_query(f"""
-                    SELECT 
-                        r.rut_trabajador as 'RUT Trabajador',
-                        r.nombre_trabajador as 'Nombre Trabajador',
-                        c.tipo as 'Tipo Carga',
-                        c.rut as 'RUT Carga',
-                        c.nombre as 'Nombre Carga',
-                        c.sexo as 'Sexo',
-                        c.fecha_nacimiento as 'Fecha Nacimiento',
-                        c.edad as 'Edad'
-                    FROM cargas c
-                    JOIN registros_trabajador r ON c.registro_id = r.id
-                    WHERE r.id IN ({placeholders}) AND c.activo = 1 AND r.activo = 1
-                    ORDER BY r.nombre_trabajador, c.tipo
-                """, conn, params=ids_pendientes)
-                
-                if 'Fecha Registro' in df_registros.columns:
-                    df_registros['Fecha Registro'] = pd.to_datetime(df_registros['Fecha Registro']).dt.strftime('%d-%m-%y')
-                
-                if 'Fecha Nacimiento' in df_cargas.columns:
-                    df_cargas['Fecha Nacimiento'] = pd.to_datetime(df_cargas['Fecha Nacimiento']).dt.strftime('%d-%m-%y')
-                
-                with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-                    df_registros.to_excel(writer, sheet_name='Trabajadores', index=False)
-                    df_cargas.to_excel(writer, sheet_name='Cargas Familiares', index=False)
-            
-            logger.info(f"Exportados {len(pendientes)} registros (sin marcar)")
+            logger.info(f"Exportados {len(lote['registros'])} registros (sin marcar)")
             return True
             
         except Exception as e:
             logger.error(f"Error al exportar: {e}")
             return False
     
-    def marcar_registros_enviados(self, numero_lote: str) -> bool:
-        """Marca los registros pendientes como enviados (después de enviar email)."""
-        try:
-            pendientes = self.obtener_registros_pendientes_envio()
+    def marcar_registros_enviados(self, lote: Dict = None, destinatario: str = None) -> bool:
+        """
+        Marca los registros pendientes como enviados (después de enviar email).
+        
+        Args:
+            lote: Foto retornada por exportar_pendientes_lote. Si se omite se
+                crea un lote con todos los pendientes al momento de la llamada.
+            destinatario: Correo al que se envió el lote
             
-            if not pendientes:
-                return False
+        Returns:
+            bool: True si se marcó el lote
+        """
+        def marcar(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            if lote is None:
+                foto = self._tomar_foto_lote(conn)
+                if not foto['registros'] and not foto['cargas']:
+                    return None
+                self._registrar_lote(conn, foto, 'enviado', destinatario=destinatario)
+            else:
+                foto = lote
+                conn.execute("""
+                    UPDATE lotes
+                    SET estado = 'enviado',
+                        fecha_envio = CURRENT_TIMESTAMP,
+                        destinatario = COALESCE(?, destinatario)
+                    WHERE id = ?
+                """, (destinatario, foto['id']))
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                for reg in pendientes:
-                    # Marcar registro como enviado
-                    cursor.execute("""
-                        UPDATE registros_trabajador 
-                        SET enviado_aseguradora = 1, 
-                            fecha_envio_aseguradora = CURRENT_TIMESTAMP,
-                            numero_lote = ?
-                        WHERE id = ?
-                    """, (numero_lote, reg['id']))
-                    
-                    # También marcar las cargas de este registro
-                    cursor.execute("""
-                        UPDATE cargas 
-                        SET enviado_aseguradora = 1, 
-                            fecha_envio_aseguradora = CURRENT_TIMESTAMP,
-                            numero_lote = ?
-                        WHERE registro_id = ? AND activo = 1
-                    """, (numero_lote, reg['id']))
-                
-                # Marcar cargas nuevas de registros ya enviados
-                cursor.execute("""
-                    UPDATE cargas 
-                    SET enviado_aseguradora = 1, 
-                        fecha_envio_aseguradora = CURRENT_TIMESTAMP,
-                        numero_lote = ?
-                    WHERE activo = 1 AND (enviado_aseguradora = 0 OR enviado_aseguradora IS NULL)
-                """, (numero_lote,))
-                
-                conn.commit()
+            self._marcar_lote(conn, foto)
+            return foto
+        
+        try:
+            lote = self._transaccion(marcar)
+            if lote is None:
+                return False
+            self._cache_registros.limpiar()
             
-            logger.info(f"Marcados {len(pendientes)} registros como enviados (lote {numero_lote})")
+            logger.info(f"Marcados {len(lote['registros'])} registros como enviados (lote {lote['numero']})")
             return True
             
         except Exception as e:
             logger.error(f"Error al marcar como enviados: {e}")
             return False
     
-    def obtener_cargas_nuevas_pendientes(self) -> List[Dict]:
+    def obtener_lotes(self, limite: int = 50) -> List[Dict]:
+        """
+        Obtiene el historial de lotes, del más reciente al más antiguo.
+        
+        Args:
+            limite: Cantidad máxima de lotes
+            
+        Returns:
+            List[Dict]: Lotes con sus totales, destinatario y checksum
+        """
+        try:
+            with self._pool.conexion() as conn:
+                filas = conn.execute("SELECT * FROM lotes ORDER BY id DESC LIMIT ?", (limite,)).fetchall()
+                return [dict(row) for row in filas]
+        except Exception as e:
+            logger.error(f"Error al obtener lotes: {e}")
+            return []
+    
+    def obtener_detalle_lote(self, lote_id: int) -> Optional[Dict]:
+        """
+        Obtiene un lote con los registros y cargas que se enviaron en él.
+        
+        Args:
+            lote_id: ID del lote
+            
+        Returns:
+            Optional[Dict]: Lote con las claves 'registros' y 'cargas', o None
+        """
+        try:
+            with self._pool.conexion() as conn:
+                lote = conn.execute("SELECT * FROM lotes WHERE id = ?", (lote_id,)).fetchone()
+                if not lote:
+                    return None
+                
+                detalle = dict(lote)
+                detalle['registros'] = [dict(row) for row in conn.execute(_SQL_REGISTROS_DE_LOTE, (lote_id,))]
+                detalle['cargas'] = [dict(row) for row in conn.execute(_SQL_CARGAS_DE_LOTE, (lote_id,))]
+                return detalle
+        except Exception as e:
+            logger.error(f"Error al obtener detalle del lote: {e}")
+            return None
+    
+    def obtener_cargas_nuevas_pendientes(self) -> List[CargaPendiente]:
         """Obtiene cargas nuevas de trabajadores ya enviados que aún no se han reportado."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT c.*, r.nombre_trabajador, r.rut_trabajador
-                    FROM cargas c
-                    JOIN registros_trabajador r ON c.registro_id = r.id
-                    WHERE r.enviado_aseguradora = 1 
-                    AND c.activo = 1 
-                    AND (c.enviado_aseguradora = 0 OR c.enviado_aseguradora IS NULL)
-                """)
-                return [dict(row) for row in cursor.fetchall()]
+            with self._pool.conexion() as conn:
+                return self._cursor(conn, CargaPendiente.fabrica).execute(_SQL_CARGAS_NUEVAS_PENDIENTES).fetchall()
         except Exception as e:
             logger.error(f"Error al obtener cargas pendientes: {e}")
             return []
     
     def reiniciar_estado_envio(self):
         """Reinicia el estado de envío de todos los registros y cargas (para pruebas)."""
+        def reiniciar(conn):
+            cursor = conn.cursor()
+            
+            # Reiniciar registros
+            cursor.execute("""
+                UPDATE registros_trabajador 
+                SET enviado_aseguradora = 0, 
+                    fecha_envio_aseguradora = NULL,
+                    numero_lote = NULL,
+                    lote_id = NULL
+                WHERE activo = 1
+            """)
+            filas_registros = cursor.rowcount
+            
+            # Reiniciar cargas
+            cursor.execute("""
+                UPDATE cargas 
+                SET enviado_aseguradora = 0, 
+                    fecha_envio_aseguradora = NULL,
+                    numero_lote = NULL,
+                    lote_id = NULL
+                WHERE activo = 1
+            """)
+            return filas_registros, cursor.rowcount
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Reiniciar registros
-                cursor.execute("""
-                    UPDATE registros_trabajador 
-                    SET enviado_aseguradora = 0, 
-                        fecha_envio_aseguradora = NULL,
-                        numero_lote = NULL
-                    WHERE activo = 1
-                """)
-                filas_registros = cursor.rowcount
-                
-                # Reiniciar cargas
-                cursor.execute("""
-                    UPDATE cargas 
-                    SET enviado_aseguradora = 0, 
-                        fecha_envio_aseguradora = NULL,
-                        numero_lote = NULL
-                    WHERE activo = 1
-                """)
-                filas_cargas = cursor.rowcount
-                conn.commit()
+            filas_registros, filas_cargas = self._transaccion(reiniciar)
+            self._cache_registros.limpiar()
             
-            total = filas_registros + filas_cargas
             logger.info(f"Estado de envío reiniciado: {filas_registros} registros, {filas_cargas} cargas")
             return filas_registros  # Devuelve cantidad de registros actualizados
             
         except Exception as e:
             logger.error(f"Error al reiniciar estado: {e}")
             return -1  # -1 indica error
+
+
+# Pasos del esquema en orden. Cada paso es idempotente, porque una base creada
+# antes del versionado (user_version = 0) puede tener ya parte del esquema.
+# Un cambio nuevo se agrega al final con la versión siguiente.
+MIGRACIONES = [
+    (1, "Tablas base", DatabaseService._crear_tablas_base),
+    (2, "Columnas rut_num/rut_dv y RUT normalizados", DatabaseService._crear_claves_rut),
+    (3, "Tabla de lotes", DatabaseService._crear_lotes),
+    (4, "Versionado de empleados", DatabaseService._crear_versionado_empleados),
+    (5, "Contadores del dashboard", DatabaseService._crear_contadores),
+    (6, "Índices parciales y de cobertura", DatabaseService._crear_indices_parciales),
+    (7, "Búsqueda de texto completo (FTS5)", DatabaseService._crear_busqueda),
+    (8, "Índice de cargas por RUT canónico", DatabaseService._crear_indice_cargas_rut),
+]
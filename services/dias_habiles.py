@@ -0,0 +1,256 @@
+"""
+Calendario de días hábiles con los feriados legales de Chile.
+
+Los días hábiles son de lunes a viernes, sin feriados. Sumar N días hábiles
+no recorre día por día: se cuentan semanas completas más el resto de forma
+aritmética y luego se corre el resultado tantos días como feriados caigan en
+el tramo, contados con bisect sobre la lista ordenada de feriados.
+"""
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional
+
+from config import FERIADOS_ADICIONALES
+
+
+def _domingo_de_pascua(anio: int) -> date:
+    """Domingo de Pascua del calendario gregoriano (algoritmo de Meeus/Jones/Butcher)."""
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def _solsticio_de_invierno(anio: int) -> date:
+    """
+    Fecha en Chile continental (UTC-4) del solsticio de junio.
+    
+    Usa la fórmula del solsticio medio de Meeus (Astronomical Algorithms,
+    tabla 27.C), cuyo error de unos minutos no cambia el día salvo que el
+    solsticio caiga justo a medianoche.
+    """
+    y = (anio - 2000) / 1000
+    dia_juliano = (2451716.56767 + 365241.62603 * y + 0.00325 * y ** 2
+                   + 0.00888 * y ** 3 - 0.00030 * y ** 4)
+    # 2451545.0 es el 2000-01-01 a las 12:00 TT; ~69 s separan TT de UTC
+    instante = datetime(2000, 1, 1, 12) + timedelta(days=dia_juliano - 2451545.0, seconds=-69)
+    return (instante - timedelta(hours=4)).date()
+
+
+def _trasladar_a_lunes(fecha: date) -> date:
+    """Ley 19.668: de martes a jueves al lunes de esa semana; de viernes al lunes siguiente."""
+    dia_semana = fecha.weekday()
+    if dia_semana in (1, 2, 3):
+        return fecha - timedelta(days=dia_semana)
+    if dia_semana == 4:
+        return fecha + timedelta(days=3)
+    return fecha
+
+
+def feriados_chile(anio: int) -> List[date]:
+    """
+    Feriados legales de Chile en un año.
+    
+    Incluye los fijos, Viernes y Sábado Santo, San Pedro y San Pablo y
+    Encuentro de Dos Mundos trasladados a lunes, los días de unión de Año
+    Nuevo y Fiestas Patrias, Iglesias Evangélicas (viernes cercano si cae
+    martes o miércoles) y Pueblos Indígenas (día del solsticio, desde 2021).
+    No incluye feriados irregulares como elecciones o interferiados, que se
+    agregan con FERIADOS_ADICIONALES.
+    
+    Args:
+        anio: Año
+    
+    Returns:
+        Lista ordenada de fechas
+    """
+    pascua = _domingo_de_pascua(anio)
+    feriados = {
+        date(anio, 1, 1),    # Año Nuevo
+        pascua - timedelta(days=2),  # Viernes Santo
+        pascua - timedelta(days=1),  # Sábado Santo
+        date(anio, 5, 1),    # Día del Trabajo
+        date(anio, 5, 21),   # Glorias Navales
+        _trasladar_a_lunes(date(anio, 6, 29)),   # San Pedro y San Pablo
+        date(anio, 7, 16),   # Virgen del Carmen
+        date(anio, 8, 15),   # Asunción de la Virgen
+        date(anio, 9, 18),   # Independencia Nacional
+        date(anio, 9, 19),   # Glorias del Ejército
+        _trasladar_a_lunes(date(anio, 10, 12)),  # Encuentro de Dos Mundos
+        date(anio, 11, 1),   # Todos los Santos
+        date(anio, 12, 8),   # Inmaculada Concepción
+        date(anio, 12, 25),  # Navidad
+    }
+    
+    # Ley 20.983: el 2 de enero si el 1 cae domingo. Ley 20.215: el 17 de
+    # septiembre si cae lunes y el 20 si cae viernes
+    if date(anio, 1, 1).weekday() == 6:
+        feriados.add(date(anio, 1, 2))
+    if date(anio, 9, 17).weekday() == 0:
+        feriados.add(date(anio, 9, 17))
+    if date(anio, 9, 20).weekday() == 4:
+        feriados.add(date(anio, 9, 20))
+    
+    # Iglesias Evangélicas y Protestantes: martes -> viernes anterior, miércoles -> viernes siguiente
+    evangelicas = date(anio, 10, 31)
+    if evangelicas.weekday() == 1:
+        evangelicas -= timedelta(days=4)
+    elif evangelicas.weekday() == 2:
+        evangelicas += timedelta(days=2)
+    feriados.add(evangelicas)
+    
+    # Pueblos Indígenas: el 21 de junio en 2021 (Ley 21.357), luego el día del solsticio
+    if anio == 2021:
+        feriados.add(date(2021, 6, 21))
+    elif anio > 2021:
+        feriados.add(_solsticio_de_invierno(anio))
+    
+    return sorted(feriados)
+
+
+def _habiles_hasta(ordinal: int) -> int:
+    """Cantidad de días de lunes a viernes entre el 0001-01-01 (lunes) y el ordinal, inclusive."""
+    semanas, resto = divmod(ordinal, 7)
+    return 5 * semanas + min(resto, 5)
+
+
+def _ordinal_del_habil(cuenta: int) -> int:
+    """Inversa de _habiles_hasta: ordinal del día de lunes a viernes número cuenta."""
+    semanas, resto = divmod(cuenta - 1, 5)
+    return 7 * semanas + resto + 1
+
+
+class CalendarioHabil:
+    """
+    Calendario de días hábiles: lunes a viernes sin feriados.
+    
+    Los feriados de cada año se generan la primera vez que una consulta llega
+    a ese año, así que el calendario no tiene un rango fijo. Solo se guardan
+    los que caen de lunes a viernes, como ordinales ordenados para bisect.
+    Puede compartirse entre hilos.
+    """
+    
+    def __init__(self, feriados_del_anio: Callable[[int], Iterable[date]] = feriados_chile,
+                 adicionales: Iterable[date] = ()):
+        self._feriados_del_anio = feriados_del_anio
+        self._adicionales = sorted(set(adicionales))
+        self._feriados: List[int] = []
+        self._anio_min: Optional[int] = None
+        self._anio_max: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def _cubrir(self, desde: int, hasta: int):
+        """
+        Asegura que estén cargados los feriados de los años desde..hasta.
+        
+        La lista se reemplaza entera y nunca pierde años, así que quien la
+        leyó antes sigue viendo los feriados que necesita.
+        """
+        if self._anio_min is not None and self._anio_min <= desde and hasta <= self._anio_max:
+            return
+        with self._lock:
+            if self._anio_min is not None:
+                # El rango cargado se mantiene contiguo
+                desde = min(desde, self._anio_min)
+                hasta = max(hasta, self._anio_max)
+            fechas = set(self._adicionales)
+            for anio in range(desde, hasta + 1):
+                fechas.update(self._feriados_del_anio(anio))
+            self._feriados = sorted(f.toordinal() for f in fechas if f.weekday() < 5)
+            self._anio_min, self._anio_max = desde, hasta
+    
+    def es_habil(self, fecha: date) -> bool:
+        """Indica si la fecha es un día hábil."""
+        if fecha.weekday() >= 5:
+            return False
+        self._cubrir(fecha.year, fecha.year)
+        feriados = self._feriados
+        ordinal = fecha.toordinal()
+        return bisect_right(feriados, ordinal) == bisect_right(feriados, ordinal - 1)
+    
+    def sumar_dias_habiles(self, inicio: date, dias: int) -> date:
+        """
+        Día hábil número `dias` contado desde el día siguiente a inicio.
+        
+        Args:
+            inicio: Fecha de partida (no cuenta, sea o no hábil)
+            dias: Días hábiles a sumar, cero o más
+        
+        Returns:
+            La fecha resultante; inicio si dias es 0
+        
+        Raises:
+            ValueError: Si dias es negativo
+        """
+        if dias < 0:
+            raise ValueError("La cantidad de días hábiles no puede ser negativa")
+        if dias == 0:
+            return inicio
+        
+        desde = inicio.toordinal()
+        cuenta = _habiles_hasta(desde) + dias
+        while True:
+            fin = _ordinal_del_habil(cuenta)
+            self._cubrir(inicio.year, date.fromordinal(fin).year)
+            # Cada feriado del tramo (desde, fin] consume un día: se corre el fin
+            # y se revisa solo el tramo nuevo
+            feriados = self._feriados
+            en_tramo = bisect_right(feriados, fin) - bisect_right(feriados, desde)
+            if not en_tramo:
+                return date.fromordinal(fin)
+            cuenta += en_tramo
+            desde = fin
+    
+    def dias_habiles_entre(self, inicio: date, fin: date) -> int:
+        """
+        Días hábiles después de inicio y hasta fin, inclusive.
+        
+        Es la inversa de sumar_dias_habiles: para un fin hábil,
+        sumar_dias_habiles(inicio, dias_habiles_entre(inicio, fin)) == fin.
+        Negativo si fin es anterior a inicio.
+        """
+        if fin < inicio:
+            return -self.dias_habiles_entre(fin, inicio)
+        self._cubrir(inicio.year, fin.year)
+        feriados = self._feriados
+        a, b = inicio.toordinal(), fin.toordinal()
+        return (_habiles_hasta(b) - _habiles_hasta(a)) - (bisect_right(feriados, b) - bisect_right(feriados, a))
+
+
+class CalendarioHabilCacheado(CalendarioHabil):
+    """
+    CalendarioHabil que memoriza sumar_dias_habiles por fecha de inicio y cantidad de días.
+    
+    Usa lru_cache y no CacheLRU: las fechas son inmutables y no hace falta
+    copiarlas, y los feriados no cambian durante el proceso, así que las
+    entradas no expiran.
+    """
+    
+    def __init__(self, *args, max_entradas: int = 1024, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sumar_cacheado = lru_cache(maxsize=max_entradas)(super().sumar_dias_habiles)
+    
+    def sumar_dias_habiles(self, inicio: date, dias: int) -> date:
+        return self._sumar_cacheado(inicio, dias)
+    
+    def estadisticas(self) -> dict:
+        """Métricas de la caché."""
+        info = self._sumar_cacheado.cache_info()
+        return {
+            'entradas': info.currsize,
+            'aciertos': info.hits,
+            'fallos': info.misses,
+        }
+
+
+# Calendario compartido del proceso, con los feriados adicionales configurados
+CALENDARIO_CHILE = CalendarioHabilCacheado(adicionales=FERIADOS_ADICIONALES)
@@ -4,24 +4,19 @@ Servicio de envío de correos electrónicos.
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+from datetime import date, datetime
+from typing import Optional
 from pathlib import Path
 import os
 
-from config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, FROM_EMAIL, DATA_DIR
+from config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, FROM_EMAIL, DATA_DIR, DIAS_HABILES_ALTA
 from utils.logger import logger
+from .dias_habiles import CALENDARIO_CHILE
 
 
-def calcular_fecha_alta(dias_habiles: int = 15) -> str:
-    """Calcula la fecha de alta (15 días hábiles desde hoy)."""
-    fecha = datetime.now()
-    dias_agregados = 0
-    
-    while dias_agregados < dias_habiles:
-        fecha += timedelta(days=1)
-        if fecha.weekday() < 5:  # Lunes a viernes
-            dias_agregados += 1
-    
+def calcular_fecha_alta(dias_habiles: int = DIAS_HABILES_ALTA, inicio: Optional[date] = None) -> str:
+    """Calcula la fecha de alta: dias_habiles días hábiles (sin feriados) desde inicio o desde hoy."""
+    fecha = CALENDARIO_CHILE.sumar_dias_habiles(inicio or date.today(), dias_habiles)
     return fecha.strftime("%d-%m-%Y")
 
 
@@ -78,7 +73,7 @@ def generar_html_confirmacion(datos_trabajador: dict, cargas: list) -> str:
             
             <div class="info-box">
                 <strong>📅 Fecha estimada de alta:</strong> {fecha_alta}<br>
-                <small>(15 días hábiles a partir de hoy)</small>
+                <small>({DIAS_HABILES_ALTA} días hábiles a partir de hoy)</small>
             </div>
             
             <h3>Datos del Trabajador:</h3>
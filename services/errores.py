@@ -0,0 +1,71 @@
+"""
+Excepciones tipadas de la capa de datos.
+"""
+import sqlite3
+
+# Códigos primarios de SQLite para una base ocupada por otra conexión
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class ErrorBaseDatos(Exception):
+    """Falla de una operación sobre la base de datos."""
+
+
+class BaseDatosOcupadaError(ErrorBaseDatos):
+    """La base siguió bloqueada por otra escritura después de agotar los reintentos."""
+
+
+class RegistroDuplicadoError(ErrorBaseDatos):
+    """La escritura viola una restricción UNIQUE o de clave."""
+
+
+class CargaDuplicadaError(ErrorBaseDatos):
+    """La carga ya está declarada, activa, por otro trabajador."""
+    
+    def __init__(self, rut: str, conflictos: list):
+        super().__init__(f"La carga {rut} ya está declarada por otro trabajador")
+        self.rut = rut
+        self.conflictos = conflictos
+
+
+def es_error_ocupado(error: Exception) -> bool:
+    """
+    Indica si un error de SQLite se debe a que otra conexión tiene el bloqueo.
+    
+    Args:
+        error: Excepción capturada
+    
+    Returns:
+        bool: True para SQLITE_BUSY y SQLITE_LOCKED (incluidos sus códigos extendidos)
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    codigo = getattr(error, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED)
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def clasificar_error(error: Exception) -> Exception:
+    """
+    Convierte un error de sqlite3 en la excepción tipada correspondiente.
+    
+    Args:
+        error: Excepción capturada
+    
+    Returns:
+        Exception: La excepción tipada, o el mismo error si no es de SQLite
+    """
+    if isinstance(error, ErrorBaseDatos) or not isinstance(error, sqlite3.Error):
+        return error
+    if es_error_ocupado(error):
+        tipo = BaseDatosOcupadaError
+    elif isinstance(error, sqlite3.IntegrityError):
+        tipo = RegistroDuplicadoError
+    else:
+        tipo = ErrorBaseDatos
+    tipado = tipo(str(error))
+    tipado.__cause__ = error
+    return tipado
@@ -0,0 +1,173 @@
+"""
+Escritor único en segundo plano para serializar las escrituras en SQLite.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+from utils.logger import logger
+
+from .conexiones import PoolConexiones
+
+# Operaciones confirmadas como máximo en un mismo commit
+MAX_OPERACIONES_LOTE = 64
+
+_FIN = object()
+
+
+class EscritorSerializado:
+    """
+    Hilo que ejecuta todas las escrituras sobre una única conexión.
+    
+    Las operaciones se encolan como funciones que reciben la conexión y se
+    resuelven a través de un Future. El hilo toma todas las operaciones que
+    esperan en la cola (hasta max_lote) y las confirma en un solo commit; cada
+    una corre dentro de un SAVEPOINT, de modo que si falla se deshace solo
+    ella y su Future recibe la excepción.
+    """
+    
+    def __init__(self, db_path: str, max_lote: int = MAX_OPERACIONES_LOTE):
+        self.db_path = db_path
+        self.max_lote = max_lote
+        self._pool = PoolConexiones(db_path)
+        self._cola: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        
+        # Métricas
+        self._operaciones = 0
+        self._fallidas = 0
+        self._commits = 0
+        self._max_operaciones_commit = 0
+        self._espera_bloqueo_s = 0.0
+        self._espera_cola_s = 0.0
+        
+        self._hilo = threading.Thread(target=self._procesar, name="escritor-sqlite", daemon=True)
+        self._hilo.start()
+    
+    def ejecutar(self, operacion: Callable[[sqlite3.Connection], object]) -> Future:
+        """
+        Encola una operación de escritura.
+        
+        Args:
+            operacion: Función que recibe la conexión del escritor y retorna
+                el resultado; no debe hacer commit ni rollback
+        
+        Returns:
+            Future: Se resuelve con el resultado una vez confirmado el commit
+        """
+        futuro = Future()
+        if not self._hilo.is_alive():
+            futuro.set_exception(RuntimeError("El escritor serializado está cerrado"))
+            return futuro
+        self._cola.put((operacion, futuro, time.perf_counter()))
+        return futuro
+    
+    def _tomar_lote(self) -> Tuple[List[tuple], bool]:
+        """Espera la primera operación y agrega las que ya estén en la cola."""
+        lote = []
+        elemento = self._cola.get()
+        while True:
+            if elemento is _FIN:
+                return lote, True
+            lote.append(elemento)
+            if len(lote) >= self.max_lote:
+                return lote, False
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                return lote, False
+    
+    def _procesar(self):
+        """Bucle del hilo escritor."""
+        terminar = False
+        while not terminar:
+            lote, terminar = self._tomar_lote()
+            if lote:
+                self._confirmar_lote(lote)
+        self._pool.cerrar_todas()
+    
+    def _confirmar_lote(self, lote: List[tuple]):
+        """Ejecuta un lote de operaciones en una transacción y resuelve sus Future."""
+        inicio = time.perf_counter()
+        espera_cola = sum(inicio - encolado for _, _, encolado in lote)
+        resultados = []
+        
+        try:
+            conn = self._pool.obtener()
+            conn.execute("BEGIN IMMEDIATE")
+            espera_bloqueo = time.perf_counter() - inicio
+            
+            for operacion, futuro, _ in lote:
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT operacion")
+                try:
+                    resultados.append((futuro, operacion(conn), None))
+                    conn.execute("RELEASE operacion")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operacion")
+                    conn.execute("RELEASE operacion")
+                    resultados.append((futuro, None, e))
+            
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Error al confirmar lote de escrituras: {e}")
+            try:
+                self._pool.obtener().rollback()
+            except sqlite3.Error:
+                self._pool.descartar()
+            # Nada del lote quedó escrito
+            for _, futuro, _ in lote:
+                if futuro.running() or futuro.set_running_or_notify_cancel():
+                    futuro.set_exception(e)
+            with self._lock:
+                self._fallidas += len(lote)
+            return
+        
+        for futuro, resultado, error in resultados:
+            if error is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(error)
+        
+        with self._lock:
+            self._operaciones += len(resultados)
+            self._fallidas += sum(1 for _, _, error in resultados if error is not None)
+            self._commits += 1
+            self._max_operaciones_commit = max(self._max_operaciones_commit, len(resultados))
+            self._espera_bloqueo_s += espera_bloqueo
+            self._espera_cola_s += espera_cola
+    
+    def estadisticas(self) -> Dict:
+        """Retorna métricas de throughput y espera del escritor."""
+        with self._lock:
+            commits = self._commits or 1
+            operaciones = self._operaciones or 1
+            return {
+                'en_cola': self._cola.qsize(),
+                'operaciones': self._operaciones,
+                'operaciones_fallidas': self._fallidas,
+                'commits': self._commits,
+                'operaciones_por_commit': round(self._operaciones / commits, 2),
+                'max_operaciones_commit': self._max_operaciones_commit,
+                'espera_bloqueo_ms_promedio': round(self._espera_bloqueo_s * 1000 / commits, 3),
+                'espera_cola_ms_promedio': round(self._espera_cola_s * 1000 / operaciones, 3)
+            }
+    
+    def cerrar(self, timeout: float = None):
+        """Termina el hilo después de procesar las operaciones ya encoladas."""
+        if self._hilo.is_alive():
+            self._cola.put(_FIN)
+            self._hilo.join(timeout)
+        
+        # Operaciones encoladas después del cierre
+        while True:
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is not _FIN and elemento[1].set_running_or_notify_cancel():
+                elemento[1].set_exception(RuntimeError("El escritor serializado está cerrado"))
@@ -0,0 +1,138 @@
+"""
+Motor de exportación a Excel en modo streaming.
+"""
+import hashlib
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from utils.fechas import calcular_edades, convertir_fechas
+
+# Filas leídas del cursor en cada bloque
+TAMANO_BLOQUE = 2000
+
+# Columnas con fechas ISO que se escriben en formato chileno DD-MM-YY
+COLUMNAS_FECHA = {'Fecha Registro', 'Fecha Nacimiento'}
+
+# La edad guardada es la del día del registro: al exportar se recalcula desde
+# la fecha de nacimiento (se conserva la guardada si la fecha no se reconoce)
+COLUMNA_EDAD = 'Edad'
+COLUMNA_NACIMIENTO = 'Fecha Nacimiento'
+
+
+def formatear_fecha_iso(valor):
+    """
+    Convierte 'YYYY-MM-DD[ HH:MM:SS]' a 'DD-MM-YY' sin parsear la fecha.
+    
+    Args:
+        valor: Texto de fecha tal como se guarda en SQLite
+    
+    Returns:
+        Fecha formateada, o el valor original si no tiene formato ISO
+    """
+    if isinstance(valor, str) and len(valor) >= 10 and valor[4] == '-' and valor[7] == '-':
+        return f"{valor[8:10]}-{valor[5:7]}-{valor[2:4]}"
+    return valor
+
+
+def exportar_hojas(conn: sqlite3.Connection, archivo_salida: str,
+                   hojas: Sequence[Tuple[str, str, Sequence]],
+                   tamano_bloque: int = TAMANO_BLOQUE, referencia: date = None) -> Dict[str, int]:
+    """
+    Escribe cada consulta en una hoja del libro, fila a fila desde el cursor.
+    
+    El libro se abre en modo write_only, por lo que la memoria usada no
+    depende de la cantidad de filas exportadas.
+    
+    Args:
+        conn: Conexión abierta sobre la que se ejecutan las consultas
+        archivo_salida: Ruta del archivo .xlsx a generar
+        hojas: Lista de (nombre_hoja, sql, parámetros); los alias de las
+            columnas del SELECT se usan como encabezados
+        tamano_bloque: Filas leídas del cursor por iteración
+        referencia: Fecha a la que se calculan las edades (por defecto, hoy)
+    
+    Returns:
+        Dict[str, int]: Filas escritas por hoja
+    """
+    Path(archivo_salida).parent.mkdir(parents=True, exist_ok=True)
+    
+    libro = Workbook(write_only=True)
+    filas_por_hoja = {}
+    referencia = referencia or date.today()
+    
+    for nombre_hoja, sql, parametros in hojas:
+        hoja = libro.create_sheet(title=nombre_hoja)
+        cursor = conn.execute(sql, parametros)
+        columnas = [d[0] for d in cursor.description]
+        
+        hoja.append(_encabezados(hoja, columnas))
+        
+        indices_fecha = [i for i, col in enumerate(columnas) if col in COLUMNAS_FECHA]
+        recalcular_edad = COLUMNA_EDAD in columnas and COLUMNA_NACIMIENTO in columnas
+        if recalcular_edad:
+            indice_edad, indice_nacimiento = columnas.index(COLUMNA_EDAD), columnas.index(COLUMNA_NACIMIENTO)
+        total = 0
+        
+        while True:
+            bloque = cursor.fetchmany(tamano_bloque)
+            if not bloque:
+                break
+            if recalcular_edad:
+                edades = _edades_del_bloque(bloque, indice_nacimiento, referencia)
+            for j, fila in enumerate(bloque):
+                valores = list(fila)
+                if recalcular_edad and edades[j] is not None:
+                    valores[indice_edad] = edades[j]
+                for i in indices_fecha:
+                    valores[i] = formatear_fecha_iso(valores[i])
+                hoja.append(valores)
+            total += len(bloque)
+        
+        filas_por_hoja[nombre_hoja] = total
+    
+    libro.save(archivo_salida)
+    return filas_por_hoja
+
+
+def _edades_del_bloque(bloque: List[tuple], indice_nacimiento: int, referencia: date) -> list:
+    """Edades a la referencia de un bloque de filas en una pasada (None si la fecha no se reconoce)."""
+    fechas = convertir_fechas([fila[indice_nacimiento] for fila in bloque])
+    validas = ~np.isnat(fechas)
+    edades = np.zeros(len(bloque), dtype=np.int64)
+    edades[validas] = calcular_edades(fechas[validas], referencia)
+    return [edad if valida else None for edad, valida in zip(edades.tolist(), validas.tolist())]
+
+
+def _encabezados(hoja, columnas: List[str]) -> List[WriteOnlyCell]:
+    """Celdas de encabezado en negrita, como las que genera pandas."""
+    celdas = []
+    for columna in columnas:
+        celda = WriteOnlyCell(hoja, value=columna)
+        celda.font = Font(bold=True)
+        celdas.append(celda)
+    return celdas
+
+
+def calcular_checksum(archivo: str, tamano_bloque: int = 1 << 20) -> str:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques.
+    
+    Args:
+        archivo: Ruta del archivo
+        tamano_bloque: Bytes leídos por iteración
+    
+    Returns:
+        str: Hash en hexadecimal
+    """
+    sha = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
@@ -0,0 +1,171 @@
+"""
+Índice en memoria de la nómina de empleados activos.
+"""
+import copy
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from utils.logger import logger
+from utils.validators import descomponer_rut
+
+from .modelos import Empleado
+
+# Filas de empleados modificadas después de una versión dada. La versión de
+# cada fila y la de la tabla las mantienen los triggers trg_empleados_version_*
+SQL_EMPLEADOS_DESDE_VERSION = """
+    SELECT id, rut, nombre, email, activo
+    FROM empleados
+    WHERE version > ?
+"""
+
+_SQL_VERSIONES = """
+    SELECT tabla, version FROM versiones_tablas
+    WHERE tabla IN ('empleados', 'empleados_borrados')
+"""
+
+
+def clave_rut(rut: str) -> Optional[int]:
+    """
+    Cuerpo numérico del RUT, usado como clave del índice.
+    
+    Args:
+        rut: RUT en cualquier formato
+    
+    Returns:
+        Optional[int]: Número sin dígito verificador, o None si no es un RUT
+    """
+    partes = descomponer_rut(rut)
+    return partes[0] if partes else None
+
+
+class IndiceEmpleados:
+    """
+    Mapa {cuerpo del RUT: datos del empleado} con los empleados activos.
+    
+    Antes de cada búsqueda compara PRAGMA data_version de su conexión propia;
+    solo si otra conexión escribió en la base lee la versión de la tabla
+    empleados y trae las filas cambiadas desde la última carga.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._empleados: Dict[int, Empleado] = {}
+        self._claves_por_id: Dict[int, int] = {}
+        self._data_version = None
+        self._version = None
+        self._version_borrados = None
+        
+        # Métricas
+        self._aciertos = 0
+        self._fallos = 0
+        self._refrescos = 0
+        self._recargas = 0
+        self._filas_aplicadas = 0
+    
+    def _conexion(self) -> sqlite3.Connection:
+        """Conexión de solo lectura dedicada al índice (llamar con el lock tomado)."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._data_version = None
+        return self._conn
+    
+    def _aplicar(self, filas, empleados: Dict[int, Empleado], claves_por_id: Dict[int, int]):
+        """
+        Incorpora filas leídas de empleados: las activas se agregan, el resto se quita.
+        
+        La entrada anterior de cada fila se busca por id, así un RUT editado
+        no sigue resolviendo al empleado bajo la clave vieja. Si la clave no
+        cambia, la entrada se reemplaza sin quitarla antes, para que una
+        búsqueda concurrente (que no toma el lock) no la vea faltar.
+        """
+        for fila in filas:
+            clave = clave_rut(fila['rut']) if fila['activo'] else None
+            anterior = claves_por_id.pop(fila['id'], None)
+            if clave is not None:
+                empleados[clave] = Empleado(fila['id'], fila['rut'], fila['nombre'], fila['email'])
+                claves_por_id[fila['id']] = clave
+            if anterior is not None and anterior != clave:
+                empleado = empleados.get(anterior)
+                if empleado is not None and empleado.id == fila['id']:
+                    del empleados[anterior]
+            self._filas_aplicadas += 1
+    
+    def refrescar(self):
+        """Sincroniza el índice con la base si la tabla empleados cambió."""
+        with self._lock:
+            conn = self._conexion()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            
+            versiones = dict(conn.execute(_SQL_VERSIONES).fetchall())
+            version = versiones.get('empleados', 0)
+            version_borrados = versiones.get('empleados_borrados', 0)
+            
+            if self._version is None or version_borrados != self._version_borrados:
+                # Carga inicial, o hubo borrados físicos que no dejan fila que leer.
+                # El mapa nuevo se arma aparte y se publica de una vez
+                empleados, claves_por_id = {}, {}
+                self._aplicar(conn.execute(SQL_EMPLEADOS_DESDE_VERSION, (-1,)), empleados, claves_por_id)
+                self._empleados, self._claves_por_id = empleados, claves_por_id
+                self._recargas += 1
+            elif version != self._version:
+                self._aplicar(conn.execute(SQL_EMPLEADOS_DESDE_VERSION, (self._version,)),
+                              self._empleados, self._claves_por_id)
+                self._refrescos += 1
+            
+            self._data_version = data_version
+            self._version = version
+            self._version_borrados = version_borrados
+    
+    def buscar(self, rut: str) -> Optional[Empleado]:
+        """
+        Busca un empleado activo por RUT.
+        
+        Args:
+            rut: RUT en cualquier formato
+        
+        Returns:
+            Optional[Empleado]: Copia de los datos del empleado, o None si no existe
+        """
+        self.refrescar()
+        
+        partes = descomponer_rut(rut)
+        empleado = self._empleados.get(partes[0]) if partes else None
+        
+        # Mismo cuerpo con otro dígito verificador no es el mismo RUT
+        if empleado and empleado.rut[-1] != partes[1]:
+            empleado = None
+        
+        with self._lock:
+            if empleado:
+                self._aciertos += 1
+            else:
+                self._fallos += 1
+        return copy.copy(empleado) if empleado else None
+    
+    def estadisticas(self) -> Dict:
+        """Retorna métricas de uso del índice."""
+        with self._lock:
+            return {
+                'empleados_indexados': len(self._empleados),
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'refrescos_incrementales': self._refrescos,
+                'recargas_completas': self._recargas,
+                'filas_aplicadas': self._filas_aplicadas
+            }
+    
+    def cerrar(self):
+        """Cierra la conexión del índice; se reabre en la próxima búsqueda."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception as e:
+                    logger.warning(f"Error al cerrar conexión del índice: {e}")
+                self._conn = None
@@ -0,0 +1,74 @@
+"""
+Migraciones del esquema versionadas con PRAGMA user_version.
+"""
+import sqlite3
+from typing import Callable, List, Tuple
+
+from utils.logger import logger
+
+# (versión, descripción, función que recibe el cursor y aplica el paso)
+Migracion = Tuple[int, str, Callable[[sqlite3.Cursor], None]]
+
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Retorna la versión del esquema guardada en la base."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migraciones_pendientes(conn: sqlite3.Connection, migraciones: List[Migracion]) -> List[Migracion]:
+    """Retorna, en orden, los pasos con versión mayor a la de la base."""
+    version = version_actual(conn)
+    return [m for m in migraciones if m[0] > version]
+
+
+def _validar_orden(migraciones: List[Migracion]):
+    """Verifica que las versiones sean positivas y estrictamente crecientes."""
+    versiones = [m[0] for m in migraciones]
+    if not versiones or versiones[0] < 1 or any(a >= b for a, b in zip(versiones, versiones[1:])):
+        raise ValueError(f"Versiones de migración fuera de orden: {versiones}")
+
+
+def migrar(conn: sqlite3.Connection, migraciones: List[Migracion],
+           simular: bool = False) -> List[Tuple[int, str]]:
+    """
+    Aplica los pasos pendientes en una sola transacción.
+    
+    Si la base ya está en la última versión solo se ejecuta PRAGMA user_version.
+    La versión se actualiza en la misma transacción que los pasos, así que una
+    falla deja la base en su versión anterior sin cambios a medias.
+    
+    Args:
+        conn: Conexión sin transacción abierta
+        migraciones: Pasos ordenados por versión
+        simular: Ejecutar los pasos y deshacerlos al final (dry-run)
+    
+    Returns:
+        List[Tuple[int, str]]: (versión, descripción) de los pasos aplicados o simulados
+    """
+    _validar_orden(migraciones)
+    ultima = migraciones[-1][0]
+    version = version_actual(conn)
+    if version >= ultima:
+        if version > ultima:
+            logger.warning(f"La base está en la versión {version}, posterior a la del código ({ultima})")
+        return []
+    
+    # IMMEDIATE: si dos procesos arrancan a la vez, el segundo espera y relee la versión
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        pendientes = migraciones_pendientes(conn, migraciones)
+        cursor = conn.cursor()
+        for version, descripcion, aplicar in pendientes:
+            logger.info(f"{'Simulando' if simular else 'Aplicando'} migración {version}: {descripcion}")
+            aplicar(cursor)
+        
+        if simular:
+            conn.rollback()
+        else:
+            conn.execute(f"PRAGMA user_version = {int(ultima)}")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return [(version, descripcion) for version, descripcion, _ in pendientes]
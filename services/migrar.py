@@ -0,0 +1,38 @@
+"""
+Aplica o simula las migraciones pendientes del esquema.
+
+Uso:
+    python -m services.migrar [--db RUTA] [--simular]
+"""
+import argparse
+import sqlite3
+
+from config import DATABASE_PATH, DB_BUSY_TIMEOUT_MS
+
+from .database import MIGRACIONES
+from .migraciones import migraciones_pendientes, migrar, version_actual
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', default=DATABASE_PATH, help="Archivo SQLite (por defecto DATABASE_PATH)")
+    parser.add_argument('--simular', action='store_true',
+                        help="Ejecutar los pasos en una transacción y deshacerla (dry-run)")
+    args = parser.parse_args()
+    
+    conn = sqlite3.connect(args.db, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    try:
+        print(f"{args.db}: versión {version_actual(conn)}, última {MIGRACIONES[-1][0]}")
+        if not migraciones_pendientes(conn, MIGRACIONES):
+            print("Sin migraciones pendientes")
+            return
+        
+        for version, descripcion in migrar(conn, MIGRACIONES, simular=args.simular):
+            print(f"{'simulada' if args.simular else 'aplicada'}  {version:>3}  {descripcion}")
+        print(f"Versión final: {version_actual(conn)}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Modelos compactos para las filas que entrega DatabaseService.
+"""
+import json
+from collections.abc import Mapping
+from typing import FrozenSet, Tuple
+
+
+class Modelo(Mapping):
+    """
+    Fila tipada con __slots__, sin el dict por instancia de dict(row).
+    
+    Se lee por atributo (registro.email) o por clave (registro['email'],
+    registro.get('banco')), de modo que el código escrito para dict(row)
+    sigue funcionando. Las claves son solo las columnas del modelo.
+    
+    COLUMNAS lista, en orden, las columnas que se leen de la base; __slots__
+    puede agregar campos calculados al final.
+    """
+    
+    __slots__ = ()
+    COLUMNAS: Tuple[str, ...] = ()
+    _campos: FrozenSet[str] = frozenset()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._campos = frozenset(cls.__slots__)
+    
+    def __init__(self, *valores, **campos):
+        for nombre, valor in zip(self.__slots__, valores):
+            setattr(self, nombre, valor)
+        for nombre in self.__slots__[len(valores):]:
+            setattr(self, nombre, campos.pop(nombre, None))
+        if campos:
+            raise TypeError(f"{type(self).__name__} no tiene los campos {sorted(campos)}")
+    
+    @classmethod
+    def columnas(cls, alias: str = None) -> str:
+        """Lista de columnas para el SELECT, opcionalmente calificadas con el alias."""
+        prefijo = f"{alias}." if alias else ""
+        return ", ".join(prefijo + c for c in cls.COLUMNAS)
+    
+    @classmethod
+    def fabrica(cls, cursor, fila: tuple):
+        """row_factory de sqlite3 para un SELECT de columnas()."""
+        return cls(*fila)
+    
+    def __getitem__(self, clave: str):
+        if clave not in self._campos:
+            raise KeyError(clave)
+        return getattr(self, clave)
+    
+    def __setitem__(self, clave: str, valor):
+        if clave not in self._campos:
+            raise KeyError(clave)
+        setattr(self, clave, valor)
+    
+    def __iter__(self):
+        return iter(self.__slots__)
+    
+    def __len__(self) -> int:
+        return len(self.__slots__)
+    
+    def __repr__(self) -> str:
+        campos = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.__slots__)
+        return f"{type(self).__name__}({campos})"
+
+
+class Empleado(Modelo):
+    """Empleado de la nómina."""
+    
+    COLUMNAS = ('id', 'rut', 'nombre', 'email')
+    __slots__ = COLUMNAS
+
+
+class Carga(Modelo):
+    """Carga familiar de un registro."""
+    
+    COLUMNAS = ('id', 'registro_id', 'tipo', 'rut', 'nombre', 'sexo',
+                'fecha_nacimiento', 'edad', 'activo', 'enviado_aseguradora', 'lote_id')
+    __slots__ = COLUMNAS
+
+
+class CargaPendiente(Modelo):
+    """Carga nueva de un registro ya enviado, con el trabajador que la declara."""
+    
+    COLUMNAS = Carga.COLUMNAS + ('nombre_trabajador', 'rut_trabajador')
+    __slots__ = COLUMNAS
+
+
+class Registro(Modelo):
+    """Registro de un trabajador; cargas es None si la consulta no las trae."""
+    
+    COLUMNAS = ('id', 'rut_trabajador', 'nombre_trabajador', 'email', 'banco',
+                'tipo_cuenta', 'numero_cuenta', 'fecha_registro', 'email_enviado',
+                'activo', 'enviado_aseguradora', 'numero_lote', 'lote_id', 'rut_num', 'rut_dv')
+    __slots__ = COLUMNAS + ('cargas',)
+    
+    @classmethod
+    def fabrica_con_cargas(cls, cursor, fila: tuple) -> 'Registro':
+        """row_factory para filas con columnas() seguidas de las cargas como arreglo JSON."""
+        return cls(*fila[:-1], cargas=[Carga(*carga) for carga in json.loads(fila[-1])])
+
+
+class RegistroListado(Modelo):
+    """Fila del listado de registros del administrador."""
+    
+    COLUMNAS = ('id', 'rut_trabajador', 'nombre_trabajador', 'email', 'banco',
+                'tipo_cuenta', 'numero_cuenta', 'fecha_registro', 'email_enviado',
+                'enviado_aseguradora')
+    __slots__ = COLUMNAS + ('nombres_cargas',)
+
+
+class Notificacion(Modelo):
+    """Notificación de un cambio hecho por un trabajador."""
+    
+    COLUMNAS = ('id', 'tipo', 'rut_trabajador', 'nombre_trabajador', 'descripcion', 'fecha')
+    __slots__ = COLUMNAS
+
+
+class ResultadoBusqueda(Modelo):
+    """
+    Coincidencia de la búsqueda del administrador.
+    
+    tipo es 'empleado', 'registro' o 'carga'; registro_id es el registro al
+    que pertenece (None para empleados).
+    """
+    
+    COLUMNAS = ('tipo', 'id', 'nombre', 'rut', 'email', 'registro_id')
+    __slots__ = COLUMNAS
+
+
+class ConflictoCarga(Modelo):
+    """Carga activa declarada por un trabajador, con el registro que la declara."""
+    
+    COLUMNAS = ('carga_id', 'rut', 'nombre', 'tipo', 'registro_id',
+                'rut_trabajador', 'nombre_trabajador')
+    __slots__ = COLUMNAS
@@ -0,0 +1,102 @@
+"""
+Reintentos con espera exponencial y jitter ante una base de datos ocupada.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, TypeVar
+
+from config import DB_REINTENTO_BASE_MS, DB_REINTENTO_MAX_MS, DB_REINTENTOS_MAX
+from utils.logger import logger
+
+from .errores import clasificar_error, es_error_ocupado
+
+T = TypeVar('T')
+
+
+class PoliticaReintentos:
+    """
+    Ejecuta operaciones reintentándolas mientras SQLite responda BUSY/LOCKED.
+    
+    Entre intentos espera un tiempo al azar entre 0 y base * 2^intento
+    (acotado a espera_max), para que las sesiones que chocaron no vuelvan a
+    intentar todas a la vez. Cualquier otro error no se reintenta.
+    """
+    
+    def __init__(self, max_reintentos: int = None, espera_base_ms: float = None,
+                 espera_max_ms: float = None):
+        self.max_reintentos = max_reintentos if max_reintentos is not None else DB_REINTENTOS_MAX
+        self.espera_base_ms = espera_base_ms if espera_base_ms is not None else DB_REINTENTO_BASE_MS
+        self.espera_max_ms = espera_max_ms if espera_max_ms is not None else DB_REINTENTO_MAX_MS
+        self._lock = threading.Lock()
+        
+        # Métricas
+        self._operaciones = 0
+        self._reintentos = 0
+        self._recuperadas = 0
+        self._abandonos = 0
+        self._espera_s = 0.0
+    
+    def espera(self, intento: int) -> float:
+        """Segundos a esperar antes del reintento número intento (desde 0)."""
+        tope = min(self.espera_max_ms, self.espera_base_ms * (2 ** intento))
+        return random.uniform(0, tope) / 1000
+    
+    def ejecutar(self, operacion: Callable[[], T]) -> T:
+        """
+        Ejecuta la operación con reintentos.
+        
+        La operación debe ser repetible: cada intento tiene que partir de una
+        transacción nueva (la anterior ya deshecha).
+        
+        Args:
+            operacion: Función sin argumentos
+        
+        Returns:
+            El resultado de la operación
+        
+        Raises:
+            BaseDatosOcupadaError: Si la base siguió ocupada tras todos los reintentos
+            RegistroDuplicadoError, ErrorBaseDatos: Para el resto de errores de SQLite
+        """
+        intento = 0
+        while True:
+            try:
+                resultado = operacion()
+            except Exception as e:
+                if not es_error_ocupado(e) or intento >= self.max_reintentos:
+                    with self._lock:
+                        self._operaciones += 1
+                        if es_error_ocupado(e):
+                            self._abandonos += 1
+                    tipado = clasificar_error(e)
+                    if tipado is e:
+                        # No es de SQLite (o ya es tipado): se relanza tal cual
+                        raise
+                    raise tipado from e
+                
+                espera = self.espera(intento)
+                logger.warning(f"Base de datos ocupada, reintento {intento + 1} en {espera * 1000:.0f} ms: {e}")
+                with self._lock:
+                    self._reintentos += 1
+                    self._espera_s += espera
+                time.sleep(espera)
+                intento += 1
+                continue
+            
+            with self._lock:
+                self._operaciones += 1
+                if intento:
+                    self._recuperadas += 1
+            return resultado
+    
+    def estadisticas(self) -> Dict:
+        """Retorna métricas de reintentos."""
+        with self._lock:
+            return {
+                'operaciones': self._operaciones,
+                'reintentos': self._reintentos,
+                'recuperadas': self._recuperadas,
+                'abandonos': self._abandonos,
+                'espera_total_ms': round(self._espera_s * 1000, 1)
+            }
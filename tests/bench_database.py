@@ -0,0 +1,154 @@
+"""
+Benchmark de latencia del ingreso de trabajadores bajo concurrencia.
+
+Mide p50/p99 de login_trabajador (índice de empleados en memoria más el
+registro con sus cargas, desde la caché o en una sola consulta) con varios
+hilos ingresando RUT al azar de la nómina, junto al camino anterior: una
+conexión nueva por llamada y consultas separadas para el empleado, el
+registro y sus cargas, con los mismos hilos e ingresos.
+
+Uso:
+    python -m tests.bench_database [--empleados N] [--hilos N] [--ingresos N]
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from services.database import DatabaseService
+from utils.validators import calcular_digito_verificador, formatear_rut, normalizar_rut
+
+
+def _rut(numero: int) -> str:
+    return f"{numero}-{calcular_digito_verificador(str(numero))}"
+
+
+def poblar(db: DatabaseService, empleados: int) -> list:
+    """Crea la nómina y registra con dos cargas a la mitad de los empleados."""
+    ruts = [_rut(10_000_000 + i) for i in range(empleados)]
+    db.importar_empleados_df(pd.DataFrame({
+        'RUT': ruts,
+        # Sin dígitos: validar_nombre rechazaría "Empleado 1" y la nómina quedaría vacía
+        'Nombre': ["Empleado"] * empleados
+    }))
+    for i in range(0, empleados, 2):
+        # Cada carga con su propio RUT: una carga declarada por dos trabajadores se rechaza
+        cargas = [
+            {'tipo': 'Cónyuge', 'rut': _rut(20_000_000 + i), 'nombre': 'Cónyuge', 'sexo': 'Femenino',
+             'fecha_nacimiento': date(1990, 1, 1), 'edad': 35},
+            {'tipo': 'Hijo', 'rut': _rut(20_000_000 + i + 1), 'nombre': 'Hijo', 'sexo': 'Masculino',
+             'fecha_nacimiento': date(2015, 1, 1), 'edad': 10}
+        ]
+        db.crear_registro_completo(ruts[i], "Empleado", "empleado@empresa.cl", cargas=cargas)
+    return ruts
+
+
+def login_anterior(db_path: str, rut: str):
+    """
+    Ingreso como se hacía antes de login_trabajador: verificar_empleado_existe
+    y obtener_registro_por_rut abrían cada uno su propia conexión, y el
+    registro y sus cargas se leían en consultas separadas.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        empleado = conn.execute(
+            "SELECT * FROM empleados WHERE rut = ? AND activo = 1", (normalizar_rut(rut),)
+        ).fetchone()
+    if not empleado:
+        return None
+    
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM registros_trabajador
+            WHERE rut_trabajador = ? AND activo = 1
+            ORDER BY fecha_registro DESC LIMIT 1
+        """, (formatear_rut(rut),))
+        fila = cursor.fetchone()
+        registro = None
+        if fila:
+            registro = dict(fila)
+            cursor.execute("""
+                SELECT * FROM cargas
+                WHERE registro_id = ? AND activo = 1
+                ORDER BY tipo, nombre
+            """, (registro['id'],))
+            registro['cargas'] = [dict(r) for r in cursor.fetchall()]
+    return {'empleado': dict(empleado), 'registro': registro}
+
+
+def medir(ingresar, ruts: list, hilos: int, ingresos: int) -> list:
+    """Ejecuta ingresos concurrentes con ingresar(rut) y retorna las latencias en milisegundos."""
+    latencias = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(hilos)
+    
+    def trabajador(semilla):
+        azar = random.Random(semilla)
+        propias = []
+        barrera.wait()
+        for _ in range(ingresos):
+            rut = azar.choice(ruts)
+            inicio = time.perf_counter()
+            ingresar(rut)
+            propias.append((time.perf_counter() - inicio) * 1000)
+        with lock:
+            latencias.extend(propias)
+    
+    threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias
+
+
+def percentil(valores: list, p: float) -> float:
+    return statistics.quantiles(valores, n=100, method='inclusive')[int(p) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--empleados', type=int, default=5000)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--ingresos', type=int, default=500, help="Ingresos por hilo")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directorio:
+        db_path = str(Path(directorio) / "bench.db")
+        db = DatabaseService(db_path)
+        ruts = poblar(db, args.empleados)
+        # El esquema anterior indexaba rut_trabajador; sin el índice el camino
+        # anterior recorrería la tabla y la comparación no sería justa
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_registros_rut ON registros_trabajador(rut_trabajador)")
+        
+        print(f"{args.empleados} empleados, {args.hilos} hilos x {args.ingresos} ingresos")
+        caminos = [
+            ('anterior', lambda rut: login_anterior(db_path, rut)),
+            ('login_trabajador', db.login_trabajador),
+        ]
+        print(f"{'camino':<18}{'p50 ms':>10}{'p99 ms':>10}")
+        resultados = {}
+        for nombre, ingresar in caminos:
+            latencias = medir(ingresar, ruts, args.hilos, args.ingresos)
+            resultados[nombre] = (percentil(latencias, 50), percentil(latencias, 99))
+            p50, p99 = resultados[nombre]
+            print(f"{nombre:<18}{p50:>10.3f}{p99:>10.3f}")
+        
+        (p50_antes, p99_antes), (p50, p99) = resultados['anterior'], resultados['login_trabajador']
+        print(f"{'mejora':<18}{p50_antes / p50:>9.1f}x{p99_antes / p99:>9.1f}x")
+        
+        db.cerrar()
+
+
+if __name__ == '__main__':
+    main()
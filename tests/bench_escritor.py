@@ -0,0 +1,88 @@
+"""
+Benchmark de escrituras concurrentes del portal.
+
+Compara cada hilo escribiendo con su propia conexión (compitiendo por el
+bloqueo de escritura de SQLite) con el escritor serializado, reportando
+throughput, errores, p50/p99 y las métricas del escritor.
+
+Uso:
+    python -m tests.bench_escritor [--hilos N] [--registros N]
+"""
+import argparse
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from services.database import DatabaseService
+from tests.bench_database import _rut, percentil
+
+
+def cargas_de(numero: int) -> list:
+    """Un hijo con RUT propio del trabajador: una carga declarada por dos trabajadores se rechaza."""
+    return [
+        {'tipo': 'Hijo', 'rut': _rut(20_000_000 + numero), 'nombre': 'Hijo', 'sexo': 'Masculino',
+         'fecha_nacimiento': date(2015, 1, 1), 'edad': 10}
+    ]
+
+
+def medir(db: DatabaseService, hilos: int, registros: int):
+    """Registra trabajadores desde varios hilos; retorna (latencias ms, errores, segundos)."""
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(hilos)
+    
+    def trabajador(indice):
+        propias = []
+        fallidos = 0
+        barrera.wait()
+        for i in range(registros):
+            numero = indice * registros + i
+            rut = _rut(10_000_000 + numero)
+            inicio = time.perf_counter()
+            registro = db.crear_registro_completo(rut, "Empleado", "empleado@empresa.cl",
+                                                  cargas=cargas_de(numero))
+            if registro:
+                db.marcar_email_enviado(registro['id'])
+            else:
+                fallidos += 1
+            propias.append((time.perf_counter() - inicio) * 1000)
+        with lock:
+            latencias.extend(propias)
+            errores.append(fallidos)
+    
+    threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, sum(errores), time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--registros', type=int, default=200, help="Registros por hilo")
+    args = parser.parse_args()
+    
+    print(f"{args.hilos} hilos x {args.registros} registros (crear + marcar email)")
+    print(f"{'modo':<14}{'reg/s':>10}{'errores':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    
+    for nombre, serializado in (('directo', False), ('serializado', True)):
+        with tempfile.TemporaryDirectory() as directorio:
+            db = DatabaseService(str(Path(directorio) / "bench.db"), escritor_serializado=serializado)
+            latencias, errores, segundos = medir(db, args.hilos, args.registros)
+            total = args.hilos * args.registros
+            print(f"{nombre:<14}{total / segundos:>10.0f}{errores:>10}"
+                  f"{percentil(latencias, 50):>10.3f}{percentil(latencias, 99):>10.3f}")
+            if serializado:
+                for clave, valor in db.estadisticas_escritor().items():
+                    print(f"    {clave}: {valor}")
+            db.cerrar()
+
+
+if __name__ == '__main__':
+    main()
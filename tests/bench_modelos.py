@@ -0,0 +1,79 @@
+"""
+Benchmark de memoria y tiempo al cargar cargas familiares.
+
+Compara la carga anterior (SELECT * materializado con dict(row)) con el
+modelo Carga con __slots__ construido por la row_factory, reportando la
+memoria retenida por la lista de filas (tracemalloc) y el tiempo de carga.
+
+Uso:
+    python -m tests.bench_modelos [--cargas N]
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from services.database import DatabaseService
+from services.modelos import Carga
+from tests.bench_database import _rut
+
+
+def poblar(db: DatabaseService, cantidad: int):
+    """Crea registros de a diez cargas hasta completar la cantidad pedida."""
+    with db._pool.conexion() as conn:
+        for inicio in range(0, cantidad, 10):
+            registro_id = conn.execute("""
+                INSERT INTO registros_trabajador (rut_trabajador, nombre_trabajador, email)
+                VALUES (?, 'Empleado', 'empleado@empresa.cl')
+            """, (_rut(10_000_000 + inicio),)).lastrowid
+            conn.executemany("""
+                INSERT INTO cargas (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad)
+                VALUES (?, 'Hijo', ?, 'Nombre Apellido', 'Femenino', '2015-01-01', 10)
+            """, [(registro_id, _rut(20_000_000 + inicio + i)) for i in range(min(10, cantidad - inicio))])
+
+
+def cargar_dict(conn: sqlite3.Connection) -> list:
+    return [dict(row) for row in conn.execute("SELECT * FROM cargas")]
+
+
+def cargar_modelo(conn: sqlite3.Connection) -> list:
+    cursor = conn.cursor()
+    cursor.row_factory = Carga.fabrica
+    return cursor.execute(f"SELECT {Carga.columnas()} FROM cargas").fetchall()
+
+
+def medir(conn: sqlite3.Connection, cargar) -> tuple:
+    """Retorna (MB retenidos por el resultado, segundos de carga)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = cargar(conn)
+    segundos = time.perf_counter() - inicio
+    retenidos = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del filas
+    return retenidos / 1024 / 1024, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cargas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        db = DatabaseService(str(Path(directorio) / "bench.db"))
+        poblar(db, args.cargas)
+        conn = db._pool.obtener()
+
+        print(f"{args.cargas} cargas")
+        print(f"{'carga':<10}{'MB':>10}{'bytes/fila':>12}{'ms':>10}")
+        for nombre, cargar in (('dict', cargar_dict), ('modelo', cargar_modelo)):
+            megas, segundos = medir(conn, cargar)
+            print(f"{nombre:<10}{megas:>10.1f}{megas * 1024 * 1024 / args.cargas:>12.0f}{segundos * 1000:>10.0f}")
+
+        db.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark de validación de planillas completas de empleados y cargas.
+
+Compara el recorrido fila a fila con validar_rut, validar_nombre,
+validar_email, validar_numero_cuenta y validar_fecha_nacimiento (armando
+una lista de errores por fila) contra validar_empleados y validar_cargas.
+
+Uso:
+    python -m tests.bench_validacion_masiva [--filas N]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from tests.bench_rut_masivo import generar, medir
+from utils.validacion_masiva import validar_cargas, validar_empleados
+from utils.validators import (
+    validar_email,
+    validar_fecha_nacimiento,
+    validar_nombre,
+    validar_numero_cuenta,
+    validar_rut
+)
+
+REFERENCIA = date(2026, 1, 1)
+
+
+def planillas(filas: int) -> tuple:
+    """Planilla de empleados y de cargas con un 10% de RUT inválidos y algunos campos malos."""
+    azar = random.Random(0)
+    ruts = generar(filas)
+    nombres = [azar.choice(["Juan Pérez", "María José Núñez", "O'Higgins", "X", "Ana3"]) for _ in range(filas)]
+    empleados = pd.DataFrame({
+        'rut': ruts,
+        'nombre': pd.Series(nombres, dtype="str"),
+        'email': pd.Series([azar.choice(["a.b@empresa.cl", "nombre@correo.com", "malo@", ""])
+                            for _ in range(filas)], dtype="str"),
+        'numero_cuenta': pd.Series([str(azar.randint(10, 10**12)) for _ in range(filas)], dtype="str")
+    })
+    cargas = pd.DataFrame({
+        'rut': ruts,
+        'nombre': pd.Series(nombres, dtype="str"),
+        'fecha_nacimiento': [REFERENCIA - timedelta(days=azar.randint(0, 40_000)) for _ in range(filas)],
+        'tipo': [azar.choice(["Hijo/a", "Cónyuge"]) for _ in range(filas)]
+    })
+    return empleados, cargas
+
+
+def empleados_fila_a_fila(df: pd.DataFrame) -> list:
+    errores = []
+    for i, (rut, nombre, email, cuenta) in enumerate(df.itertuples(index=False)):
+        for campo, (valido, mensaje) in (('rut', validar_rut(rut)), ('nombre', validar_nombre(nombre)),
+                                         ('email', validar_email(email) if email else (True, '')),
+                                         ('numero_cuenta', validar_numero_cuenta(cuenta))):
+            if not valido:
+                errores.append((i, campo, mensaje))
+    return errores
+
+
+def cargas_fila_a_fila(df: pd.DataFrame) -> list:
+    errores = []
+    for i, (rut, nombre, fecha, tipo) in enumerate(df.itertuples(index=False)):
+        edad_maxima = 25 if tipo == "Hijo/a" else None
+        for campo, (valido, mensaje) in (('rut', validar_rut(rut)), ('nombre', validar_nombre(nombre)),
+                                         ('fecha_nacimiento', validar_fecha_nacimiento(fecha, edad_maxima, REFERENCIA))):
+            if not valido:
+                errores.append((i, campo, mensaje))
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--filas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    empleados, cargas = planillas(args.filas)
+    casos = (
+        ('empleados', lambda: empleados_fila_a_fila(empleados), lambda: validar_empleados(empleados)),
+        ('cargas', lambda: cargas_fila_a_fila(cargas), lambda: validar_cargas(cargas, 25, REFERENCIA)),
+    )
+
+    print(f"{args.filas} filas")
+    print(f"{'planilla':<12}{'fila a fila ms':>16}{'por columnas ms':>17}{'x':>8}")
+    for nombre, escalar, vectorizado in casos:
+        antes, despues = medir(escalar), medir(vectorizado)
+        print(f"{nombre:<12}{antes * 1000:>16.0f}{despues * 1000:>17.1f}{antes / despues:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Microbenchmark de los validadores de utils.validators.
+
+Mide operaciones por segundo de cada validador con entradas típicas del
+formulario (mejor de varias repeticiones con timeit). Con --guardar deja
+los resultados en un JSON, y con --comparar los contrasta con uno anterior
+y termina con código 1 si algún validador cae más que la tolerancia.
+
+Uso:
+    python -m tests.bench_validators [--numero N] [--repeticiones R]
+                                     [--guardar archivo.json]
+                                     [--comparar archivo.json] [--tolerancia 0.2]
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import date
+
+from utils.validators import (
+    calcular_digito_verificador,
+    calcular_edad,
+    descomponer_rut,
+    formatear_rut,
+    limpiar_rut,
+    normalizar_rut,
+    validar_email,
+    validar_fecha_nacimiento,
+    validar_nombre,
+    validar_numero_cuenta,
+    validar_rut
+)
+
+# Nombre del caso -> (función, argumentos)
+CASOS = {
+    'limpiar_rut': (limpiar_rut, ("12.345.678-5",)),
+    'calcular_digito_verificador': (calcular_digito_verificador, ("12345678",)),
+    'validar_rut': (validar_rut, ("12.345.678-5",)),
+    'validar_rut_invalido': (validar_rut, ("12.345.678-9",)),
+    'formatear_rut': (formatear_rut, ("123456785",)),
+    'normalizar_rut': (normalizar_rut, ("12.345.678-5",)),
+    'descomponer_rut': (descomponer_rut, ("12.345.678-5",)),
+    'validar_nombre': (validar_nombre, ("María José Núñez",)),
+    'validar_email': (validar_email, ("nombre.apellido@empresa.cl",)),
+    'validar_email_dominio': (validar_email, ("nombre@empresa.ar",)),
+    'validar_numero_cuenta': (validar_numero_cuenta, ("1234-5678 90",)),
+    'calcular_edad': (calcular_edad, (date(1990, 5, 17),)),
+    'validar_fecha_nacimiento': (validar_fecha_nacimiento, (date(2010, 5, 17), 25)),
+}
+
+
+def medir(numero: int, repeticiones: int) -> dict:
+    """Operaciones por segundo de cada caso (mejor repetición)."""
+    resultados = {}
+    for nombre, (funcion, argumentos) in CASOS.items():
+        tiempos = timeit.repeat(lambda: funcion(*argumentos), number=numero, repeat=repeticiones)
+        resultados[nombre] = numero / min(tiempos)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--numero', type=int, default=100_000, help="Llamadas por repetición")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--guardar', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', help="Archivo JSON de una medición anterior")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Caída máxima aceptada respecto de --comparar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resultados = medir(args.numero, args.repeticiones)
+    base = {}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+
+    regresiones = []
+    print(f"{'validador':<30}{'ops/s':>14}{'base ops/s':>14}{'cambio':>9}")
+    for nombre, ops in resultados.items():
+        if nombre not in base:
+            print(f"{nombre:<30}{ops:>14,.0f}")
+            continue
+        cambio = ops / base[nombre] - 1
+        if cambio < -args.tolerancia:
+            regresiones.append(nombre)
+        print(f"{nombre:<30}{ops:>14,.0f}{base[nombre]:>14,.0f}{cambio:>+9.0%}")
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+    if regresiones:
+        print(f"Regresión mayor a {args.tolerancia:.0%} en: {', '.join(regresiones)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
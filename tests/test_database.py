@@ -0,0 +1,1172 @@
+"""
+Tests del servicio de base de datos.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from services.cache import CacheLRU
+from services.database import CONSULTAS_CRITICAS, MIGRACIONES, DatabaseService
+from services.errores import BaseDatosOcupadaError, CargaDuplicadaError, ErrorBaseDatos, RegistroDuplicadoError
+from services.escritor import EscritorSerializado
+from services.migraciones import migrar, version_actual
+from services.modelos import Carga, Empleado, Notificacion, Registro
+from services.reintentos import PoliticaReintentos
+from utils.validators import calcular_edad
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Servicio de base de datos sobre un archivo temporal."""
+    servicio = DatabaseService(str(tmp_path / "test.db"))
+    yield servicio
+    servicio.cerrar()
+
+
+class TestPoolConexiones:
+    """Tests para el pool de conexiones por hilo."""
+    
+    def test_reutiliza_conexion_en_mismo_hilo(self, db):
+        """Test que el mismo hilo recibe siempre la misma conexión."""
+        assert db._pool.obtener() is db._pool.obtener()
+    
+    def test_conexion_distinta_por_hilo(self, db):
+        """Test que cada hilo recibe su propia conexión."""
+        conexiones = []
+        hilo = threading.Thread(target=lambda: conexiones.append(db._pool.obtener()))
+        hilo.start()
+        hilo.join()
+        assert conexiones[0] is not db._pool.obtener()
+    
+    def test_pragmas_configurados(self, db):
+        """Test que la conexión queda configurada con WAL y synchronous=NORMAL."""
+        conn = db._pool.obtener()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db._pool.busy_timeout_ms
+    
+    def test_estadisticas_y_cierre(self, db):
+        """Test de métricas del pool y cierre de conexiones."""
+        db.obtener_registro_por_rut("12.345.678-5")
+        db.obtener_registro_por_rut("12.345.678-5")
+        stats = db.estadisticas_conexiones()
+        assert stats['conexiones_abiertas'] == 1
+        assert stats['conexiones_reutilizadas'] >= 2
+        
+        db.cerrar()
+        assert db.estadisticas_conexiones()['conexiones_abiertas'] == 0
+        assert db.verificar_salud_conexion() is True
+    
+    def test_operaciones_con_conexion_reutilizada(self, db):
+        """Test de escritura y lectura usando la conexión del pool."""
+        assert db.agregar_empleado("12.345.678-5", "Juan Pérez", "juan@empresa.cl") is True
+        assert db.agregar_empleado("12345678-5", "Juan Pérez") is False
+        existe, datos = db.verificar_empleado_existe("12.345.678-5")
+        assert existe is True
+        assert datos['nombre'] == "Juan Pérez"
+
+
+class TestIndiceEmpleados:
+    """Tests para el índice en memoria de la nómina."""
+    
+    def test_busqueda_por_cuerpo_del_rut(self, db):
+        """Test que cualquier formato del RUT encuentra al empleado y el DV se respeta."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        
+        for rut in ("12.345.678-5", "12345678-5", "123456785"):
+            existe, datos = db.verificar_empleado_existe(rut)
+            assert existe is True
+            assert datos['nombre'] == "Juan Pérez"
+        assert db.verificar_empleado_existe("12.345.678-9") == (False, None)
+        
+        stats = db.estadisticas_indice_empleados()
+        assert (stats['aciertos'], stats['fallos']) == (3, 1)
+    
+    def test_refresco_incremental_desde_otra_conexion(self, db):
+        """Test que los cambios hechos por otra conexión se aplican sin recargar todo."""
+        db.importar_empleados_df(pd.DataFrame({
+            'RUT': ["12.345.678-5", "22.222.222-2"], 'Nombre': ["Juan Pérez", "Ana Soto"]
+        }))
+        assert db.verificar_empleado_existe("22222222-2")[0] is True
+        recargas = db.estadisticas_indice_empleados()['recargas_completas']
+        
+        hilo = threading.Thread(target=lambda: db.sincronizar_empleados_df(pd.DataFrame({
+            'RUT': ["12.345.678-5", "11.111.111-1"], 'Nombre': ["Juan Pérez", "Nuevo Empleado"]
+        })))
+        hilo.start()
+        hilo.join()
+        
+        assert db.verificar_empleado_existe("11111111-1")[0] is True
+        assert db.verificar_empleado_existe("22222222-2")[0] is False
+        stats = db.estadisticas_indice_empleados()
+        assert stats['recargas_completas'] == recargas
+        assert stats['refrescos_incrementales'] >= 1
+        assert stats['empleados_indexados'] == 2
+    
+    def test_rut_editado_quita_la_clave_anterior(self, db, tmp_path):
+        """Test que tras editar el RUT de un empleado el RUT anterior ya no lo encuentra."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez")
+        db.agregar_empleado("22.222.222-2", "Ana Soto")
+        assert db.verificar_empleado_existe("12345678-5")[0] is True
+        
+        otra = sqlite3.connect(str(tmp_path / "test.db"))
+        otra.execute("UPDATE empleados SET rut = '11111111-1' WHERE rut = '12345678-5'")
+        otra.commit()
+        otra.close()
+        
+        assert db.verificar_empleado_existe("12345678-5") == (False, None)
+        existe, datos = db.verificar_empleado_existe("11.111.111-1")
+        assert existe is True and datos['nombre'] == "Juan Pérez"
+        stats = db.estadisticas_indice_empleados()
+        assert stats['refrescos_incrementales'] >= 1
+        assert stats['empleados_indexados'] == 2
+    
+    def test_recarga_completa_publica_el_mapa_de_una_vez(self, db, tmp_path):
+        """Test que durante una recarga completa las búsquedas siguen viendo el mapa anterior."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez")
+        db.agregar_empleado("22.222.222-2", "Ana Soto")
+        indice = db._indice_empleados
+        indice.refrescar()
+        
+        # Un borrado físico obliga a recargar todo
+        otra = sqlite3.connect(str(tmp_path / "test.db"))
+        otra.execute("DELETE FROM empleados WHERE rut = '22222222-2'")
+        otra.commit()
+        otra.close()
+        
+        visto_durante_recarga = []
+        aplicar = indice._aplicar
+        
+        def aplicar_observando(filas, empleados, claves_por_id):
+            # Lo que vería buscar (que lee el mapa sin el lock) entre fila y fila
+            for fila in filas:
+                visto_durante_recarga.append(indice._empleados.get(12345678))
+                aplicar([fila], empleados, claves_por_id)
+        
+        indice._aplicar = aplicar_observando
+        indice.refrescar()
+        indice._aplicar = aplicar
+        
+        assert visto_durante_recarga and all(visto_durante_recarga)
+        assert db.verificar_empleado_existe("12345678-5")[0] is True
+        assert db.verificar_empleado_existe("22222222-2")[0] is False
+        assert indice.estadisticas()['recargas_completas'] == 2
+    
+    def test_sin_cambios_no_consulta_la_tabla(self, db):
+        """Test que sin escrituras nuevas las búsquedas no releen empleados."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez")
+        db.verificar_empleado_existe("12345678-5")
+        antes = db.estadisticas_indice_empleados()
+        
+        for _ in range(10):
+            db.verificar_empleado_existe("12345678-5")
+        
+        despues = db.estadisticas_indice_empleados()
+        assert despues['filas_aplicadas'] == antes['filas_aplicadas']
+        assert despues['aciertos'] == antes['aciertos'] + 10
+
+
+class TestImportacionMasiva:
+    """Tests para la importación masiva de empleados."""
+    
+    def test_importa_y_reporta_rechazos(self, db):
+        """Test que se insertan las filas válidas y se reporta cada rechazo."""
+        db.agregar_empleado("11.111.111-1", "Ya Existe")
+        df = pd.DataFrame({
+            'rut': ["12.345.678-5", "22222222-2", "123", "", "11111111-1", "12345678-5", "33.333.333-3"],
+            'Nombre': ["Juan Pérez", "Ana Soto", "Mal Rut", "Sin Rut", "Repetido", "Duplicado", "Mal Email"],
+            'EMAIL': ["juan@empresa.cl", None, None, None, None, None, "sin-arroba"]
+        })
+        
+        resultado = db.importar_empleados_df(df)
+        
+        assert resultado['insertados'] == 2
+        motivos = {r['fila']: r['motivo'] for r in resultado['rechazados']}
+        assert motivos == {
+            4: 'Formato de RUT inválido. Debe ser 12345678-9 o 12.345.678-9',
+            5: 'El RUT no puede estar vacío',
+            6: 'RUT ya existe',
+            7: 'RUT duplicado en el archivo',
+            8: 'Formato de correo electrónico inválido'
+        }
+        existe, datos = db.verificar_empleado_existe("12345678-5")
+        assert existe is True
+        assert datos['email'] == "juan@empresa.cl"
+    
+    def test_importar_excel_mantiene_contrato(self, db, tmp_path):
+        """Test que importar_empleados_excel retorna (exitosos, fallidos, mensaje)."""
+        archivo = tmp_path / "empleados.xlsx"
+        pd.DataFrame({'RUT': ["12.345.678-5", "123"], 'Nombre': ["Juan", "Pedro"]}).to_excel(archivo, index=False)
+        
+        exitosos, fallidos, mensaje = db.importar_empleados_excel(str(archivo))
+        
+        assert (exitosos, fallidos) == (1, 1)
+        assert "Fila 3" in mensaje
+
+
+class TestSincronizacionNomina:
+    """Tests para la sincronización completa de la nómina."""
+    
+    def test_diff_y_aplicacion(self, db):
+        """Test que la sincronización inserta, actualiza y desactiva en una pasada."""
+        db.agregar_empleado("12.345.678-5", "Juan Perez", "juan@empresa.cl")
+        db.agregar_empleado("22.222.222-2", "Ana Soto", "ana@empresa.cl")
+        db.agregar_empleado("33.333.333-3", "Sin Cambios", "sc@empresa.cl")
+        nomina = pd.DataFrame({
+            'RUT': ["12345678-5", "33333333-3", "11111111-1"],
+            'Nombre': ["Juan Pérez", "Sin Cambios", "Nuevo Empleado"],
+            'Email': ["juan@empresa.cl", "sc@empresa.cl", "nuevo@empresa.cl"]
+        })
+        
+        previa = db.sincronizar_empleados_df(nomina, aplicar=False)
+        assert previa['aplicado'] is False
+        assert db.verificar_empleado_existe("22222222-2")[0] is True
+        
+        resumen = db.sincronizar_empleados_df(nomina)
+        assert resumen['nuevos'] == ["11111111-1"]
+        assert resumen['modificados'] == ["12345678-5"]
+        assert resumen['desactivados'] == ["22222222-2"]
+        assert resumen['sin_cambios'] == 1
+        assert db.verificar_empleado_existe("22222222-2")[0] is False
+        assert db.verificar_empleado_existe("12345678-5")[1]['nombre'] == "Juan Pérez"
+        
+        # Reaparece en la nómina: se reactiva
+        reactivado = db.sincronizar_empleados_df(pd.concat([nomina, pd.DataFrame({
+            'RUT': ["22222222-2"], 'Nombre': ["Ana Soto"], 'Email': ["ana@empresa.cl"]
+        })]).reset_index(drop=True))
+        assert reactivado['modificados'] == ["22222222-2"]
+        assert db.verificar_empleado_existe("22222222-2")[0] is True
+    
+    def test_nomina_sin_filas_validas_no_desactiva(self, db):
+        """Test que una nómina inválida no desactiva a todos los empleados."""
+        db.agregar_empleado("12.345.678-5", "Juan Perez")
+        resumen = db.sincronizar_empleados_df(pd.DataFrame({'RUT': ["123"], 'Nombre': ["X"]}))
+        assert resumen['aplicado'] is False
+        assert db.verificar_empleado_existe("12345678-5")[0] is True
+
+
+class TestRegistroAtomico:
+    """Tests para la creación atómica de registro y cargas."""
+    
+    CARGAS = [
+        {'tipo': 'Cónyuge', 'rut': '11.111.111-1', 'nombre': 'Ana Soto', 'sexo': 'Femenino',
+         'fecha_nacimiento': date(1990, 1, 1), 'edad': 35},
+        {'tipo': 'Hijo', 'rut': '22.222.222-2', 'nombre': 'Pedro Pérez', 'sexo': 'Masculino',
+         'fecha_nacimiento': date(2015, 6, 1), 'edad': 10}
+    ]
+    
+    def test_retorna_registro_persistido(self, db):
+        """Test que se retorna el registro con id y sus cargas persistidas."""
+        registro = db.crear_registro_completo(
+            "12.345.678-5", "Juan Pérez", "juan@empresa.cl", banco="BCI", cargas=self.CARGAS
+        )
+        assert registro['id'] is not None
+        assert registro['banco'] == "BCI"
+        assert [c['nombre'] for c in registro['cargas']] == ['Ana Soto', 'Pedro Pérez']
+        assert all(c['registro_id'] == registro['id'] for c in registro['cargas'])
+        assert len(db.obtener_registro_con_cargas(registro['id'])['cargas']) == 2
+    
+    def test_falla_no_deja_registro_a_medias(self, db):
+        """Test que si una carga falla no queda el registro escrito."""
+        cargas = self.CARGAS + [{'tipo': 'Hijo', 'rut': '33.333.333-3', 'nombre': None,
+                                 'sexo': 'Masculino', 'fecha_nacimiento': date(2018, 1, 1), 'edad': 7}]
+        with pytest.raises(RegistroDuplicadoError):
+            db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl", cargas=cargas)
+        assert db.obtener_registro_por_rut("12.345.678-5") is None
+
+
+class TestLoginTrabajador:
+    """Tests para el ingreso combinado del trabajador."""
+    
+    def test_empleado_con_registro_y_cargas(self, db):
+        """Test que el ingreso trae empleado, registro y cargas como la consulta separada."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   banco="BCI", cargas=TestRegistroAtomico.CARGAS)
+        
+        login = db.login_trabajador("12345678-5")
+        
+        assert login['empleado']['nombre'] == "Juan Pérez"
+        esperado = db.obtener_registro_por_rut("12.345.678-5")
+        assert {k: v for k, v in login['registro'].items() if k != 'cargas'} == \
+            {k: v for k, v in esperado.items() if k != 'cargas'}
+        assert [c['nombre'] for c in login['registro']['cargas']] == [c['nombre'] for c in esperado['cargas']]
+        for carga, original in zip(login['registro']['cargas'], esperado['cargas']):
+            assert carga.items() <= original.items()
+    
+    def test_empleado_sin_registro_y_no_empleado(self, db):
+        """Test del ingreso de un empleado nuevo y de un RUT que no es empleado."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez")
+        assert db.login_trabajador("12.345.678-5")['registro'] is None
+        assert db.login_trabajador("22.222.222-2") is None
+
+
+class TestCacheRegistros:
+    """Tests para la caché de registros del portal de autoservicio."""
+    
+    def test_lectura_y_escrituras_actualizan_la_cache(self, db):
+        """Test que las escrituras retornan el registro y dejan la caché al día."""
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                              cargas=TestRegistroAtomico.CARGAS[:1])
+        db.obtener_registro_por_rut("12.345.678-5")
+        assert db.obtener_registro_por_rut("12345678-5")['id'] == registro['id']
+        assert db.estadisticas_cache_registros()['aciertos'] == 1
+        
+        actualizado = db.agregar_carga_a_registro(registro['id'], "Hijo", "22.222.222-2", "Pedro Pérez",
+                                                  "Masculino", date(2015, 6, 1), 10)
+        assert [c['nombre'] for c in actualizado['cargas']] == ["Ana Soto", "Pedro Pérez"]
+        assert db.obtener_registro_por_rut("12.345.678-5") == actualizado
+        
+        carga_id = actualizado['cargas'][0]['id']
+        actualizado = db.eliminar_carga(carga_id, "12.345.678-5", "Juan Pérez")
+        assert [c['nombre'] for c in actualizado['cargas']] == ["Pedro Pérez"]
+        assert db.obtener_registro_por_rut("12.345.678-5")['cargas'] == actualizado['cargas']
+        
+        baja = db.dar_baja_seguro(registro['id'], "12.345.678-5", "Juan Pérez")
+        assert baja['activo'] == 0
+        assert db.obtener_registro_por_rut("12.345.678-5") is None
+    
+    def test_copias_independientes(self, db):
+        """Test que modificar el registro retornado no altera la caché."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        db.obtener_registro_por_rut("12.345.678-5")['email'] = "otro@empresa.cl"
+        assert db.obtener_registro_por_rut("12.345.678-5")['email'] == "juan@empresa.cl"
+    
+    def test_lru_y_ttl(self, monkeypatch):
+        """Test que la caché descarta la entrada menos usada y las expiradas."""
+        cache = CacheLRU(max_entradas=2, ttl_segundos=10)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obtener('a')
+        cache.guardar('c', 3)
+        assert cache.obtener('b') is None
+        assert cache.obtener('a') == 1
+        
+        ahora = __import__('time').monotonic()
+        monkeypatch.setattr('services.cache.time.monotonic', lambda: ahora + 11)
+        assert cache.obtener('a') is None
+        stats = cache.estadisticas()
+        assert (stats['descartados'], stats['expirados']) == (1, 1)
+
+
+class TestModelos:
+    """Tests para los modelos de fila con __slots__."""
+    
+    def test_registro_por_atributo_y_por_clave(self, db):
+        """Test que el registro se lee como atributo o como dict y solo trae sus columnas."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   banco="BCI", cargas=TestRegistroAtomico.CARGAS)
+        registro = db.obtener_registro_por_rut("12345678-5")
+        
+        assert isinstance(registro, Registro) and not hasattr(registro, '__dict__')
+        assert registro.banco == registro['banco'] == registro.get('banco') == "BCI"
+        assert 'motivo_baja' not in registro and registro.get('motivo_baja') is None
+        assert all(isinstance(c, Carga) for c in registro['cargas'])
+        assert dict(registro.cargas[0])['nombre'] == "Ana Soto"
+        with pytest.raises(KeyError):
+            registro['motivo_baja'] = "No existe"
+    
+    def test_listados_con_modelos(self, db):
+        """Test que los listados entregan modelos que pandas convierte por columnas."""
+        db.agregar_empleado("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        db.dar_baja_seguro(registro.id, "12.345.678-5", "Juan Pérez")
+        
+        empleados = db.obtener_todos_empleados()
+        assert isinstance(empleados[0], Empleado)
+        assert list(pd.DataFrame(empleados).columns) == list(Empleado.COLUMNAS)
+        notificaciones = db.obtener_notificaciones_pendientes()
+        assert isinstance(notificaciones[0], Notificacion)
+        assert notificaciones[0]['tipo'] == 'BAJA_SEGURO'
+        
+        with pytest.raises(TypeError):
+            Empleado(1, "12345678-5", nombre="Juan", cargo="No existe")
+
+
+class TestBusqueda:
+    """Tests para la búsqueda de texto completo del administrador."""
+    
+    def test_prefijos_tildes_y_formatos_de_rut(self, db):
+        """Test que se encuentra por prefijo, sin tildes y con cualquier formato del RUT."""
+        db.agregar_empleado("12.345.678-5", "José Pérez", "jose@empresa.cl")
+        registro = db.crear_registro_completo("12.345.678-5", "José Pérez", "jose@empresa.cl",
+                                              cargas=TestRegistroAtomico.CARGAS)
+        
+        assert {(r.tipo, r.id) for r in db.buscar("pere")} == {('empleado', 1), ('registro', registro.id),
+                                                               ('carga', registro.cargas[1].id)}
+        for texto in ("12.345.678-5", "123456785", "1234567"):
+            assert {r.tipo for r in db.buscar(texto)} == {'empleado', 'registro'}
+        assert [(r.nombre, r.registro_id) for r in db.buscar("ana so")] == [("Ana Soto", registro.id)]
+        assert db.buscar("jose pedro") == []
+        assert db.buscar("  ") == [] and db.buscar('"*') == []
+    
+    def test_triggers_mantienen_el_indice(self, db):
+        """Test que las bajas, eliminaciones y cambios de la nómina se reflejan en la búsqueda."""
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                              cargas=TestRegistroAtomico.CARGAS)
+        db.eliminar_carga(registro.cargas[0].id, "12.345.678-5", "Juan Pérez")
+        assert db.buscar("ana") == []
+        
+        db.dar_baja_seguro(registro.id, "12.345.678-5", "Juan Pérez")
+        assert db.buscar("perez") == []
+        
+        db.sincronizar_empleados_df(pd.DataFrame({'RUT': ["11.111.111-1"], 'Nombre': ["Ana Soto"]}))
+        assert [r.tipo for r in db.buscar("ana")] == ['empleado']
+        db.sincronizar_empleados_df(pd.DataFrame({'RUT': ["11.111.111-1"], 'Nombre': ["Ana María Soto"]}))
+        assert [r.nombre for r in db.buscar("maria")] == ["Ana María Soto"]
+        assert [r.nombre for r in db.buscar("ana")] == ["Ana María Soto"]
+    
+    def test_ranking_prioriza_el_nombre(self, db):
+        """Test que una coincidencia en el nombre aparece antes que una en el email."""
+        db.agregar_empleado("11.111.111-1", "Ana Soto", "juan.soto@empresa.cl")
+        db.agregar_empleado("12.345.678-5", "Juan Pérez", "jp@empresa.cl")
+        assert [r.nombre for r in db.buscar("juan")] == ["Juan Pérez", "Ana Soto"]
+        assert len(db.buscar("empresa", limite=1)) == 1
+
+
+class TestCargasDuplicadas:
+    """Tests para la detección de cargas declaradas por más de un trabajador."""
+    
+    def test_conflicto_con_otro_trabajador(self, db):
+        """Test que el RUT de una carga ajena choca en cualquier formato, y las propias no."""
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                              cargas=TestRegistroAtomico.CARGAS)
+        
+        for rut in ("22.222.222-2", "22222222-2", " 222222222 "):
+            conflictos = db.buscar_conflictos_carga(rut, "9.876.543-3")
+            assert [(c.carga_id, c.registro_id, c.rut_trabajador) for c in conflictos] == [
+                (registro.cargas[1].id, registro.id, "12.345.678-5")
+            ]
+        assert db.buscar_conflictos_carga("22.222.222-2", "12345678-5") == []
+        assert db.buscar_conflictos_carga("33.333.333-3", "9.876.543-3") == []
+        assert db.buscar_conflictos_carga("no es rut") == []
+        
+        db.eliminar_carga(registro.cargas[1].id, "12.345.678-5", "Juan Pérez")
+        assert db.buscar_conflictos_carga("22.222.222-2", "9.876.543-3") == []
+    
+    def test_escrituras_rechazan_carga_ajena(self, db):
+        """Test que registrar o agregar una carga ajena lanza CargaDuplicadaError sin escribir nada."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   cargas=TestRegistroAtomico.CARGAS)
+        
+        with pytest.raises(CargaDuplicadaError) as error:
+            db.crear_registro_completo("9.876.543-3", "Ana Soto", "ana@empresa.cl",
+                                       cargas=TestRegistroAtomico.CARGAS[1:])
+        assert error.value.rut == "22.222.222-2"
+        assert [c.rut_trabajador for c in error.value.conflictos] == ["12.345.678-5"]
+        assert db.obtener_registro_por_rut("9.876.543-3") is None
+        
+        otro = db.crear_registro_completo("9.876.543-3", "Ana Soto", "ana@empresa.cl")
+        with pytest.raises(CargaDuplicadaError):
+            db.agregar_carga_a_registro(otro.id, 'Hijo', '22222222-2', 'Pedro Pérez',
+                                        'Masculino', date(2015, 6, 1), 10)
+        assert db.obtener_registro_con_cargas(otro.id).cargas == []
+        
+        # El mismo trabajador puede volver a registrarse con sus cargas
+        assert db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                          cargas=TestRegistroAtomico.CARGAS) is not None
+        assert db.reporte_cargas_duplicadas() == []
+    
+    def test_escritores_concurrentes_no_duplican_carga(self, db, monkeypatch):
+        """Test que dos trabajadores que agregan la misma carga a la vez no la registran ambos."""
+        primero = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        segundo = db.crear_registro_completo("9.876.543-3", "Ana Soto", "ana@empresa.cl")
+        
+        # El primer escritor se detiene justo después de verificar, antes de insertar
+        verificado = threading.Event()
+        continuar = threading.Event()
+        llamadas = []
+        conflictos_carga = DatabaseService._conflictos_carga
+        
+        def conflictos_y_pausa(conn, rut, rut_num_trabajador):
+            conflictos = conflictos_carga(conn, rut, rut_num_trabajador)
+            llamadas.append(rut_num_trabajador)
+            if len(llamadas) == 1:
+                verificado.set()
+                continuar.wait(timeout=5)
+            return conflictos
+        
+        monkeypatch.setattr(DatabaseService, '_conflictos_carga', staticmethod(conflictos_y_pausa))
+        resultados = {}
+        
+        def agregar(registro):
+            try:
+                resultados[registro.id] = db.agregar_carga_a_registro(
+                    registro.id, 'Hijo', '22.222.222-2', 'Pedro Pérez', 'Masculino', date(2015, 6, 1), 10
+                )
+            except CargaDuplicadaError as e:
+                resultados[registro.id] = e
+        
+        hilos = [threading.Thread(target=agregar, args=(primero,)),
+                 threading.Thread(target=agregar, args=(segundo,))]
+        hilos[0].start()
+        assert verificado.wait(timeout=5)
+        hilos[1].start()
+        # Tiempo de sobra para que el segundo escritor verifique e inserte si no espera al primero
+        time.sleep(0.3)
+        continuar.set()
+        for hilo in hilos:
+            hilo.join()
+        
+        assert sorted(type(resultado).__name__ for resultado in resultados.values()) == ['CargaDuplicadaError', 'Registro']
+        assert len(db.reporte_cargas_duplicadas()) == 0
+        with db._pool.conexion() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM cargas WHERE rut_num = 22222222 AND activo = 1").fetchone()[0] == 1
+    
+    def test_reporte_agrupa_por_rut(self, db):
+        """Test que el reporte lista todas las declaraciones de cada RUT repetido."""
+        primero = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                             cargas=TestRegistroAtomico.CARGAS)
+        segundo = db.crear_registro_completo("9.876.543-3", "Ana Soto", "ana@empresa.cl")
+        # Declaración previa a la verificación (datos antiguos)
+        with db._pool.conexion() as conn:
+            conn.execute("""INSERT INTO cargas (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad)
+                            VALUES (?, 'Hijo', '22.222.222-2', 'Pedro Pérez', 'Masculino', '2015-06-01', 10)""",
+                         (segundo.id,))
+        
+        reporte = db.reporte_cargas_duplicadas()
+        assert [(c.rut, c.registro_id) for c in reporte] == [
+            ("22.222.222-2", primero.id), ("22.222.222-2", segundo.id)
+        ]
+
+
+class TestEscritorSerializado:
+    """Tests para el modo de escritor único con commit agrupado."""
+    
+    @pytest.fixture
+    def db_serializado(self, tmp_path):
+        servicio = DatabaseService(str(tmp_path / "test.db"), escritor_serializado=True)
+        yield servicio
+        servicio.cerrar()
+    
+    def test_escrituras_concurrentes(self, db_serializado):
+        """Test que registros creados desde varios hilos quedan todos escritos."""
+        resultados = []
+        
+        def registrar(i):
+            resultados.append(db_serializado.crear_registro_completo(
+                f"{10_000_000 + i}-0", f"Trabajador {i}", "t@empresa.cl",
+                cargas=[dict(TestRegistroAtomico.CARGAS[0], rut=f"{20_000_000 + i}-0")]
+            ))
+        
+        hilos = [threading.Thread(target=registrar, args=(i,)) for i in range(20)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        
+        assert all(resultados) and len(resultados) == 20
+        stats = db_serializado.estadisticas_escritor()
+        assert stats['operaciones'] == 20
+        assert 1 <= stats['commits'] <= 20
+        assert db_serializado.obtener_estadisticas()['total_cargas'] == 20
+        assert db_serializado.verificar_contadores() == {}
+    
+    def test_flujo_del_portal(self, db_serializado):
+        """Test que los métodos del portal mantienen sus retornos con el escritor."""
+        registro = db_serializado.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        actualizado = db_serializado.agregar_carga_a_registro(
+            registro['id'], "Hijo", "22.222.222-2", "Pedro Pérez", "Masculino", date(2015, 6, 1), 10
+        )
+        assert len(actualizado['cargas']) == 1
+        assert db_serializado.marcar_email_enviado(registro['id']) is True
+        assert db_serializado.eliminar_carga(999, "12.345.678-5", "Juan Pérez") is None
+        assert db_serializado.dar_baja_seguro(registro['id'], "12.345.678-5", "Juan Pérez")['activo'] == 0
+        assert len(db_serializado.obtener_notificaciones_pendientes()) == 1
+        assert db_serializado.marcar_todas_notificaciones_leidas() is True
+        assert db_serializado.obtener_notificaciones_pendientes() == []
+    
+    def test_operacion_fallida_no_afecta_al_lote(self, tmp_path):
+        """Test que una operación que falla se deshace sin deshacer las demás del commit."""
+        DatabaseService(str(tmp_path / "test.db")).cerrar()
+        escritor = EscritorSerializado(str(tmp_path / "test.db"))
+        
+        def insertar(rut):
+            return lambda conn: conn.execute(
+                "INSERT INTO empleados (rut, nombre) VALUES (?, 'X')", (rut,)
+            ).rowcount
+        
+        futuros = [escritor.ejecutar(insertar(rut)) for rut in ("1-9", "1-9", "2-7")]
+        assert futuros[0].result() == 1
+        with pytest.raises(Exception):
+            futuros[1].result()
+        assert futuros[2].result() == 1
+        escritor.cerrar()
+        
+        assert escritor.ejecutar(insertar("3-5")).exception() is not None
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        assert conn.execute("SELECT COUNT(*) FROM empleados").fetchone()[0] == 2
+        conn.close()
+
+
+class TestReintentos:
+    """Tests para los reintentos ante una base ocupada."""
+    
+    def test_reintenta_y_recupera(self):
+        """Test que un error BUSY se reintenta hasta que la operación resulta."""
+        politica = PoliticaReintentos(max_reintentos=3, espera_base_ms=1)
+        fallos = iter([sqlite3.OperationalError("database is locked")] * 2)
+        
+        def operacion():
+            error = next(fallos, None)
+            if error:
+                raise error
+            return 42
+        
+        assert politica.ejecutar(operacion) == 42
+        stats = politica.estadisticas()
+        assert (stats['operaciones'], stats['reintentos'], stats['recuperadas'], stats['abandonos']) == (1, 2, 1, 0)
+    
+    def test_abandona_y_clasifica_errores(self):
+        """Test que tras agotar los reintentos y ante otros errores se lanzan excepciones tipadas."""
+        politica = PoliticaReintentos(max_reintentos=2, espera_base_ms=1)
+        intentos = []
+        
+        def ocupada():
+            intentos.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        
+        def duplicado():
+            intentos.append(1)
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: empleados.rut")
+        
+        with pytest.raises(BaseDatosOcupadaError):
+            politica.ejecutar(ocupada)
+        assert len(intentos) == 3
+        
+        intentos.clear()
+        with pytest.raises(RegistroDuplicadoError) as error:
+            politica.ejecutar(duplicado)
+        assert len(intentos) == 1
+        assert isinstance(error.value, ErrorBaseDatos)
+        assert isinstance(error.value.__cause__, sqlite3.IntegrityError)
+        assert politica.estadisticas()['abandonos'] == 1
+    
+    def test_otros_errores_se_relanzan_sin_cambios(self):
+        """Test que un error que no es de SQLite se relanza sin ser su propia causa."""
+        politica = PoliticaReintentos(max_reintentos=2, espera_base_ms=1)
+        original = ValueError("dato inválido")
+        
+        def falla():
+            raise original
+        
+        with pytest.raises(ValueError) as error:
+            politica.ejecutar(falla)
+        assert error.value is original
+        assert error.value.__cause__ is None
+    
+    def test_escritura_espera_al_bloqueo(self, db, tmp_path):
+        """Test que una escritura bloqueada por otra conexión se completa al liberarse el bloqueo."""
+        db._pool.obtener().execute("PRAGMA busy_timeout=0")
+        db._reintentos = PoliticaReintentos(max_reintentos=10, espera_base_ms=20)
+        
+        otra = sqlite3.connect(str(tmp_path / "test.db"), check_same_thread=False)
+        otra.execute("BEGIN IMMEDIATE")
+        liberar = threading.Timer(0.05, otra.commit)
+        liberar.start()
+        
+        assert db.crear_registro_trabajador("12.345.678-5", "Juan Pérez", "juan@empresa.cl") is not None
+        liberar.join()
+        otra.close()
+        stats = db.estadisticas_reintentos()
+        assert stats['reintentos'] >= 1 and stats['recuperadas'] == 1
+    
+    def test_escritura_abandonada_lanza_ocupada(self, db, tmp_path):
+        """Test que si el bloqueo no se libera la escritura lanza BaseDatosOcupadaError sin escribir."""
+        db._pool.obtener().execute("PRAGMA busy_timeout=0")
+        db._reintentos = PoliticaReintentos(max_reintentos=2, espera_base_ms=1)
+        
+        otra = sqlite3.connect(str(tmp_path / "test.db"))
+        otra.execute("BEGIN IMMEDIATE")
+        with pytest.raises(BaseDatosOcupadaError):
+            db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                       cargas=TestRegistroAtomico.CARGAS)
+        otra.rollback()
+        otra.close()
+        assert db.obtener_registro_por_rut("12.345.678-5") is None
+
+
+class TestContadoresEstadisticas:
+    """Tests para los contadores del dashboard mantenidos por triggers."""
+    
+    def _poblar(self, db):
+        db.agregar_empleado("12.345.678-5", "Juan Pérez")
+        db.agregar_empleado("22.222.222-2", "Ana Soto")
+        registro = db.crear_registro_completo(
+            "12.345.678-5", "Juan Pérez", "juan@empresa.cl", cargas=TestRegistroAtomico.CARGAS
+        )
+        otro = db.crear_registro_completo(
+            "22.222.222-2", "Ana Soto", "ana@empresa.cl",
+            cargas=[dict(TestRegistroAtomico.CARGAS[1], rut="33.333.333-3")]
+        )
+        return registro, otro
+    
+    def test_insercion_actualizacion_y_baja(self, db):
+        """Test que los contadores siguen inserciones, cambios y bajas lógicas."""
+        registro, otro = self._poblar(db)
+        db.marcar_email_enviado(registro['id'])
+        
+        stats = db.obtener_estadisticas()
+        assert stats['total_empleados'] == 2
+        assert stats['total_registros'] == 2
+        assert stats['total_cargas'] == 3
+        assert stats['cargas_por_tipo'] == {'Cónyuge': 1, 'Hijo': 2}
+        assert stats['hijos_por_sexo'] == {'Masculino': 2}
+        assert stats['conyuges_por_sexo'] == {'Femenino': 1}
+        assert stats['emails_enviados'] == 1
+        assert stats['registros_pendientes'] == 2
+        
+        db.marcar_registros_enviados()
+        db.eliminar_carga(registro['cargas'][0]['id'], "12.345.678-5", "Juan Pérez")
+        db.dar_baja_seguro(otro['id'], "22.222.222-2", "Ana Soto")
+        
+        stats = db.obtener_estadisticas()
+        assert stats['total_registros'] == 1
+        assert stats['total_cargas'] == 1
+        assert stats['cargas_por_tipo'] == {'Hijo': 1}
+        assert stats['conyuges_por_sexo'] == {}
+        assert stats['registros_enviados'] == 1
+        assert stats['registros_pendientes'] == 0
+        assert db.verificar_contadores() == {}
+    
+    def test_reconstruir_corrige_desviaciones(self, db):
+        """Test que la reconstrucción repara contadores desviados."""
+        self._poblar(db)
+        with db._pool.conexion() as conn:
+            conn.execute("UPDATE estadisticas_contadores SET valor = 99 WHERE clave = 'total_cargas'")
+        
+        assert db.verificar_contadores() == {'total_cargas': (99, 3)}
+        assert db.reconstruir_contadores() == {'total_cargas': (99, 3)}
+        assert db.obtener_estadisticas()['total_cargas'] == 3
+        assert db.verificar_contadores() == {}
+
+
+class TestClavesRut:
+    """Tests para la clave canónica rut_num/rut_dv."""
+    
+    def test_busqueda_con_cualquier_formato(self, db):
+        """Test que el registro se encuentra sin importar cómo se escriba el RUT."""
+        registro = db.crear_registro_completo("123456785", "Juan Pérez", "juan@empresa.cl")
+        assert registro['rut_trabajador'] == "12.345.678-5"
+        
+        for rut in ("12.345.678-5", "12345678-5", " 123456785 "):
+            assert db.obtener_registro_por_rut(rut)['id'] == registro['id']
+        assert db.obtener_registro_por_rut("12.345.678-9") is None
+        assert db.obtener_registro_por_rut("no es rut") is None
+        assert db.obtener_registros_pagina(rut="12345678-5")[0][0]['id'] == registro['id']
+    
+    def test_migracion_de_formatos_mezclados(self, tmp_path):
+        """Test que una base sin rut_num reescribe los RUT y queda buscable."""
+        ruta = str(tmp_path / "legacy.db")
+        servicio = DatabaseService(ruta)
+        with servicio._pool.conexion() as conn:
+            for indice in ('idx_empleados_rut_num', 'idx_registros_rut_num_activo', 'idx_cargas_rut_activo'):
+                conn.execute(f"DROP INDEX {indice}")
+            for tabla in ('empleados', 'registros_trabajador', 'cargas'):
+                for evento in ('insert', 'update', 'delete'):
+                    conn.execute(f"DROP TRIGGER trg_busqueda_{tabla}_{evento}")
+            conn.execute("DROP TABLE busqueda")
+            for tabla in ('empleados', 'registros_trabajador', 'cargas', 'notificaciones_admin'):
+                conn.execute(f"ALTER TABLE {tabla} DROP COLUMN rut_num")
+                conn.execute(f"ALTER TABLE {tabla} DROP COLUMN rut_dv")
+            conn.execute("INSERT INTO empleados (rut, nombre) VALUES ('11.111.111-k', 'Ana Soto')")
+            conn.execute("""INSERT INTO registros_trabajador (rut_trabajador, nombre_trabajador, email)
+                            VALUES ('123456785', 'Juan Pérez', 'juan@empresa.cl')""")
+            conn.execute("PRAGMA user_version = 0")
+        servicio.cerrar()
+        
+        servicio = DatabaseService(ruta)
+        with servicio._pool.conexion() as conn:
+            assert conn.execute("SELECT rut, rut_num, rut_dv FROM empleados").fetchone()[:] == \
+                ("11111111-K", 11111111, "K")
+            assert conn.execute("SELECT rut_trabajador FROM registros_trabajador").fetchone()[0] == "12.345.678-5"
+        assert servicio.obtener_registro_por_rut("12345678-5")['nombre_trabajador'] == "Juan Pérez"
+        assert servicio.verificar_empleado_existe("11.111.111-K")[0] is True
+        servicio.cerrar()
+
+
+class TestPaginacionRegistros:
+    """Tests para el listado paginado de registros."""
+    
+    def _poblar(self, db, cantidad):
+        ruts = ["11.111.111-1", "22.222.222-2", "33.333.333-3", "44.444.444-4", "55.555.555-5"]
+        ids = []
+        with db._pool.conexion() as conn:
+            for i in range(cantidad):
+                cursor = conn.execute(
+                    """INSERT INTO registros_trabajador
+                       (rut_trabajador, nombre_trabajador, email, banco, fecha_registro)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (ruts[i % len(ruts)], f"Trabajador {i}", "t@empresa.cl",
+                     "BCI" if i % 2 else "Banco Estado", f"2025-01-{1 + i // 2:02d} 10:00:00")
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+    
+    def test_recorre_todas_las_paginas_sin_repetir(self, db):
+        """Test que el cursor entrega todos los registros, del más reciente al más antiguo."""
+        ids = self._poblar(db, 7)
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = db.obtener_registros_pagina(limite=3, cursor=cursor)
+            vistos.extend(r['id'] for r in pagina)
+            if cursor is None:
+                break
+        assert vistos == sorted(ids, reverse=True)
+    
+    def test_filtros(self, db):
+        """Test de filtros por RUT, nombre, banco y rango de fechas."""
+        self._poblar(db, 10)
+        
+        por_rut, _ = db.obtener_registros_pagina(rut="111111111")
+        assert {r['rut_trabajador'] for r in por_rut} == {"11.111.111-1"}
+        assert len(por_rut) == 2
+        
+        por_nombre, _ = db.obtener_registros_pagina(nombre="dor 3")
+        assert [r['nombre_trabajador'] for r in por_nombre] == ["Trabajador 3"]
+        
+        por_banco, _ = db.obtener_registros_pagina(banco="BCI")
+        assert len(por_banco) == 5
+        
+        por_fecha, _ = db.obtener_registros_pagina(fecha_desde=date(2025, 1, 2), fecha_hasta=date(2025, 1, 3))
+        assert sorted(r['nombre_trabajador'] for r in por_fecha) == [f"Trabajador {i}" for i in range(2, 6)]
+    
+    def test_incluye_nombres_de_cargas(self, db):
+        """Test que cada registro trae el resumen de sus cargas activas."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   cargas=TestRegistroAtomico.CARGAS[:1])
+        pagina, siguiente = db.obtener_registros_pagina()
+        assert pagina[0]['nombres_cargas'] == "Ana Soto (Cónyuge)"
+        assert siguiente is None
+
+
+class TestExportacion:
+    """Tests para el motor de exportación a Excel."""
+    
+    def test_exportar_registros_formatea_fechas(self, db, tmp_path):
+        """Test que la planilla trae ambas hojas con fechas DD-MM-YY."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   banco="BCI", cargas=TestRegistroAtomico.CARGAS)
+        archivo = tmp_path / "registros.xlsx"
+        
+        assert db.exportar_registros_excel(str(archivo)) is True
+        
+        libro = load_workbook(archivo)
+        assert libro.sheetnames == ['Trabajadores', 'Cargas Familiares']
+        trabajadores = list(libro['Trabajadores'].values)
+        assert trabajadores[0][:2] == ('RUT', 'Nombre')
+        assert trabajadores[1][:2] == ("12.345.678-5", "Juan Pérez")
+        assert trabajadores[1][6] == date.today().strftime("%d-%m-%y")
+        cargas = list(libro['Cargas Familiares'].values)
+        assert len(cargas) == 3
+        assert cargas[1][8:10] == ('Ana Soto', '01-01-90')
+    
+    def test_exportar_recalcula_edades(self, db, tmp_path):
+        """Test que la edad exportada se calcula a la fecha de exportación y no es la guardada."""
+        cargas = [dict(c, edad=0) for c in TestRegistroAtomico.CARGAS]
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl", cargas=cargas)
+        archivo = tmp_path / "registros.xlsx"
+        
+        assert db.exportar_registros_excel(str(archivo)) is True
+        
+        filas = list(load_workbook(archivo)['Cargas Familiares'].values)
+        edades = {fila[8]: fila[10] for fila in filas[1:]}
+        assert edades == {
+            'Ana Soto': calcular_edad(date(1990, 1, 1)),
+            'Pedro Pérez': calcular_edad(date(2015, 6, 1))
+        }
+    
+    def test_edades_cargas_a_fecha_de_referencia(self, db):
+        """Test que las edades del dashboard se calculan a la referencia dada."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   cargas=TestRegistroAtomico.CARGAS)
+        
+        edades = db.obtener_edades_cargas(referencia=date(2030, 5, 31))
+        
+        assert edades['nombre'].tolist() == ['Ana Soto', 'Pedro Pérez']
+        assert edades['edad'].tolist() == [40, 14]
+        assert edades['rut_trabajador'].tolist() == ["12.345.678-5"] * 2
+    
+    def test_marca_hijos_sobre_edad_maxima(self, db):
+        """Test que un hijo guardado sobre la edad máxima queda marcado y el cónyuge no."""
+        cargas = [
+            dict(TestRegistroAtomico.CARGAS[0]),
+            dict(TestRegistroAtomico.CARGAS[1], fecha_nacimiento=date(2000, 1, 1)),
+        ]
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl", cargas=cargas)
+        
+        edades = db.obtener_edades_cargas(referencia=date(2030, 5, 31), edad_maxima_hijo=25)
+        
+        assert edades['sobre_edad_maxima'].tolist() == [False, True]
+        assert 'sobre_edad_maxima' not in db.obtener_edades_cargas().columns
+    
+    def test_pendientes_sin_registros(self, db, tmp_path):
+        """Test que sin pendientes no se genera planilla."""
+        archivo = tmp_path / "pendientes.xlsx"
+        assert db.solo_exportar_pendientes(str(archivo)) is False
+        assert not archivo.exists()
+    
+    def test_exportar_y_marcar(self, db, tmp_path):
+        """Test que se exportan solo los pendientes y quedan marcados."""
+        enviado = db.crear_registro_completo("11.111.111-1", "Ya Enviado", "a@empresa.cl")
+        db.marcar_registros_enviados()
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                   cargas=TestRegistroAtomico.CARGAS[:1])
+        archivo = tmp_path / "lote.xlsx"
+        
+        assert db.exportar_y_marcar_enviado(str(archivo), "seguros@aseguradora.cl") is True
+        
+        libro = load_workbook(archivo)
+        assert [fila[1] for fila in libro['Trabajadores'].iter_rows(min_row=2, values_only=True)] == ["Juan Pérez"]
+        assert libro['Cargas Familiares'].max_row == 2
+        assert db.obtener_registros_pendientes_envio() == []
+        assert db.obtener_registro_con_cargas(enviado['id'])['numero_lote'] == "LOTE_000001"
+
+
+class TestMarcadoLote:
+    """Tests para el marcado de lotes sobre la foto de IDs exportados."""
+    
+    def test_marca_solo_lo_exportado(self, db, tmp_path):
+        """Test que un registro creado después de exportar queda pendiente."""
+        exportado = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                               cargas=TestRegistroAtomico.CARGAS)
+        lote = db.exportar_pendientes_lote(str(tmp_path / "lote.xlsx"))
+        assert lote['registros'] == [exportado['id']]
+        assert sorted(lote['cargas']) == sorted(c['id'] for c in exportado['cargas'])
+        
+        tardio = db.crear_registro_completo("22.222.222-2", "Ana Soto", "ana@empresa.cl")
+        assert db.marcar_registros_enviados(lote) is True
+        
+        assert [r['id'] for r in db.obtener_registros_pendientes_envio()] == [tardio['id']]
+        marcado = db.obtener_registro_con_cargas(exportado['id'])
+        assert marcado['numero_lote'] == lote['numero']
+        assert {c['lote_id'] for c in marcado['cargas']} == {lote['id']}
+    
+    def test_cargas_nuevas_de_registros_enviados(self, db, tmp_path):
+        """Test que las cargas nuevas de un registro ya enviado viajan en el lote siguiente."""
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        db.marcar_registros_enviados()
+        db.agregar_carga_a_registro(registro["id"], "Hijo", "22.222.222-2", "Pedro Pérez", "Masculino", date(2015, 6, 1), 10)
+        archivo = tmp_path / "lote.xlsx"
+        
+        pendientes = db.obtener_cargas_nuevas_pendientes()
+        assert [(c['nombre'], c['nombre_trabajador'], c['rut_trabajador']) for c in pendientes] == [
+            ("Pedro Pérez", "Juan Pérez", "12.345.678-5")
+        ]
+        
+        lote = db.exportar_pendientes_lote(str(archivo))
+        
+        assert lote['registros'] == []
+        assert len(lote['cargas']) == 1
+        assert load_workbook(archivo)['Cargas Familiares'].max_row == 2
+        assert db.marcar_registros_enviados(lote) is True
+        assert db.obtener_cargas_nuevas_pendientes() == []
+
+
+class TestLotes:
+    """Tests para la tabla de lotes y su historial."""
+    
+    def test_lote_generado_y_enviado(self, db, tmp_path):
+        """Test que el lote guarda totales y checksum, y su detalle lista los miembros."""
+        registro = db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                              cargas=TestRegistroAtomico.CARGAS)
+        archivo = tmp_path / "lote.xlsx"
+        
+        lote = db.exportar_pendientes_lote(str(archivo), "seguros@aseguradora.cl")
+        
+        assert lote['numero'] == "LOTE_000001"
+        assert len(lote['checksum_sha256']) == 64
+        historial = db.obtener_lotes()
+        assert [(l['numero'], l['estado'], l['total_registros'], l['total_cargas']) for l in historial] == [
+            ("LOTE_000001", 'generado', 1, 2)
+        ]
+        assert db.obtener_detalle_lote(lote['id'])['registros'] == []
+        
+        assert db.marcar_registros_enviados(lote) is True
+        
+        detalle = db.obtener_detalle_lote(lote['id'])
+        assert detalle['estado'] == 'enviado'
+        assert detalle['destinatario'] == "seguros@aseguradora.cl"
+        assert detalle['fecha_envio'] is not None
+        assert [r['id'] for r in detalle['registros']] == [registro['id']]
+        assert len(detalle['cargas']) == 2
+    
+    def test_numeros_de_lote_no_se_repiten(self, db):
+        """Test que cada lote recibe un número distinto de la secuencia."""
+        db.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        db.marcar_registros_enviados()
+        db.crear_registro_completo("22.222.222-2", "Ana Soto", "ana@empresa.cl")
+        db.marcar_registros_enviados()
+        assert [l['numero'] for l in db.obtener_lotes()] == ["LOTE_000002", "LOTE_000001"]
+    
+    def test_migra_numeros_de_lote_en_texto(self, tmp_path):
+        """Test que una base con numero_lote en texto queda enlazada a la tabla de lotes."""
+        ruta = str(tmp_path / "legacy.db")
+        servicio = DatabaseService(ruta)
+        registro = servicio.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl",
+                                                    cargas=TestRegistroAtomico.CARGAS)
+        with servicio._pool.conexion() as conn:
+            conn.execute("DROP INDEX idx_registros_lote")
+            conn.execute("DROP INDEX idx_cargas_lote")
+            for tabla in ('registros_trabajador', 'cargas'):
+                conn.execute(f"ALTER TABLE {tabla} DROP COLUMN lote_id")
+                conn.execute(f"""UPDATE {tabla} SET enviado_aseguradora = 1, numero_lote = 'LOTE_20250101_120000',
+                                 fecha_envio_aseguradora = '2025-01-01 12:00:00'""")
+            conn.execute("DROP TABLE lotes")
+            conn.execute("PRAGMA user_version = 0")
+        servicio.cerrar()
+        
+        servicio = DatabaseService(ruta)
+        historial = servicio.obtener_lotes()
+        assert [(l['numero'], l['total_registros'], l['total_cargas']) for l in historial] == [
+            ("LOTE_20250101_120000", 1, 2)
+        ]
+        detalle = servicio.obtener_detalle_lote(historial[0]['id'])
+        assert [r['id'] for r in detalle['registros']] == [registro['id']]
+        servicio.cerrar()
+
+
+class TestPlanesConsultas:
+    """Tests de regresión de planes de ejecución de las consultas frecuentes."""
+    
+    @pytest.mark.parametrize("nombre", sorted(CONSULTAS_CRITICAS))
+    def test_consulta_no_recorre_tabla_completa(self, db, nombre):
+        """Test que la consulta usa un índice en vez de un SCAN completo."""
+        sql, parametros = CONSULTAS_CRITICAS[nombre]
+        conn = db._pool.obtener()
+        plan = [fila['detail'] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+        
+        # Recorrer el resultado de una subconsulta (CO-ROUTINE/MATERIALIZE) no lee la tabla
+        subconsultas = {d.split()[-1] for d in plan if d.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+        recorridos = [d for d in plan if d.startswith("SCAN") and "USING" not in d
+                      and d.split()[1] not in subconsultas]
+        assert not recorridos, f"{nombre} recorre la tabla completa: {plan}"
+    
+    def test_estado_envio_nulo_se_normaliza(self, tmp_path):
+        """Test que los NULL en enviado_aseguradora pasan a 0 al abrir la base."""
+        ruta = str(tmp_path / "legacy.db")
+        servicio = DatabaseService(ruta)
+        registro = servicio.crear_registro_completo("12.345.678-5", "Juan Pérez", "juan@empresa.cl")
+        with servicio._pool.conexion() as conn:
+            conn.execute("UPDATE registros_trabajador SET enviado_aseguradora = NULL")
+            conn.execute("PRAGMA user_version = 0")
+        servicio.cerrar()
+        
+        servicio = DatabaseService(ruta)
+        pendientes = servicio.obtener_registros_pendientes_envio()
+        assert [r['id'] for r in pendientes] == [registro['id']]
+        assert servicio.verificar_contadores() == {}
+        servicio.cerrar()
+
+
+@pytest.fixture
+def base_produccion(tmp_path):
+    """
+    Base sin versionar con datos de producción. Con MIGRACION_DB_ORIGEN se usa
+    ese archivo; si no, se arma una con el esquema original y datos en formatos mezclados.
+    """
+    origen = os.getenv("MIGRACION_DB_ORIGEN")
+    if origen:
+        return origen
+    
+    ruta = str(tmp_path / "produccion.db")
+    conn = sqlite3.connect(ruta)
+    MIGRACIONES[0][2](conn.cursor())
+    conn.executemany("INSERT INTO empleados (rut, nombre) VALUES (?, ?)",
+                     [("12.345.678-5", "Juan Pérez"), ("11111111-k", "Ana Soto")])
+    conn.execute("""INSERT INTO registros_trabajador
+                    (rut_trabajador, nombre_trabajador, email, enviado_aseguradora, numero_lote)
+                    VALUES ('123456785', 'Juan Pérez', 'juan@empresa.cl', 1, 'LOTE_20250101_120000')""")
+    conn.execute("""INSERT INTO registros_trabajador
+                    (rut_trabajador, nombre_trabajador, email, enviado_aseguradora)
+                    VALUES ('11.111.111-K', 'Ana Soto', 'ana@empresa.cl', NULL)""")
+    conn.execute("""INSERT INTO cargas (registro_id, tipo, rut, nombre, sexo, fecha_nacimiento, edad)
+                    VALUES (1, 'Hijo', '22222222-2', 'Pedro Pérez', 'Masculino', '2015-06-01', 10)""")
+    conn.commit()
+    conn.close()
+    return ruta
+
+
+class TestMigraciones:
+    """Tests para las migraciones versionadas del esquema."""
+    
+    TABLAS = ('empleados', 'registros_trabajador', 'cargas', 'notificaciones_admin')
+    
+    @staticmethod
+    def _copiar(origen: str, destino: str) -> str:
+        fuente, copia = sqlite3.connect(origen), sqlite3.connect(destino)
+        fuente.backup(copia)
+        fuente.close()
+        copia.close()
+        return destino
+    
+    @classmethod
+    def _conteos(cls, ruta: str) -> dict:
+        conn = sqlite3.connect(ruta)
+        conteos = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in cls.TABLAS}
+        conteos['version'] = version_actual(conn)
+        conn.close()
+        return conteos
+    
+    def test_migra_copia_de_produccion(self, base_produccion, tmp_path):
+        """Test que una copia de producción llega a la última versión sin perder filas."""
+        antes = self._conteos(base_produccion)
+        copia = self._copiar(base_produccion, str(tmp_path / "copia.db"))
+        
+        servicio = DatabaseService(copia)
+        despues = self._conteos(copia)
+        assert despues['version'] == MIGRACIONES[-1][0]
+        assert {t: despues[t] for t in self.TABLAS} == {t: antes[t] for t in self.TABLAS}
+        assert servicio.verificar_contadores() == {}
+        if not os.getenv("MIGRACION_DB_ORIGEN"):
+            assert [r['nombre_trabajador'] for r in servicio.obtener_registros_pendientes_envio()] == ["Ana Soto"]
+            assert [l['numero'] for l in servicio.obtener_lotes()] == ["LOTE_20250101_120000"]
+            assert [(r.tipo, r.registro_id) for r in servicio.buscar("pedro")] == [('carga', 1)]
+        servicio.cerrar()
+        
+        assert self._conteos(base_produccion) == antes
+    
+    def test_simulacion_no_modifica(self, base_produccion, tmp_path):
+        """Test que el dry-run ejecuta los pasos pendientes y deja la base como estaba."""
+        copia = self._copiar(base_produccion, str(tmp_path / "copia.db"))
+        antes = self._conteos(copia)
+        conn = sqlite3.connect(copia)
+        
+        pasos = migrar(conn, MIGRACIONES, simular=True)
+        
+        assert [v for v, _ in pasos] == [v for v, _, _ in MIGRACIONES if v > antes['version']]
+        assert version_actual(conn) == antes['version']
+        conn.close()
+        assert self._conteos(copia) == antes
+    
+    def test_base_al_dia_solo_lee_version(self, db):
+        """Test que al abrir una base al día no se ejecuta DDL."""
+        sentencias = []
+        conn = db._pool.obtener()
+        conn.set_trace_callback(sentencias.append)
+        assert migrar(conn, MIGRACIONES) == []
+        conn.set_trace_callback(None)
+        assert sentencias == ["PRAGMA user_version"]
+    
+    def test_paso_fallido_no_cambia_version(self, db):
+        """Test que si un paso falla se deshace toda la migración."""
+        def fallar(cursor):
+            cursor.execute("CREATE TABLE nueva (id INTEGER)")
+            cursor.execute("SELECT * FROM no_existe")
+        
+        conn = db._pool.obtener()
+        version = version_actual(conn)
+        with pytest.raises(sqlite3.OperationalError):
+            migrar(conn, MIGRACIONES + [(version + 1, "Paso con error", fallar)])
+        assert version_actual(conn) == version
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'nueva'").fetchone() is None
+        
+        with pytest.raises(ValueError):
+            migrar(conn, [MIGRACIONES[1], MIGRACIONES[0]])
+
@@ -0,0 +1,89 @@
+"""
+Tests del calendario de días hábiles.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from services.dias_habiles import CalendarioHabil, CalendarioHabilCacheado, feriados_chile
+
+
+class TestDiasHabiles:
+    """Tests para el calendario de días hábiles."""
+    
+    @staticmethod
+    def _sumar_dia_a_dia(calendario, inicio, dias):
+        fecha = inicio
+        while dias > 0:
+            fecha += timedelta(days=1)
+            dias -= calendario.es_habil(fecha)
+        return fecha
+    
+    def test_feriados_moviles(self):
+        """Test de Semana Santa, traslados a lunes, Evangélicas y Pueblos Indígenas."""
+        feriados = set(feriados_chile(2023))
+        assert {date(2023, 4, 7), date(2023, 4, 8)} <= feriados  # Viernes y Sábado Santo
+        assert date(2023, 6, 26) in feriados and date(2023, 6, 29) not in feriados
+        assert date(2023, 10, 9) in feriados and date(2023, 10, 12) not in feriados
+        assert date(2023, 10, 27) in feriados and date(2023, 10, 31) not in feriados
+        assert date(2023, 6, 21) in feriados
+        assert date(2023, 1, 2) in feriados
+        
+        feriados = set(feriados_chile(2024))
+        assert date(2024, 6, 20) in feriados
+        assert date(2024, 9, 20) in feriados
+        assert date(2024, 10, 31) in feriados
+    
+    def test_suma_sin_feriados(self):
+        """Test de semanas completas y resto sobre fines de semana."""
+        calendario = CalendarioHabil(feriados_del_anio=lambda anio: [])
+        viernes = date(2026, 10, 16)
+        assert calendario.sumar_dias_habiles(viernes, 0) == viernes
+        assert calendario.sumar_dias_habiles(viernes, 1) == date(2026, 10, 19)
+        assert calendario.sumar_dias_habiles(viernes, 5) == date(2026, 10, 23)
+        assert calendario.sumar_dias_habiles(date(2026, 10, 17), 1) == date(2026, 10, 19)
+        assert calendario.sumar_dias_habiles(viernes, 15) == date(2026, 11, 6)
+        with pytest.raises(ValueError):
+            calendario.sumar_dias_habiles(viernes, -1)
+    
+    def test_suma_salta_feriados(self):
+        """Test que la suma salta feriados, también los que aparecen al correr el fin."""
+        calendario = CalendarioHabil()
+        # 17/9/2024 + 1: miércoles 18, jueves 19 y viernes 20 son feriados
+        assert calendario.sumar_dias_habiles(date(2024, 9, 17), 1) == date(2024, 9, 23)
+        # Cruza de año: 25/12 y 1/1 son feriados
+        assert calendario.sumar_dias_habiles(date(2025, 12, 24), 5) == date(2026, 1, 2)
+        assert not calendario.es_habil(date(2026, 10, 12))
+        assert calendario.es_habil(date(2026, 10, 13))
+    
+    def test_coincide_con_recorrido_dia_a_dia(self):
+        """Test contra el recorrido día por día en varios años."""
+        calendario = CalendarioHabil(adicionales=[date(2025, 11, 17)])
+        inicio = date(2023, 12, 20)
+        for desplazamiento in range(0, 800, 7):
+            fecha = inicio + timedelta(days=desplazamiento)
+            for dias in (1, 4, 15, 40):
+                fin = calendario.sumar_dias_habiles(fecha, dias)
+                assert fin == self._sumar_dia_a_dia(calendario, fecha, dias)
+                assert calendario.dias_habiles_entre(fecha, fin) == dias
+                assert calendario.dias_habiles_entre(fin, fecha) == -dias
+    
+    def test_feriados_adicionales(self):
+        """Test que los feriados adicionales se descuentan."""
+        base = CalendarioHabil()
+        con_eleccion = CalendarioHabil(adicionales=[date(2026, 10, 19)])
+        assert base.sumar_dias_habiles(date(2026, 10, 16), 1) == date(2026, 10, 19)
+        assert con_eleccion.sumar_dias_habiles(date(2026, 10, 16), 1) == date(2026, 10, 20)
+    
+    def test_cache_por_inicio_y_dias(self):
+        """Test que la versión cacheada calcula una sola vez por inicio y días."""
+        calendario = CalendarioHabilCacheado()
+        primera = calendario.sumar_dias_habiles(date(2026, 10, 16), 15)
+        assert calendario.sumar_dias_habiles(date(2026, 10, 16), 15) == primera
+        estadisticas = calendario.estadisticas()
+        assert estadisticas['aciertos'] == 1
+        assert estadisticas['fallos'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,17 +1,26 @@
 """
 Tests unitarios para el módulo de validadores.
 """
+import numpy as np
+import pandas as pd
 import pytest
 from datetime import date, timedelta
 from utils.validators import (
     validar_rut,
     formatear_rut,
     limpiar_rut,
+    descomponer_rut,
     calcular_digito_verificador,
     validar_nombre,
     validar_fecha_nacimiento,
-    calcular_edad
+    calcular_edad,
+    normalizar_rut,
+    validar_email,
+    validar_numero_cuenta
 )
+from utils.fechas import calcular_edades, convertir_fechas, edad_en
+from utils.rut_masivo import calcular_dv_array, normalizar_ruts, validar_ruts
+from utils.validacion_masiva import COLUMNAS_ERRORES, validar_cargas, validar_empleados
 
 
 class TestValidacionRUT:
@@ -62,6 +71,16 @@ class TestValidacionRUT:
         """Test formateo de RUT."""
         assert formatear_rut("123456785") == "12.345.678-5"
         assert formatear_rut("11111111K") == "11.111.111-K"
+        assert formatear_rut("1234567-4") == "1.234.567-4"
+        assert formatear_rut("1234") == "123-4"
+        assert formatear_rut("1") == "1"
+    
+    def test_descomponer_rut(self):
+        """Test separación de RUT en cuerpo numérico y dígito verificador."""
+        assert descomponer_rut("12.345.678-5") == (12345678, "5")
+        assert descomponer_rut(" 11111111-k ") == (11111111, "K")
+        assert descomponer_rut("abc") is None
+        assert descomponer_rut("") is None
     
     def test_calcular_digito_verificador(self):
         """Test cálculo de dígito verificador."""
@@ -107,6 +126,44 @@ class TestValidacionNombre:
         assert valido is True
 
 
+class TestValidacionEmail:
+    """Tests para validación de correos electrónicos."""
+    
+    def test_email_valido(self):
+        """Test correos con dominios aceptados, sin distinguir mayúsculas."""
+        assert validar_email("juan.perez@empresa.cl")[0] is True
+        assert validar_email("  Ana@Correo.COM ")[0] is True
+        assert validar_email("x@startup.co")[0] is True
+    
+    def test_email_formato_invalido(self):
+        """Test correos sin arroba o sin dominio."""
+        assert validar_email("")[0] is False
+        assert validar_email("juan.perez")[1] == "Formato de correo electrónico inválido"
+        assert validar_email("juan@empresa")[0] is False
+    
+    def test_email_dominio_no_aceptado(self):
+        """Test que el dominio se compara completo, no como prefijo."""
+        assert validar_email("a@empresa.ar")[1] == "El dominio del correo no parece válido"
+        assert validar_email("a@empresa.cl.ar")[0] is False
+        assert validar_email("a@empresa.comx")[0] is False
+
+
+class TestValidacionNumeroCuenta:
+    """Tests para validación de números de cuenta."""
+    
+    def test_cuenta_con_separadores(self):
+        """Test que se ignoran espacios y guiones."""
+        assert validar_numero_cuenta("1234-5678 90")[0] is True
+        assert validar_numero_cuenta("12 34\t5")[0] is True
+    
+    def test_cuenta_invalida(self):
+        """Test cuentas vacías, con letras o de largo fuera de rango."""
+        assert validar_numero_cuenta(" ")[0] is False
+        assert "solo números" in validar_numero_cuenta("12a45")[1]
+        assert "entre 5 y 20" in validar_numero_cuenta("1234")[1]
+        assert validar_numero_cuenta("1" * 21)[0] is False
+
+
 class TestValidacionFecha:
     """Tests para validación de fechas."""
     
@@ -146,5 +203,183 @@ class TestValidacionFecha:
         assert edad == 30
 
 
+
+class TestMotorFechas:
+    """Tests para la conversión de fechas y el cálculo vectorizado de edades."""
+    
+    def test_convertir_fechas(self):
+        """Test de los formatos aceptados y NaT para lo que no se reconoce."""
+        fechas = convertir_fechas([
+            date(2015, 6, 1), "2015-06-01", "2015-06-01 10:30:00", "01/06/2015",
+            pd.Timestamp("2015-06-01 23:59"), None, "", "31/02/2015", "sin fecha"
+        ])
+        assert fechas.dtype == np.dtype('datetime64[D]')
+        assert (fechas[:5] == np.datetime64('2015-06-01')).all()
+        assert np.isnat(fechas[5:]).all()
+    
+    def test_calcular_edades_coincide_con_escalar(self):
+        """Test que cada edad coincide con edad_en, incluidos los 29 de febrero."""
+        referencias = [date(2024, 2, 28), date(2024, 2, 29), date(2025, 2, 28), date(2025, 3, 1), date(2026, 10, 16)]
+        nacimientos = [date(2000, 2, 29), date(2004, 2, 28), date(1990, 12, 31), date(1990, 1, 1),
+                       date(2025, 3, 1), date(1905, 10, 16), date(2026, 10, 16)]
+        for referencia in referencias:
+            edades = calcular_edades(nacimientos, referencia)
+            assert edades.tolist() == [edad_en(n, referencia) for n in nacimientos]
+    
+    def test_referencia_explicita(self):
+        """Test que los envoltorios escalares usan la referencia dada."""
+        assert calcular_edad(date(2000, 6, 15), referencia=date(2025, 6, 14)) == 24
+        assert calcular_edad(date(2000, 6, 15), referencia=date(2025, 6, 15)) == 25
+        valido, _ = validar_fecha_nacimiento(date(2030, 1, 1), referencia=date(2031, 1, 1))
+        assert valido is True
+        valido, mensaje = validar_fecha_nacimiento(date(2000, 1, 1), 25, referencia=date(2026, 1, 1))
+        assert valido is False and "(26 años)" in mensaje
+    
+    def test_calcular_edades_rechaza_nulos(self):
+        """Test que una fecha nula o no reconocida no se convierte en una edad."""
+        with pytest.raises(ValueError):
+            calcular_edades(["2015-06-01", None], date(2026, 1, 1))
+        assert calcular_edades([], date(2026, 1, 1)).tolist() == []
+
+
+class TestRutMasivo:
+    """Tests para la validación y normalización de columnas de RUT."""
+    
+    # Formatos válidos e inválidos, espacios, controles, NUL, no ASCII y textos largos
+    RUTS = [
+        "12.345.678-5", "12345678-5", "123456785", " 12.345.678-5 ", "11.111.111-1",
+        "12.345.678-9", "1.234.567-4", "1234567-4", "7.654.321-k", "7654321K", "7654321-0",
+        "", "   ", "\t\n", ".", "-", "..--", "5", "abc", "12.345.678", "123.456.789-0",
+        "12345678-55", "1234-5", "12\x1c345678-5", "12\x01345678-5", "1\x002345678-5",
+        "１２３４５６７８-5", "١٢٣٤٥٦٧-4", "12\u00a0345\u2009678-5", "Ñ12345678-5",
+        "12345678-5" + " " * 40, "x" * 40 + "12345678-5", "00000000-0", "0000000-0",
+    ]
+    
+    @pytest.mark.parametrize("tipo", [object, "str"])
+    def test_coincide_con_funciones_escalares(self, tipo):
+        """Test que cada fila da el mismo resultado que validar_rut y normalizar_rut."""
+        ruts = pd.Series(self.RUTS, index=range(100, 100 + len(self.RUTS)), dtype=tipo)
+        
+        resultado = validar_ruts(ruts)
+        assert list(resultado.index) == list(ruts.index)
+        assert resultado['valido'].tolist() == [validar_rut(r)[0] for r in self.RUTS]
+        assert normalizar_ruts(ruts).tolist() == [normalizar_rut(r) for r in self.RUTS]
+    
+    def test_motivos_nulos_y_no_texto(self):
+        """Test de los códigos de motivo, los nulos y los valores numéricos."""
+        ruts = pd.Series(["12.345.678-5", None, np.nan, " ", "12-3", "12.345.678-9", 123456785], dtype=object)
+        resultado = validar_ruts(ruts)
+        assert resultado['motivo'].tolist()[1:6] == ['vacio', 'vacio', 'vacio', 'formato', 'digito_verificador']
+        assert pd.isna(resultado['motivo'][0]) and pd.isna(resultado['motivo'][6])
+        assert resultado['valido'].tolist() == [True, False, False, False, False, False, True]
+        assert normalizar_ruts(ruts).tolist() == ["12345678-5", "", "", " ", "12-3", "12345678-9", "12345678-5"]
+        
+        assert validar_ruts(pd.Series([], dtype=object)).empty
+        assert normalizar_ruts(pd.Series([], dtype="str")).empty
+    
+    def test_columna_str_recortada_con_nulos(self):
+        """Test que una columna str con nulos, tomada desde la mitad, coincide con las funciones escalares."""
+        valores = [None, "12.345.678-5", None, *self.RUTS, None]
+        ruts = pd.Series(valores, dtype="str").iloc[2:]
+        textos = [valor or "" for valor in valores[2:]]
+        
+        assert validar_ruts(ruts)['valido'].tolist() == [validar_rut(texto)[0] for texto in textos]
+        assert normalizar_ruts(ruts).tolist() == [normalizar_rut(texto) for texto in textos]
+    
+    def test_calcular_dv_array(self):
+        """Test que el dígito verificador coincide con el escalar."""
+        numeros = np.array([0, 1, 9, 1234567, 7654321, 11111111, 12345678, 99999999, 123456789012])
+        assert calcular_dv_array(numeros).tolist() == [calcular_digito_verificador(str(n)) for n in numeros]
+        with pytest.raises(ValueError):
+            calcular_dv_array([-1])
+
+
+
+class TestValidacionMasiva:
+    """Tests para la validación de planillas completas."""
+    
+    NOMBRES = ["Ana", "A", " ", "", "José Pérez", "X1", "O'Neil-Díaz", "Ana\n", None, "Ñandú\u00a0Soto"]
+    EMAILS = ["a@b.cl", "", " A@B.COM ", "a@b.ar", "malo", None, "a@b.co", "x@y.io", "u@v.c", "z@z.org"]
+    CUENTAS = ["12345", "1234", "12-34 5", "abc12", "", "1" * 21, None, "12 345", "1-2-3-4-5", "99999"]
+    
+    @staticmethod
+    def _filas_invalidas(valores, validar, opcional=False):
+        return [
+            i for i, v in enumerate(valores)
+            if not (opcional and not v) and not validar(v or '')[0]
+        ]
+    
+    @pytest.mark.parametrize("tipo", [object, "str"])
+    def test_coincide_con_funciones_escalares(self, tipo):
+        """Test que cada campo rechaza las mismas filas que su validador."""
+        ruts = [formatear_rut(f"{n}{calcular_digito_verificador(str(n))}") for n in range(10_000_001, 10_000_011)]
+        df = pd.DataFrame({
+            'rut': pd.Series(ruts, dtype=tipo).to_numpy(),
+            'nombre': pd.Series(self.NOMBRES, dtype=tipo).to_numpy(),
+            'email': pd.Series(self.EMAILS, dtype=tipo).to_numpy(),
+            'numero_cuenta': pd.Series(self.CUENTAS, dtype=tipo).to_numpy()
+        })
+        
+        errores = validar_empleados(df)
+        
+        assert list(errores.columns) == COLUMNAS_ERRORES
+        por_campo = errores.groupby('campo', observed=True)['fila'].apply(list)
+        assert por_campo['nombre'] == self._filas_invalidas(self.NOMBRES, validar_nombre)
+        assert por_campo['email'] == self._filas_invalidas(self.EMAILS, validar_email, opcional=True)
+        assert por_campo['numero_cuenta'] == self._filas_invalidas(self.CUENTAS, validar_numero_cuenta, opcional=True)
+        assert 'rut' not in por_campo
+    
+    def test_filas_codigos_y_duplicados(self):
+        """Test que se reportan etiquetas de fila, códigos y duplicados sin otros errores."""
+        df = pd.DataFrame({
+            'rut': ["12.345.678-5", "12345678-5", "12.345.678-9", "", "22.222.222-2", "22222222-2"],
+            'nombre': ["Ana", "Ana", "Luis", "", "", "Eva"]
+        }, index=[10, 20, 30, 40, 50, 60])
+        
+        errores = validar_empleados(df)
+        
+        assert list(zip(errores['fila'], errores['campo'], errores['codigo'])) == [
+            (20, 'rut', 'duplicado'),
+            (30, 'rut', 'digito_verificador'),
+            (40, 'rut', 'vacio'),
+            (40, 'nombre', 'vacio'),
+            (50, 'nombre', 'vacio')
+        ]
+        assert errores['mensaje'].iloc[0] == "RUT duplicado en el archivo"
+        assert validar_empleados(df.iloc[:1]).empty
+        with pytest.raises(ValueError):
+            validar_empleados(df[['rut']])
+    
+    def test_validar_cargas(self):
+        """Test de fechas, edad máxima de hijos (etiqueta o tipo guardado) y fecha de referencia explícita."""
+        referencia = date(2026, 10, 16)
+        fechas = [
+            date(2001, 10, 16), "2000-10-16", "16/10/2000", "2027-01-01", "1905-10-15",
+            "", None, "31/02/2015", pd.Timestamp("1980-05-01 13:00"), date(2026, 10, 16)
+        ]
+        df = pd.DataFrame({
+            'rut': [f"{n}-{calcular_digito_verificador(str(n))}" for n in range(10_000_001, 10_000_011)],
+            'nombre': ["Nombre Apellido"] * 10,
+            'fecha_nacimiento': fechas,
+            'tipo': ["Hijo/a", "Hijo", "Hijo/a", "Hijo"] + ["Cónyuge"] * 6
+        })
+        
+        errores = validar_cargas(df, edad_maxima_hijo=25, referencia=referencia)
+        
+        assert dict(zip(errores['fila'], errores['codigo'])) == {
+            1: 'edad_maxima',
+            2: 'edad_maxima',
+            3: 'futura',
+            4: 'edad_invalida',
+            5: 'vacio',
+            6: 'vacio',
+            7: 'formato'
+        }
+        assert set(errores['campo']) == {'fecha_nacimiento'}
+        assert "(25 años)" in errores['mensaje'].iloc[0]
+        assert len(validar_cargas(df, referencia=referencia)) == 5
+        assert len(validar_cargas(df.drop(columns='tipo'), edad_maxima_hijo=25, referencia=referencia)) == 8
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
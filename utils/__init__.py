@@ -3,22 +3,35 @@ from .validators import (
     validar_rut,
     formatear_rut,
     normalizar_rut,
+    descomponer_rut,
     validar_nombre,
     validar_fecha_nacimiento,
     calcular_edad,
     validar_email,
     validar_numero_cuenta
 )
+from .fechas import convertir_fechas, calcular_edades, edad_en
+from .rut_masivo import validar_ruts, normalizar_ruts, calcular_dv_array
+from .validacion_masiva import validar_empleados, validar_cargas
 from .logger import logger
 
 __all__ = [
     'validar_rut',
     'formatear_rut',
     'normalizar_rut',
+    'descomponer_rut',
     'validar_nombre',
     'validar_fecha_nacimiento',
     'calcular_edad',
     'validar_email',
     'validar_numero_cuenta',
+    'convertir_fechas',
+    'calcular_edades',
+    'edad_en',
+    'validar_ruts',
+    'normalizar_ruts',
+    'calcular_dv_array',
+    'validar_empleados',
+    'validar_cargas',
     'logger'
 ]
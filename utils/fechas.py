@@ -0,0 +1,104 @@
+"""
+Motor de fechas: conversión de columnas de fechas y cálculo de edades.
+
+Las edades se calculan siempre contra una fecha de referencia explícita,
+para una fecha (edad_en) o para un arreglo completo en una pasada de NumPy
+(calcular_edades). calcular_edad y validar_fecha_nacimiento de validators
+son los envoltorios escalares, con hoy como referencia por defecto.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+def convertir_fechas(valores) -> np.ndarray:
+    """
+    Convierte un arreglo de fechas a datetime64[D].
+    
+    Acepta date, datetime, datetime64 y texto 'AAAA-MM-DD[ HH:MM:SS]' (como
+    se guarda en SQLite) o 'DD/MM/AAAA'. La hora se descarta.
+    
+    Args:
+        valores: Series, arreglo o lista de fechas
+    
+    Returns:
+        Arreglo datetime64[D] con NaT en los nulos y en lo que no se reconoce
+    """
+    if isinstance(valores, np.ndarray) and np.issubdtype(valores.dtype, np.datetime64):
+        return valores.astype('datetime64[D]')
+    
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        convertidas = serie
+    else:
+        convertidas = pd.to_datetime(serie, format='ISO8601', errors='coerce')
+        faltantes = convertidas.isna() & serie.notna()
+        if faltantes.any():
+            convertidas[faltantes] = pd.to_datetime(serie[faltantes], format='%d/%m/%Y', errors='coerce')
+    
+    if getattr(convertidas.dt, 'tz', None) is not None:
+        convertidas = convertidas.dt.tz_localize(None)
+    return convertidas.to_numpy(dtype='datetime64[D]')
+
+
+def _anio_mes_dia(fechas: np.ndarray) -> tuple:
+    """
+    Año, mes y día de cada fecha datetime64[D], como enteros.
+    
+    Usa el algoritmo civil_from_days de H. Hinnant sobre los días desde
+    1970-01-01: solo aritmética entera, sin las conversiones de calendario
+    de astype('datetime64[Y]') y astype('datetime64[M]').
+    """
+    dias = fechas.astype(np.int64) + 719468  # días desde el 0000-03-01
+    era = dias // 146097
+    dia_era = dias - era * 146097
+    anio_era = (dia_era - dia_era // 1460 + dia_era // 36524 - dia_era // 146096) // 365
+    dia_anio = dia_era - (365 * anio_era + anio_era // 4 - anio_era // 100)
+    # Meses contados desde marzo, para que el 29 de febrero quede al final del año
+    mes_marzo = (5 * dia_anio + 2) // 153
+    dia = dia_anio - (153 * mes_marzo + 2) // 5 + 1
+    mes = np.where(mes_marzo < 10, mes_marzo + 3, mes_marzo - 9)
+    anio = anio_era + era * 400 + (mes <= 2)
+    return anio, mes, dia
+
+
+def calcular_edades(nacimientos, referencia: date) -> np.ndarray:
+    """
+    Calcula la edad cumplida a la fecha de referencia de cada fecha de nacimiento.
+    
+    Args:
+        nacimientos: Fechas de nacimiento (cualquier formato de convertir_fechas)
+        referencia: Fecha a la que se calcula la edad
+    
+    Returns:
+        Arreglo int64 de edades en años, una por fecha
+    
+    Raises:
+        ValueError: Si alguna fecha es nula o no se reconoce; filtrar antes
+            con np.isnat(convertir_fechas(...))
+    """
+    fechas = convertir_fechas(nacimientos)
+    if np.isnat(fechas).any():
+        raise ValueError("Hay fechas de nacimiento nulas o no reconocidas")
+    
+    # Con las fechas como AAAAMMDD, la resta dividida por 10000 descuenta
+    # el año si aún no cumple años en el año de la referencia
+    anios, meses, dias = _anio_mes_dia(fechas)
+    clave_referencia = referencia.year * 10000 + referencia.month * 100 + referencia.day
+    return (clave_referencia - (anios * 10000 + meses * 100 + dias)) // 10000
+
+
+def edad_en(fecha_nacimiento: date, referencia: date) -> int:
+    """
+    Edad cumplida a la fecha de referencia; versión escalar de calcular_edades.
+    
+    Args:
+        fecha_nacimiento: Fecha de nacimiento
+        referencia: Fecha a la que se calcula la edad
+    
+    Returns:
+        Edad en años
+    """
+    no_cumplido = (referencia.month, referencia.day) < (fecha_nacimiento.month, fecha_nacimiento.day)
+    return referencia.year - fecha_nacimiento.year - no_cumplido
@@ -0,0 +1,296 @@
+"""
+Validación y normalización de RUT por columnas completas.
+
+Equivalen fila a fila a validar_rut, normalizar_rut y calcular_digito_verificador,
+pero trabajan sobre una Series completa: los textos se leen como un solo
+arreglo de bytes de Arrow, se limpian con operaciones de NumPy y el dígito
+verificador se calcula con sumas ponderadas por fila en vez de una llamada
+por RUT. normalizar_ruts arma su resultado directamente como columna de Arrow.
+"""
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .validators import PATRON_RUT, calcular_digito_verificador, limpiar_rut
+
+# Códigos de la columna 'motivo' de validar_ruts (NaN si el RUT es válido)
+MOTIVO_VACIO = 'vacio'
+MOTIVO_FORMATO = 'formato'
+MOTIVO_DIGITO_VERIFICADOR = 'digito_verificador'
+MOTIVOS_RUT = [MOTIVO_VACIO, MOTIVO_FORMATO, MOTIVO_DIGITO_VERIFICADOR]
+
+# El mismo formato de validar_rut, para las filas que van a la función escalar
+_RE_FORMATO_RUT = re.compile(PATRON_RUT)
+
+# Caracteres ASCII que limpiar_rut conserva (todos menos '.', '-' y los espacios de \s)
+_CONSERVAR = np.ones(256, dtype=bool)
+_CONSERVAR[[ord('.'), ord('-'), 9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = False
+
+_CERO, _K, _GUION = ord('0'), ord('K'), ord('-')
+
+# Pesos del módulo 11, desde el dígito de las unidades
+_PESOS = np.array([2, 3, 4, 5, 6, 7])
+
+# Pesos de las 8 columnas de cuerpo de validar_ruts (la última son las unidades)
+_PESOS_CUERPO = np.array([_PESOS[(7 - columna) % 6] for columna in range(8)], dtype=np.float32)
+
+# Para contar bytes de a 8: un 1 en cada byte y los bytes de una palabra
+# (little-endian) que quedan antes de cada posición
+_UNOS = np.uint64(0x0101010101010101)
+_MASCARAS_PREVIAS = np.array([(1 << 8 * i) - 1 for i in range(8)], dtype=np.uint64)
+
+# 11 - (suma % 11) va de 1 a 11; la posición 0 no se usa
+_DIGITOS_VERIFICADORES = np.array(list("0123456789K0"))
+_CODIGOS_VERIFICADORES = np.array([ord(c) for c in "0123456789K0"], dtype=np.uint8)
+
+
+def calcular_dv_array(numeros) -> np.ndarray:
+    """
+    Calcula el dígito verificador de cada RUT de un arreglo.
+    
+    Args:
+        numeros: Cuerpos numéricos de los RUT (enteros no negativos)
+    
+    Returns:
+        Arreglo de str de un carácter ('0'-'9' o 'K'), uno por número
+    """
+    numeros = np.asarray(numeros, dtype=np.int64)
+    if (numeros < 0).any():
+        raise ValueError("Los RUT deben ser enteros no negativos")
+    
+    suma = np.zeros_like(numeros)
+    resto = numeros.copy()
+    posicion = 0
+    while resto.any():
+        suma += resto % 10 * _PESOS[posicion % 6]
+        resto //= 10
+        posicion += 1
+    
+    return _DIGITOS_VERIFICADORES[11 - suma % 11]
+
+
+def _arreglo_arrow(ruts: pd.Series) -> pa.Array:
+    """
+    La columna como arreglo de texto de Arrow, en un solo bloque.
+    
+    Las columnas str de pandas con pyarrow ya lo son y no se copian. Los
+    nulos quedan como nulos y los valores que no son texto (números leídos
+    de una planilla) se toman como str(valor).
+    """
+    if getattr(ruts.dtype, 'storage', None) == 'pyarrow':
+        arreglo = ruts.array.__arrow_array__()
+    else:
+        valores = ruts.to_numpy(dtype=object)
+        try:
+            arreglo = pa.array(valores, type=pa.large_string(), from_pandas=True)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            nulos = pd.isna(valores)
+            arreglo = pa.array([None if nulo else str(valor) for valor, nulo in zip(valores, nulos)],
+                               type=pa.large_string())
+    if isinstance(arreglo, pa.ChunkedArray):
+        arreglo = arreglo.combine_chunks()
+    return arreglo
+
+
+def _contar_antes(marcas: np.ndarray, posiciones: np.ndarray) -> np.ndarray:
+    """
+    Cantidad de marcas antes de cada posición, como cumsum(marcas) pero sin
+    recorrer los bytes de a uno: se suman de a 8 leídos como uint64 (cada
+    byte vale 0 o 1, y multiplicar por 0x0101...01 deja la suma en el byte
+    alto) y a cada posición se le agregan las marcas de su bloque que quedan
+    antes de ella.
+    """
+    bloques = np.zeros(len(marcas) // 8 + 1, dtype='<u8')
+    bloques.view(np.uint8)[:len(marcas)] = marcas
+    antes = np.zeros(len(bloques) + 1, dtype=np.int64)
+    np.cumsum((bloques * _UNOS) >> 56, out=antes[1:], dtype=np.int64)
+    bloque, resto = posiciones >> 3, posiciones & 7
+    parcial = ((bloques[bloque] & _MASCARAS_PREVIAS[resto]) * _UNOS) >> 56
+    return antes[bloque] + parcial.astype(np.int64)
+
+
+class _Textos:
+    """
+    Una columna de RUT limpiada de una vez: los caracteres que limpiar_rut
+    conserva de todas las filas, concatenados en 'limpios' (sin pasar a
+    mayúsculas). El RUT limpio de la fila i es limpios[inicio[i]:fin[i]] y
+    las filas quedan contiguas, así que fin[i] == inicio[i + 1].
+    
+    Las filas con caracteres no ASCII (que upper() y los espacios Unicode
+    tratan distinto) quedan en 'escalares' para las funciones escalares.
+    """
+    
+    def __init__(self, ruts: pd.Series):
+        self.ruts = ruts
+        self.n = len(ruts)
+        
+        arreglo = _arreglo_arrow(ruts)
+        _, offsets, datos = arreglo.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64 if pa.types.is_large_string(arreglo.type) else np.int32)
+        offsets = offsets[arreglo.offset:arreglo.offset + self.n + 1]
+        codigos = np.frombuffer(datos, dtype=np.uint8) if datos is not None else np.zeros(0, dtype=np.uint8)
+        codigos = codigos[offsets[0]:offsets[-1]]
+        offsets = offsets - offsets[0]
+        
+        conservar = (codigos > 32) & (codigos != ord('.')) & (codigos != ord('-'))
+        if (codigos < 32).any():
+            # Caracteres de control: algunos son espacios para \s y otros se conservan
+            conservar = _CONSERVAR[codigos]
+        
+        # Un carácter no ASCII en UTF-8 son solo bytes >= 128
+        self.escalares = np.zeros(self.n, dtype=bool)
+        no_ascii = np.flatnonzero(codigos >= 128)
+        if len(no_ascii):
+            self.escalares[np.searchsorted(offsets, no_ascii, side='right') - 1] = True
+        if arreglo.null_count:
+            # Los nulos pueden conservar bytes: se descartan para que queden como texto vacío
+            nulos = arreglo.is_null().to_numpy(zero_copy_only=False)
+            conservar &= ~np.repeat(nulos, np.diff(offsets))
+            self.escalares &= ~nulos
+        
+        # compress es bastante más rápido que indexar con la máscara
+        self.limpios = np.compress(conservar, codigos)
+        limites = _contar_antes(conservar, offsets)
+        self.inicio, self.fin = limites[:-1], limites[1:]
+        self.largos = self.fin - self.inicio
+    
+    def matriz(self, filas: np.ndarray, ancho: int) -> np.ndarray:
+        """
+        Los últimos `ancho` caracteres limpios de las filas indicadas, uno por
+        fila de una matriz uint8. Si una fila tiene menos, la matriz trae a la
+        izquierda los de la fila anterior (o ceros), que quien llama descarta.
+        """
+        ventanas = sliding_window_view(np.concatenate([np.zeros(ancho, dtype=np.uint8), self.limpios]), ancho)
+        return ventanas[self.fin[filas]]
+    
+    def textos(self, filas: np.ndarray) -> list:
+        """Valores originales de las filas indicadas como str ('' para los nulos)."""
+        if not len(filas):
+            return []
+        return list(map(str, self.ruts.iloc[filas].to_numpy(dtype=object, na_value='')))
+
+
+def _motivo_escalar(texto: str) -> Optional[str]:
+    """Motivo de validar_rut para un solo texto (None si es válido)."""
+    if not texto.strip():
+        return MOTIVO_VACIO
+    limpio = limpiar_rut(texto)
+    if not _RE_FORMATO_RUT.fullmatch(limpio):
+        return MOTIVO_FORMATO
+    if calcular_digito_verificador(limpio[:-1]) != limpio[-1]:
+        return MOTIVO_DIGITO_VERIFICADOR
+    return None
+
+
+def validar_ruts(ruts: pd.Series) -> pd.DataFrame:
+    """
+    Valida una columna de RUT con las mismas reglas que validar_rut.
+    
+    Los nulos cuentan como vacíos y los valores que no son texto se
+    validan como str(valor).
+    
+    Args:
+        ruts: RUT en cualquier formato
+    
+    Returns:
+        DataFrame con el índice de ruts y las columnas 'valido' (bool) y
+        'motivo' (categórica con MOTIVOS_RUT; NaN si el RUT es válido)
+    """
+    t = _Textos(ruts)
+    motivo = np.full(t.n, MOTIVOS_RUT.index(MOTIVO_FORMATO), dtype=np.int8)
+    
+    # Solo con 8 o 9 caracteres limpios puede tener formato; se alinean a la
+    # derecha en 9 columnas: 8 de cuerpo (rellenas con '0') y el verificador
+    candidatas = np.flatnonzero(~t.escalares & ((t.largos == 8) | (t.largos == 9)))
+    matriz = t.matriz(candidatas, 9)
+    matriz[:, 0] = np.where(t.largos[candidatas] == 9, matriz[:, 0], np.uint8(_CERO))
+    
+    # Formato \d{7,8}[0-9K]. La resta en uint8 deja > 9 lo que no es dígito, y
+    # los 8 dígitos de cada fila se revisan juntos como un uint64: sumarle 0x76
+    # a un byte enciende su bit alto si pasa de 9 (si ya lo tenía, lo ve el |)
+    digitos = matriz[:, :8] - np.uint8(_CERO)
+    palabras = digitos.view('<u8')[:, 0]
+    verificador = matriz[:, 8]
+    verificador = np.where(verificador == ord('k'), np.uint8(_K), verificador)
+    formato = ((((palabras | (palabras + 0x7676767676767676)) & 0x8080808080808080) == 0)
+               & ((verificador - np.uint8(_CERO) <= 9) | (verificador == _K)))
+    
+    # Módulo 11 como producto de la matriz de dígitos por los pesos de cada
+    # columna, en float32 (exacto: la suma no pasa de 8 * 9 * 7)
+    suma = (digitos.astype(np.float32) @ _PESOS_CUERPO).astype(np.int32)
+    correcto = _CODIGOS_VERIFICADORES[11 - suma % 11] == verificador
+    motivo[candidatas] = np.where(formato, np.where(correcto, -1, MOTIVOS_RUT.index(MOTIVO_DIGITO_VERIFICADOR)),
+                                  MOTIVOS_RUT.index(MOTIVO_FORMATO))
+    
+    # Sin caracteres limpios es vacío solo si no tenía puntos ni guiones
+    sin_limpios = np.flatnonzero(~t.escalares & (t.largos == 0))
+    vacio = np.array([not texto.strip() for texto in t.textos(sin_limpios)], dtype=bool)
+    motivo[sin_limpios[vacio]] = MOTIVOS_RUT.index(MOTIVO_VACIO)
+    
+    escalares = np.flatnonzero(t.escalares)
+    for i, texto in zip(escalares, t.textos(escalares)):
+        escalar = _motivo_escalar(texto)
+        motivo[i] = -1 if escalar is None else MOTIVOS_RUT.index(escalar)
+    
+    return pd.DataFrame({
+        'valido': motivo == -1,
+        'motivo': pd.Categorical.from_codes(motivo, categories=MOTIVOS_RUT)
+    }, index=ruts.index)
+
+
+def _normalizar_escalar(texto: str) -> str:
+    """normalizar_rut para un solo texto, con '' para el texto vacío."""
+    if not texto:
+        return ""
+    limpio = limpiar_rut(texto)
+    return texto if len(limpio) < 2 else f"{limpio[:-1]}-{limpio[-1]}"
+
+
+def normalizar_ruts(ruts: pd.Series) -> pd.Series:
+    """
+    Normaliza una columna de RUT al formato 12345678-9, como normalizar_rut.
+    
+    No valida: un texto que limpio tiene menos de 2 caracteres se devuelve
+    tal cual, y los nulos quedan como ''.
+    
+    Args:
+        ruts: RUT en cualquier formato
+    
+    Returns:
+        Series de str con el índice de ruts
+    """
+    t = _Textos(ruts)
+    vectorizadas = ~t.escalares & (t.largos >= 2)
+    escalares = np.flatnonzero(~vectorizadas)
+    resultados = [_normalizar_escalar(texto).encode() for texto in t.textos(escalares)]
+    
+    # Cada fila vectorizada ocupa su RUT limpio más el guion; las demás, su
+    # resultado escalar en UTF-8
+    largos = np.where(vectorizadas, t.largos + 1, 0)
+    largos[escalares] = [len(resultado) for resultado in resultados]
+    offsets = np.zeros(t.n + 1, dtype=np.int64)
+    np.cumsum(largos, out=offsets[1:])
+    salida = np.empty(offsets[-1], dtype=np.uint8)
+    
+    # Los caracteres limpios llenan sus filas en orden saltándose la posición
+    # del guion, que queda justo antes del verificador. Lo habitual es que
+    # ninguna fila escalar tenga caracteres; si no, se descartan sus limpios
+    # y se les reserva su lugar en la salida
+    guiones = offsets[1:][vectorizadas] - 2
+    limpios = t.limpios
+    destino = np.ones(len(salida), dtype=bool)
+    if t.largos[escalares].any() or largos[escalares].any():
+        limpios = np.compress(np.repeat(vectorizadas, t.largos), limpios)
+        destino = np.repeat(vectorizadas, largos)
+    destino[guiones] = False
+    salida[destino] = limpios - ((limpios >= ord('a')) & (limpios <= ord('z'))) * np.uint8(32)
+    salida[guiones] = _GUION
+    if largos[escalares].any():
+        salida[np.repeat(~vectorizadas, largos)] = np.frombuffer(b''.join(resultados), dtype=np.uint8)
+    
+    normalizados = pa.LargeStringArray.from_buffers(t.n, pa.py_buffer(offsets), pa.py_buffer(salida))
+    return pd.Series(normalizados, index=ruts.index, dtype='str')
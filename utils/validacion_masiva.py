@@ -0,0 +1,256 @@
+"""
+Validación de planillas completas de empleados y cargas.
+
+Aplica por columnas las mismas reglas que validar_rut, validar_nombre,
+validar_email, validar_numero_cuenta y validar_fecha_nacimiento, y entrega
+una sola tabla de errores con una fila por campo inválido, en vez de una
+tupla (bool, str) por valor.
+"""
+import re
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .fechas import calcular_edades, convertir_fechas
+from .rut_masivo import normalizar_ruts, validar_ruts
+from .validators import DOMINIOS_EMAIL, PATRON_EMAIL
+
+# Columnas de la tabla de errores
+COLUMNAS_ERRORES = ['fila', 'campo', 'codigo', 'mensaje']
+
+# Campos validados, en el orden en que se reportan dentro de una fila
+CAMPOS = ['rut', 'nombre', 'email', 'numero_cuenta', 'fecha_nacimiento']
+
+# Códigos de error (los de RUT son los motivos de validar_ruts)
+CODIGOS = ['vacio', 'formato', 'digito_verificador', 'duplicado', 'largo', 'caracteres',
+           'dominio', 'futura', 'edad_invalida', 'edad_maxima']
+
+# Tipo de carga al que se aplica la edad máxima de validar_cargas, como se
+# guarda en la base (main.py quita el '/a' de la etiqueta "Hijo/a")
+TIPO_HIJO = "Hijo"
+
+# Mensajes por campo y código, los mismos de las funciones de validators
+MENSAJES = {
+    'rut': {
+        'vacio': "El RUT no puede estar vacío",
+        'formato': "Formato de RUT inválido. Debe ser 12345678-9 o 12.345.678-9",
+        'digito_verificador': "RUT inválido. El dígito verificador no corresponde",
+        'duplicado': "RUT duplicado en el archivo",
+    },
+    'nombre': {
+        'vacio': "El nombre no puede estar vacío",
+        'largo': "El nombre debe tener al menos 2 caracteres",
+        'caracteres': "El nombre contiene caracteres no válidos",
+    },
+    'email': {
+        'vacio': "El correo electrónico no puede estar vacío",
+        'formato': "Formato de correo electrónico inválido",
+        'dominio': "El dominio del correo no parece válido",
+    },
+    'numero_cuenta': {
+        'vacio': "El número de cuenta no puede estar vacío",
+        'caracteres': "El número de cuenta debe contener solo números",
+        'largo': "El número de cuenta debe tener entre 5 y 20 dígitos",
+    },
+    'fecha_nacimiento': {
+        'vacio': "La fecha de nacimiento no puede estar vacía",
+        'formato': "La fecha de nacimiento no es una fecha válida",
+        'futura': "La fecha de nacimiento no puede ser futura",
+        'edad_invalida': "La edad calculada no es válida (mayor a 120 años)",
+        'edad_maxima': "La edad supera el máximo permitido ({edad_maxima} años)",
+    },
+}
+
+# \s de re lista explícitamente: las columnas de Arrow usan RE2, cuyo \s es
+# solo ASCII, y validar_nombre acepta también los espacios Unicode
+_ESPACIOS = re.escape(''.join(chr(c) for c in range(0x3001) if chr(c).isspace()))
+_PATRON_NOMBRE = f"[a-zA-ZáéíóúÁÉÍÓÚñÑ{_ESPACIOS}'\\-]+"
+_PATRON_SEPARADORES_CUENTA = f"[{_ESPACIOS}\\-]"
+
+
+def _primer_codigo(condiciones: list, codigos: list) -> np.ndarray:
+    """Por fila, la posición en CODIGOS de la primera condición que se cumple (-1 si ninguna)."""
+    return np.select(condiciones, [CODIGOS.index(c) for c in codigos], -1).astype(np.int8)
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Columna como texto, con '' en los nulos."""
+    if isinstance(serie.dtype, pd.StringDtype):
+        return serie.fillna('')
+    return serie.astype(object).where(serie.notna(), '').astype(str)
+
+
+def _codigos_rut(ruts: pd.Series) -> np.ndarray:
+    # MOTIVOS_RUT son los primeros CODIGOS, en el mismo orden
+    return np.array(validar_ruts(ruts)['motivo'].cat.codes, dtype=np.int8)
+
+
+def _codigos_nombre(nombres: pd.Series) -> np.ndarray:
+    nombres = _texto(nombres)
+    limpios = nombres.str.strip()
+    return _primer_codigo([
+        (limpios == '').to_numpy(dtype=bool),
+        (limpios.str.len() < 2).to_numpy(dtype=bool),
+        ~nombres.str.fullmatch(_PATRON_NOMBRE).to_numpy(dtype=bool),
+    ], ['vacio', 'largo', 'caracteres'])
+
+
+def _codigos_email(emails: pd.Series) -> np.ndarray:
+    emails = _texto(emails).str.strip().str.lower()
+    return _primer_codigo([
+        (emails == '').to_numpy(dtype=bool),
+        ~emails.str.fullmatch(PATRON_EMAIL).to_numpy(dtype=bool),
+        ~emails.str.endswith(DOMINIOS_EMAIL).to_numpy(dtype=bool),
+    ], ['vacio', 'formato', 'dominio'])
+
+
+def _codigos_numero_cuenta(numeros: pd.Series) -> np.ndarray:
+    numeros = _texto(numeros)
+    limpios = numeros.str.replace(_PATRON_SEPARADORES_CUENTA, '', regex=True)
+    largos = limpios.str.len().to_numpy()
+    return _primer_codigo([
+        (numeros.str.strip() == '').to_numpy(dtype=bool),
+        ~limpios.str.isdigit().to_numpy(dtype=bool),
+        (largos < 5) | (largos > 20),
+    ], ['vacio', 'caracteres', 'largo'])
+
+
+def _codigos_fecha_nacimiento(fechas: pd.Series, referencia: date, edad_maxima: Optional[int],
+                              con_maximo: np.ndarray) -> np.ndarray:
+    convertidas = convertir_fechas(fechas)
+    validas = ~np.isnat(convertidas)
+    
+    # Entre las que no se pudieron convertir, las de texto en blanco cuentan como vacías
+    vacias = fechas.isna().to_numpy().copy()
+    fallidas = np.flatnonzero(~validas & ~vacias)
+    vacias[fallidas] = (_texto(fechas.iloc[fallidas]).str.strip() == '').to_numpy(dtype=bool)
+    
+    edad = np.zeros(len(fechas), dtype=np.int64)
+    edad[validas] = calcular_edades(convertidas[validas], referencia)
+    
+    return _primer_codigo([
+        vacias,
+        ~validas,
+        validas & (convertidas > np.datetime64(referencia, 'D')),
+        validas & (edad > 120),
+        validas & con_maximo & (edad > edad_maxima) if edad_maxima else np.zeros(len(fechas), dtype=bool),
+    ], ['vacio', 'formato', 'futura', 'edad_invalida', 'edad_maxima'])
+
+
+def _marcar_duplicados(ruts: pd.Series, codigos: Dict[str, np.ndarray]):
+    """Marca 'duplicado' en las repeticiones de un RUT entre las filas sin otros errores."""
+    sin_errores = np.logical_and.reduce([c < 0 for c in codigos.values()])
+    filas = np.flatnonzero(sin_errores)
+    repetidas = normalizar_ruts(ruts.iloc[filas]).duplicated(keep='first').to_numpy()
+    codigos['rut'][filas[repetidas]] = CODIGOS.index('duplicado')
+
+
+def _tabla_errores(indice: pd.Index, codigos: Dict[str, np.ndarray],
+                   mensajes: Dict[str, Dict[str, str]]) -> pd.DataFrame:
+    """Junta los códigos de cada campo en la tabla de errores, ordenada por fila y campo."""
+    # Matriz fila x campo: nonzero la recorre ya ordenada por fila y luego por campo
+    matriz = np.full((len(indice), len(CAMPOS)), -1, dtype=np.int8)
+    textos = np.full((len(CAMPOS), len(CODIGOS)), None, dtype=object)
+    for campo, codigos_campo in codigos.items():
+        matriz[:, CAMPOS.index(campo)] = codigos_campo
+        for codigo, mensaje in mensajes[campo].items():
+            textos[CAMPOS.index(campo), CODIGOS.index(codigo)] = mensaje
+    
+    posiciones, campos = np.nonzero(matriz >= 0)
+    codigos_error = matriz[posiciones, campos]
+    return pd.DataFrame({
+        'fila': indice.to_numpy()[posiciones],
+        'campo': pd.Categorical.from_codes(campos, categories=CAMPOS),
+        'codigo': pd.Categorical.from_codes(codigos_error, categories=CODIGOS),
+        'mensaje': textos[campos, codigos_error],
+    }, columns=COLUMNAS_ERRORES)
+
+
+def _columna(df: pd.DataFrame, nombre: str, obligatoria: bool) -> Optional[pd.Series]:
+    if nombre in df.columns:
+        return df[nombre]
+    if obligatoria:
+        raise ValueError(f"Falta la columna '{nombre}'")
+    return None
+
+
+def _opcional(codigos: np.ndarray) -> np.ndarray:
+    """Un campo opcional vacío no es error."""
+    codigos[codigos == CODIGOS.index('vacio')] = -1
+    return codigos
+
+
+def validar_empleados(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Valida una planilla de empleados completa.
+    
+    'rut' y 'nombre' son obligatorias; 'email' y 'numero_cuenta' se validan
+    si la columna existe y el valor no está vacío. Un RUT repetido se
+    reporta como 'duplicado' desde su segunda aparición, contando solo las
+    filas sin otros errores.
+    
+    Args:
+        df: Planilla con las columnas rut, nombre y opcionalmente email y numero_cuenta
+    
+    Returns:
+        DataFrame con COLUMNAS_ERRORES: 'fila' es la etiqueta del índice de df,
+        'campo' y 'codigo' son categóricas (CAMPOS, CODIGOS). Vacío si no hay errores.
+    """
+    ruts = _columna(df, 'rut', obligatoria=True)
+    codigos = {
+        'rut': _codigos_rut(ruts),
+        'nombre': _codigos_nombre(_columna(df, 'nombre', obligatoria=True)),
+    }
+    emails = _columna(df, 'email', obligatoria=False)
+    if emails is not None:
+        codigos['email'] = _opcional(_codigos_email(emails))
+    cuentas = _columna(df, 'numero_cuenta', obligatoria=False)
+    if cuentas is not None:
+        codigos['numero_cuenta'] = _opcional(_codigos_numero_cuenta(cuentas))
+    
+    _marcar_duplicados(ruts, codigos)
+    return _tabla_errores(df.index, codigos, MENSAJES)
+
+
+def validar_cargas(df: pd.DataFrame, edad_maxima_hijo: Optional[int] = None,
+                   referencia: Optional[date] = None) -> pd.DataFrame:
+    """
+    Valida una planilla de cargas familiares completa.
+    
+    'rut', 'nombre' y 'fecha_nacimiento' son obligatorias. La edad máxima se
+    aplica a las filas con tipo TIPO_HIJO (o su etiqueta "Hijo/a"), o a todas
+    si no hay columna 'tipo'.
+    Un RUT repetido se reporta como en validar_empleados.
+    
+    Args:
+        df: Planilla con las columnas rut, nombre, fecha_nacimiento y opcionalmente tipo
+        edad_maxima_hijo: Edad máxima de los hijos (opcional)
+        referencia: Fecha a la que se calculan las edades (por defecto, hoy)
+    
+    Returns:
+        DataFrame con COLUMNAS_ERRORES, como validar_empleados
+    """
+    referencia = referencia or date.today()
+    tipos = _columna(df, 'tipo', obligatoria=False)
+    if tipos is not None:
+        con_maximo = (_texto(tipos).str.replace('/a', '', regex=False) == TIPO_HIJO).to_numpy(dtype=bool)
+    else:
+        con_maximo = np.ones(len(df), dtype=bool)
+    
+    ruts = _columna(df, 'rut', obligatoria=True)
+    codigos = {
+        'rut': _codigos_rut(ruts),
+        'nombre': _codigos_nombre(_columna(df, 'nombre', obligatoria=True)),
+        'fecha_nacimiento': _codigos_fecha_nacimiento(
+            _columna(df, 'fecha_nacimiento', obligatoria=True), referencia, edad_maxima_hijo, con_maximo
+        ),
+    }
+    mensajes = dict(MENSAJES, fecha_nacimiento={
+        codigo: mensaje.format(edad_maxima=edad_maxima_hijo)
+        for codigo, mensaje in MENSAJES['fecha_nacimiento'].items()
+    })
+    
+    _marcar_duplicados(ruts, codigos)
+    return _tabla_errores(df.index, codigos, mensajes)
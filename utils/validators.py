@@ -5,6 +5,35 @@ Incluye validación de RUT chileno y otros campos.
 import re
 from datetime import date
 
+from .fechas import edad_en
+
+# Formato del RUT limpio que acepta validar_rut (también lo usa rut_masivo)
+PATRON_RUT = r'\d{7,8}[0-9K]'
+
+# Formato y dominios aceptados por validar_email (también los usa validacion_masiva)
+PATRON_EMAIL = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+DOMINIOS_EMAIL = ('.com', '.cl', '.net', '.org', '.edu', '.gov', '.io', '.co')
+
+# Patrones compilados una vez (re.match con un str busca el patrón en su caché en cada llamada)
+_RE_FORMATO_RUT = re.compile(PATRON_RUT)
+_RE_NOMBRE = re.compile(r"[a-zA-ZáéíóúÁÉÍÓÚñÑ\s'\-]+")
+_RE_EMAIL = re.compile(PATRON_EMAIL)
+
+# Los dominios son de una sola etiqueta: basta buscar desde el último punto
+_SUFIJOS_EMAIL = frozenset(DOMINIOS_EMAIL)
+
+# Tablas de str.translate que borran los separadores: los mismos caracteres
+# que [.\-\s] y [\s\-] (\s son los caracteres con str.isspace())
+_ESPACIOS = [chr(c) for c in range(0x3001) if chr(c).isspace()]
+_SIN_SEPARADORES_RUT = dict.fromkeys(map(ord, ['.', '-'] + _ESPACIOS))
+_SIN_SEPARADORES_CUENTA = dict.fromkeys(map(ord, ['-'] + _ESPACIOS))
+
+# Pesos del módulo 11, desde el dígito de las unidades
+_PESOS_DV = (2, 3, 4, 5, 6, 7)
+
+# Verificador según suma % 11 (11 - resto, con 11 -> 0 y 10 -> K)
+_VERIFICADORES = '0K987654321'
+
 
 def limpiar_rut(rut: str) -> str:
     """
@@ -16,7 +45,7 @@ def limpiar_rut(rut: str) -> str:
     Returns:
         RUT limpio (solo números y K)
     """
-    return re.sub(r'[.\-\s]', '', rut.upper().strip())
+    return rut.upper().translate(_SIN_SEPARADORES_RUT)
 
 
 def calcular_digito_verificador(rut_sin_dv: str) -> str:
@@ -29,22 +58,20 @@ def calcular_digito_verificador(rut_sin_dv: str) -> str:
     Returns:
         Dígito verificador calculado (0-9 o K)
     """
-    rut_reversed = rut_sin_dv[::-1]
-    factors = [2, 3, 4, 5, 6, 7]
-    suma = 0
-    
-    for i, digit in enumerate(rut_reversed):
-        suma += int(digit) * factors[i % 6]
-    
-    resto = suma % 11
-    dv = 11 - resto
-    
-    if dv == 11:
-        return '0'
-    elif dv == 10:
-        return 'K'
+    if rut_sin_dv.isdigit() and len(rut_sin_dv) <= 18:
+        # Un solo int() y aritmética entera en vez de un int() por dígito
+        numero = int(rut_sin_dv)
+        suma = 0
+        posicion = 0
+        while numero:
+            suma += numero % 10 * _PESOS_DV[posicion % 6]
+            numero //= 10
+            posicion += 1
     else:
-        return str(dv)
+        # '' da 0; otros caracteres fallan en int() como siempre
+        suma = sum(int(digito) * _PESOS_DV[i % 6] for i, digito in enumerate(reversed(rut_sin_dv)))
+    
+    return _VERIFICADORES[suma % 11]
 
 
 def validar_rut(rut: str) -> tuple[bool, str]:
@@ -63,7 +90,7 @@ def validar_rut(rut: str) -> tuple[bool, str]:
     rut_limpio = limpiar_rut(rut)
     
     # Validar formato básico
-    if not re.match(r'^\d{7,8}[0-9K]$', rut_limpio):
+    if not _RE_FORMATO_RUT.fullmatch(rut_limpio):
         return False, "Formato de RUT inválido. Debe ser 12345678-9 o 12.345.678-9"
     
     # Separar número y dígito verificador
@@ -97,14 +124,14 @@ def formatear_rut(rut: str) -> str:
     rut_numero = rut_limpio[:-1]
     dv = rut_limpio[-1]
     
-    # Agregar puntos cada 3 dígitos desde la derecha
-    rut_formateado = ""
-    for i, digit in enumerate(rut_numero[::-1]):
-        if i > 0 and i % 3 == 0:
-            rut_formateado = "." + rut_formateado
-        rut_formateado = digit + rut_formateado
+    # Agregar puntos cada 3 dígitos desde la derecha: el primer grupo lleva el resto
+    inicio = len(rut_numero) % 3 or 3
+    grupos = [rut_numero[:inicio]]
+    while inicio < len(rut_numero):
+        grupos.append(rut_numero[inicio:inicio + 3])
+        inicio += 3
     
-    return f"{rut_formateado}-{dv}"
+    return f"{'.'.join(grupos)}-{dv}"
 
 
 def normalizar_rut(rut: str) -> str:
@@ -132,6 +159,28 @@ def normalizar_rut(rut: str) -> str:
     return f"{rut_numero}-{dv}"
 
 
+def descomponer_rut(rut: str) -> tuple[int, str] | None:
+    """
+    Separa un RUT en su cuerpo numérico y dígito verificador.
+    Es la clave canónica con que se buscan los RUT en la base de datos.
+    
+    Args:
+        rut: RUT en cualquier formato
+        
+    Returns:
+        Tupla (numero, dv), o None si el texto no tiene forma de RUT
+    """
+    if not rut:
+        return None
+    
+    rut_limpio = limpiar_rut(rut)
+    
+    if len(rut_limpio) < 2 or not rut_limpio[:-1].isdigit():
+        return None
+    
+    return int(rut_limpio[:-1]), rut_limpio[-1]
+
+
 def validar_nombre(nombre: str) -> tuple[bool, str]:
     """
     Valida que el nombre contenga solo caracteres válidos.
@@ -149,47 +198,45 @@ def validar_nombre(nombre: str) -> tuple[bool, str]:
         return False, "El nombre debe tener al menos 2 caracteres"
     
     # Permitir letras, espacios, acentos, ñ, apóstrofes y guiones
-    if not re.match(r"^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s'\-]+$", nombre):
+    if not _RE_NOMBRE.fullmatch(nombre):
         return False, "El nombre contiene caracteres no válidos"
     
     return True, "Nombre válido"
 
 
-def calcular_edad(fecha_nacimiento: date) -> int:
+def calcular_edad(fecha_nacimiento: date, referencia: date = None) -> int:
     """
     Calcula la edad en años a partir de una fecha de nacimiento.
     
     Args:
         fecha_nacimiento: Fecha de nacimiento
+        referencia: Fecha a la que se calcula la edad (por defecto, hoy)
         
     Returns:
         Edad en años
     """
-    hoy = date.today()
-    edad = hoy.year - fecha_nacimiento.year
-    
-    # Ajustar si aún no ha cumplido años este año
-    if (hoy.month, hoy.day) < (fecha_nacimiento.month, fecha_nacimiento.day):
-        edad -= 1
-    
-    return edad
+    return edad_en(fecha_nacimiento, referencia or date.today())
 
 
-def validar_fecha_nacimiento(fecha_nacimiento: date, edad_maxima: int = None) -> tuple[bool, str]:
+def validar_fecha_nacimiento(fecha_nacimiento: date, edad_maxima: int = None,
+                             referencia: date = None) -> tuple[bool, str]:
     """
     Valida que la fecha de nacimiento sea válida.
     
     Args:
         fecha_nacimiento: Fecha de nacimiento a validar
         edad_maxima: Edad máxima permitida (opcional)
+        referencia: Fecha contra la que se valida (por defecto, hoy)
         
     Returns:
         Tupla (es_valido, mensaje)
     """
-    if fecha_nacimiento > date.today():
+    referencia = referencia or date.today()
+    
+    if fecha_nacimiento > referencia:
         return False, "La fecha de nacimiento no puede ser futura"
     
-    edad = calcular_edad(fecha_nacimiento)
+    edad = edad_en(fecha_nacimiento, referencia)
     
     if edad > 120:
         return False, "La edad calculada no es válida (mayor a 120 años)"
@@ -215,15 +262,11 @@ def validar_email(email: str) -> tuple[bool, str]:
     
     email = email.strip().lower()
     
-    # Patrón de email
-    patron = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
-    if not re.match(patron, email):
+    if not _RE_EMAIL.fullmatch(email):
         return False, "Formato de correo electrónico inválido"
     
-    # Validar dominios comunes
-    dominios_validos = ['.com', '.cl', '.net', '.org', '.edu', '.gov', '.io', '.co']
-    tiene_dominio_valido = any(email.endswith(d) for d in dominios_validos)
+    # Validar dominios comunes (el patrón asegura que hay un punto)
+    tiene_dominio_valido = email[email.rfind('.'):] in _SUFIJOS_EMAIL
     
     if not tiene_dominio_valido:
         return False, "El dominio del correo no parece válido"
@@ -245,7 +288,7 @@ def validar_numero_cuenta(numero: str) -> tuple[bool, str]:
         return False, "El número de cuenta no puede estar vacío"
     
     # Remover espacios y guiones
-    numero_limpio = re.sub(r'[\s\-]', '', numero)
+    numero_limpio = numero.translate(_SIN_SEPARADORES_CUENTA)
     
     # Debe ser numérico y tener entre 5 y 20 dígitos
     if not numero_limpio.isdigit():